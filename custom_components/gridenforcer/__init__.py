@@ -2,72 +2,270 @@
 
 from __future__ import annotations
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import (
-    EVENT_HOMEASSISTANT_START,
-    EVENT_HOMEASSISTANT_STOP,
-    Platform,
-)
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.event import (
-    async_track_state_change_event,
-    async_track_time_change,
-)
+import logging
+from typing import TYPE_CHECKING
 
 from .const import (
-    CONF_BAT_COST,
-    CONF_EXTRA_EXPORT,
-    CONF_EXTRA_IMPORT,
+    CONF_ADAPTIVE_POLLING,
     CONF_FCRDD_INPUT,
     CONF_FCRDU_INPUT,
+    CONF_MODBUS_HOST,
+    CONF_MODBUS_PORT,
+    CONF_MODBUS_UNIT,
+    CONF_MPC,
+    CONF_MQTT_ENCODING,
+    CONF_MQTT_PREFIX,
+    CONF_MQTT_TOPICS,
     CONF_PRICE_SENSOR,
     CONF_SOC_SENSOR,
-    CONF_VAT,
+    DATA_MODBUS,
+    DATA_PRICE_CACHE,
+    DATA_TELEMETRY,
+    DATA_WEBSOCKET,
+    DEFAULT_MODBUS_PORT,
+    DEFAULT_MODBUS_UNIT,
+    DOMAIN,
+    MPC_OFF,
+    MQTT_ENCODING_JSON,
+)
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+# Plain platform names so importing the package does not pull in Home Assistant
+PLATFORMS: list[str] = ["binary_sensor", "number", "sensor", "select"]
+
+
+# Entity unique ids before they were scoped to the config entry
+_LEGACY_UNIQUE_IDS = (
+    "inverter_mode",
+    "soc_backup",
+    "soc_max",
+    "selfuse_hours",
+    "charge_hours",
+    "operation_mode",
 )
-from .pricecalculator import PriceCalculator
 
-DOMAIN = "gridenforcer"
 
-PLATFORMS: list[Platform] = [Platform.NUMBER, Platform.SENSOR, Platform.SELECT]
+async def async_migrate_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Migrate an old config entry."""
+    from homeassistant.core import callback
+    from homeassistant.helpers import entity_registry as er
+
+    if entry.version > 1:
+        return False
+
+    if entry.minor_version < 2:
+        # Scope entity unique ids to the entry so several entries can coexist
+
+        @callback
+        def _migrate_unique_id(entity_entry: er.RegistryEntry) -> dict | None:
+            if entity_entry.unique_id in _LEGACY_UNIQUE_IDS:
+                return {"new_unique_id": f"{entry.entry_id}_{entity_entry.unique_id}"}
+            return None
+
+        await er.async_migrate_entries(hass, entry.entry_id, _migrate_unique_id)
+        hass.config_entries.async_update_entry(entry, minor_version=2)
+
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up GridEnForcerControl from a config entry."""
+    # Deferred so the planner and its dependencies load after HA bootstrap
+    from homeassistant.const import EVENT_HOMEASSISTANT_START
+    from homeassistant.helpers.event import (
+        async_track_state_change_event,
+        async_track_time_change,
+    )
+
+    from .pricecache import PriceSeriesCache, entry_cache_key
+    from .pricecalculator import PriceCalculator
+
+    price_cache = hass.data.setdefault(DATA_PRICE_CACHE, PriceSeriesCache())
+    price_cache.acquire(entry_cache_key(entry.data))
+    try:
+        price_hub = PriceCalculator(hass, entry, price_cache)
+        hass.data.setdefault(DOMAIN, {})[entry.entry_id] = price_hub
+        # Reuse a still valid schedule so the entities start in the right mode
+        await price_hub.async_restore_snapshot()
+        entry.async_create_background_task(
+            hass, price_hub.async_load_rollups(), f"{DOMAIN}_load_rollups"
+        )
+        if not hass.data.get(DATA_WEBSOCKET):
+            from .websocket import async_register_commands
+
+            async_register_commands(hass)
+            hass.data[DATA_WEBSOCKET] = True
+
+        if entry.data.get(CONF_MODBUS_HOST):
+            from .coordinator import SolaxModbusCoordinator
+            from .modbus import ModbusReader
+
+            coordinator = SolaxModbusCoordinator(
+                hass,
+                entry,
+                ModbusReader(
+                    entry.data[CONF_MODBUS_HOST],
+                    entry.data.get(CONF_MODBUS_PORT, DEFAULT_MODBUS_PORT),
+                    entry.data.get(CONF_MODBUS_UNIT, DEFAULT_MODBUS_UNIT),
+                ),
+                adaptive=entry.data.get(CONF_ADAPTIVE_POLLING, True),
+            )
+            hass.data.setdefault(DATA_MODBUS, {})[entry.entry_id] = coordinator
 
-    price_hub = PriceCalculator(hass, entry)
-    hass.data[DOMAIN] = {"price_hub": price_hub}
-    await price_hub.async_update_price_calculator()
+        await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    except Exception:
+        # Setup is retried, the next attempt acquires the price sensor again
+        hass.data.get(DOMAIN, {}).pop(entry.entry_id, None)
+        if coordinator := hass.data.get(DATA_MODBUS, {}).pop(entry.entry_id, None):
+            await coordinator.async_shutdown()
+        price_cache.release(entry_cache_key(entry.data))
+        raise
 
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    if coordinator := hass.data.get(DATA_MODBUS, {}).get(entry.entry_id):
+        # Not the first refresh helper, setup does not wait for the connect
+        # timeout and block reads of an unreachable inverter
+        entry.async_create_background_task(
+            hass, coordinator.async_refresh(), f"{DOMAIN}_modbus_refresh"
+        )
+
+    # Recompute in the background, setup does not wait for the price sensor
+    entry.async_create_background_task(
+        hass,
+        price_hub.async_update_price_calculator(),
+        f"{DOMAIN}_initial_price_update",
+    )
 
     # Schedule the sensor update at 13:30 when new prices have arrived
-    async_track_time_change(
-        hass, price_hub.async_update_from_schedule, hour=13, minute=30, second=00
+    entry.async_on_unload(
+        async_track_time_change(
+            hass, price_hub.async_update_from_schedule, hour=13, minute=30, second=00
+        )
     )
-    async_track_time_change(
-        hass, price_hub.async_update_from_schedule, hour=0, minute=0, second=10
+    entry.async_on_unload(
+        async_track_time_change(
+            hass, price_hub.async_update_from_schedule, hour=0, minute=0, second=10
+        )
     )
-    async_track_state_change_event(
-        hass, entry.data[CONF_PRICE_SENSOR], price_hub.async_update_from_state_prices
+    entry.async_on_unload(
+        async_track_state_change_event(
+            hass,
+            entry.data[CONF_PRICE_SENSOR],
+            price_hub.async_update_from_state_prices,
+        )
     )
-    async_track_state_change_event(
-        hass, entry.data[CONF_SOC_SENSOR], price_hub.async_update_from_state_soc
+    entry.async_on_unload(
+        async_track_state_change_event(
+            hass, entry.data[CONF_SOC_SENSOR], price_hub.async_update_from_state_soc
+        )
     )
-
-    async_track_state_change_event(
-        hass, entry.data[CONF_FCRDD_INPUT], price_hub.async_update_from_state_fcrddown
+    entry.async_on_unload(
+        async_track_state_change_event(
+            hass,
+            entry.data[CONF_FCRDD_INPUT],
+            price_hub.async_update_from_state_fcrddown,
+        )
     )
-
-    async_track_state_change_event(
-        hass, entry.data[CONF_FCRDU_INPUT], price_hub.async_update_from_state_fcrdup
+    entry.async_on_unload(
+        async_track_state_change_event(
+            hass,
+            entry.data[CONF_FCRDU_INPUT],
+            price_hub.async_update_from_state_fcrdup,
+        )
     )
-    hass.bus.async_listen_once(
-        EVENT_HOMEASSISTANT_START, price_hub.async_update_from_schedule
+    if entry.data.get(CONF_MPC, MPC_OFF) != MPC_OFF:
+        # Re-plan from the measured SoC at every quarter hour slot boundary
+        entry.async_on_unload(
+            async_track_time_change(
+                hass, price_hub.async_update_mpc, minute="/15", second=5
+            )
+        )
+    entry.async_on_unload(
+        hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_START, price_hub.async_update_from_schedule
+        )
     )
+    if entry.data.get(CONF_MQTT_PREFIX):
+        entry.async_create_background_task(
+            hass, _async_start_telemetry(hass, entry), f"{DOMAIN}_telemetry_start"
+        )
 
     return True
 
 
+async def _async_start_telemetry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Publish the telemetry packages over MQTT once the client is up."""
+    import time
+    from datetime import timedelta
+
+    from homeassistant.components import mqtt
+    from homeassistant.core import Event, EventStateChangedData, callback
+    from homeassistant.exceptions import HomeAssistantError
+    from homeassistant.helpers.event import (
+        async_track_state_change_event,
+        async_track_time_interval,
+    )
+
+    from .telemetry import TelemetryPublisher, parse_topics
+
+    if not await mqtt.async_wait_for_mqtt_client(hass):
+        _LOGGER.warning("MQTT is not available, telemetry is not published")
+        return
+
+    async def publish(topic: str, payload: bytes | str, qos: int) -> None:
+        try:
+            await mqtt.async_publish(hass, topic, payload, qos=qos, retain=True)
+        except HomeAssistantError as err:
+            _LOGGER.debug("Could not publish %s: %s", topic, err)
+
+    publisher = TelemetryPublisher(
+        publish,
+        entry.data[CONF_MQTT_PREFIX],
+        encoding=entry.data.get(CONF_MQTT_ENCODING, MQTT_ENCODING_JSON),
+        topics=parse_topics(entry.data.get(CONF_MQTT_TOPICS, "")),
+    )
+    # One lookup per source at start, state changes keep the snapshot after
+    for entity_id in publisher.entity_ids:
+        if (state := hass.states.get(entity_id)) is not None:
+            publisher.on_state(entity_id, state.state)
+
+    @callback
+    def state_changed(event: Event[EventStateChangedData]) -> None:
+        new_state = event.data["new_state"]
+        if publisher.on_state(
+            event.data["entity_id"], new_state.state if new_state else None
+        ) and publisher.due(time.time()):
+            entry.async_create_background_task(
+                hass, publisher.async_flush(), f"{DOMAIN}_telemetry"
+            )
+
+    async def heartbeat(now) -> None:
+        await publisher.async_flush()
+
+    entry.async_on_unload(
+        async_track_state_change_event(hass, publisher.entity_ids, state_changed)
+    )
+    entry.async_on_unload(
+        async_track_time_interval(hass, heartbeat, timedelta(seconds=1))
+    )
+    hass.data.setdefault(DATA_TELEMETRY, {})[entry.entry_id] = publisher
+    await publisher.async_flush()
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unload_ok:
+        hass.data.get(DOMAIN, {}).pop(entry.entry_id, None)
+        if coordinator := hass.data.get(DATA_MODBUS, {}).pop(entry.entry_id, None):
+            await coordinator.async_shutdown()
+        hass.data.get(DATA_TELEMETRY, {}).pop(entry.entry_id, None)
+        if price_cache := hass.data.get(DATA_PRICE_CACHE):
+            from .pricecache import entry_cache_key
+
+            price_cache.release(entry_cache_key(entry.data))
+    return unload_ok
@@ -0,0 +1,149 @@
+"""Append-only columnar archive of planned days.
+
+Every finished day is appended as one row per slot to a set of column
+files, raw little-endian arrays that are read back as memory maps:
+
+    starts.bin  int64    slot start, UTC epoch seconds
+    spot.bin    float64  spot price
+    buy.bin     float64  buy price
+    sell.bin    float64  sell price
+    mode.bin    int8     scheduled mode, index into MODES
+    soc.bin     float32  measured SoC at the slot start, NaN when unknown
+    energy.bin  float32  measured battery energy in kWh, + charged, - discharged
+
+days.bin indexes the columns with one record per day. Columns are written
+before the index record, so an interrupted append is cut off again on the
+next one. Scanning months of days reads a few MB without the recorder.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from datetime import date
+from typing import NamedTuple
+
+import numpy as np
+
+_LOGGER = logging.getLogger(__name__)
+
+MODES = ("Standby", "Charge", "Sell", "Selfuse")
+
+COLUMNS = {
+    "starts": np.dtype("<i8"),
+    "spot": np.dtype("<f8"),
+    "buy": np.dtype("<f8"),
+    "sell": np.dtype("<f8"),
+    "mode": np.dtype("i1"),
+    "soc": np.dtype("<f4"),
+    "energy": np.dtype("<f4"),
+}
+
+# Local date as proleptic ordinal, first row and number of rows of a day
+INDEX = np.dtype([("day", "<i4"), ("offset", "<i8"), ("slots", "<i4"), ("step", "<i4")])
+
+
+class ArchivedDays(NamedTuple):
+    """Columns of a range of archived days, memory mapped."""
+
+    days: np.ndarray
+    starts: np.ndarray
+    spot: np.ndarray
+    buy: np.ndarray
+    sell: np.ndarray
+    mode: np.ndarray
+    soc: np.ndarray
+    energy: np.ndarray
+
+
+def soc_at(starts: np.ndarray, times: np.ndarray, socs: np.ndarray) -> np.ndarray:
+    """Last SoC sample at or before each start, NaN before the first sample."""
+    if not len(times):
+        return np.full(len(starts), np.nan)
+    index = np.searchsorted(times, starts, side="right") - 1
+    return np.where(index >= 0, np.asarray(socs, np.float64)[index], np.nan)
+
+
+def battery_energy(soc: np.ndarray, capacity_kwh: float) -> np.ndarray:
+    """Energy per slot from the SoC at the slot boundaries, len(soc) - 1."""
+    return np.diff(soc) * capacity_kwh / 100
+
+
+class DayArchive:
+    """Column files of one config entry, all methods are blocking."""
+
+    def __init__(self, path: str) -> None:
+        """Initialize without touching the disk."""
+        self._path = path
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self._path, f"{name}.bin")
+
+    def _map(self, name: str, dtype: np.dtype) -> np.ndarray:
+        path = self._file(name)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        count = size // dtype.itemsize
+        if not count:
+            return np.empty(0, dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+    def index(self) -> np.ndarray:
+        """One INDEX record per archived day, in append order."""
+        return self._map("days", INDEX)
+
+    def append(
+        self,
+        day: date,
+        step: int,
+        starts: np.ndarray,
+        spot: np.ndarray,
+        buy: np.ndarray,
+        sell: np.ndarray,
+        modes: list[str],
+        soc: np.ndarray,
+        energy: np.ndarray,
+    ) -> bool:
+        """Append a day, returns False when it is already archived."""
+        index = self.index()
+        if len(index) and day.toordinal() in index["day"]:
+            return False
+        offset = int(index[-1]["offset"] + index[-1]["slots"]) if len(index) else 0
+        codes = {mode: code for code, mode in enumerate(MODES)}
+        values = {
+            "starts": starts,
+            "spot": spot,
+            "buy": buy,
+            "sell": sell,
+            "mode": [codes.get(mode, 0) for mode in modes],
+            "soc": soc,
+            "energy": energy,
+        }
+        slots = len(starts)
+        if any(len(column) != slots for column in values.values()):
+            raise ValueError(f"{day}: all columns need {slots} slots")
+        os.makedirs(self._path, exist_ok=True)
+        for name, dtype in COLUMNS.items():
+            with open(self._file(name), "ab") as file:
+                # Drop rows of an append that never got its index record
+                file.truncate(offset * dtype.itemsize)
+                file.write(np.asarray(values[name], dtype).tobytes())
+        record = np.array([(day.toordinal(), offset, slots, step)], INDEX)
+        with open(self._file("days"), "ab") as file:
+            file.write(record.tobytes())
+        _LOGGER.debug("Archived %s slots of %s", slots, day)
+        return True
+
+    def read(self, first: date | None = None, last: date | None = None) -> ArchivedDays:
+        """Columns of the days from first to last, both included."""
+        index = self.index()
+        if first is not None:
+            index = index[index["day"] >= first.toordinal()]
+        if last is not None:
+            index = index[index["day"] <= last.toordinal()]
+        begin = int(index[0]["offset"]) if len(index) else 0
+        end = int(index[-1]["offset"] + index[-1]["slots"]) if len(index) else 0
+        columns = {
+            name: self._map(name, dtype)[begin:end] for name, dtype in COLUMNS.items()
+        }
+        days = np.array([date.fromordinal(int(day)) for day in index["day"]])
+        return ArchivedDays(days, **columns)
@@ -0,0 +1,116 @@
+"""Charge and discharge decisions of the planned schedule."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from homeassistant.components.binary_sensor import BinarySensorEntity
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .scheduletimeline import DECISIONS, Decision, ScheduleTimeline
+
+if TYPE_CHECKING:
+    from .pricecalculator import PriceCalculator
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up the decision binary sensors."""
+    price_hub: PriceCalculator = hass.data[DOMAIN][config_entry.entry_id]
+    async_add_entities(
+        [
+            DecisionBinarySensor(price_hub, config_entry, decision)
+            for decision in DECISIONS
+        ]
+    )
+
+
+class DecisionBinarySensor(BinarySensorEntity):
+    """On while the schedule is in one of the decision's modes.
+
+    The runs are rebuilt when the schedule changes, in between a timer
+    flips the state at the next run boundary.
+    """
+
+    _attr_should_poll = False
+
+    def __init__(
+        self, price_hub: PriceCalculator, config_entry: ConfigEntry, decision: Decision
+    ) -> None:
+        """Initialize the sensor."""
+        self._price_hub = price_hub
+        self._decision = decision
+        self._attr_unique_id = f"{config_entry.entry_id}_{decision.key}"
+        self._attr_translation_key = decision.key
+        self._attr_name = decision.name
+        self._attr_icon = (
+            "mdi:battery-charging"
+            if "Charge" in decision.modes
+            else "mdi:battery-minus"
+        )
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, config_entry.entry_id)},
+            name="GridEnforcer",
+        )
+        self._timeline: ScheduleTimeline | None = None
+        self._unsub_change = None
+        self._attr_is_on = False
+        self._attr_extra_state_attributes = {"next_change": None}
+
+    async def async_added_to_hass(self) -> None:
+        """Follow the schedule updates."""
+        self.async_on_remove(
+            self._price_hub.async_add_schedule_listener(self._handle_schedule)
+        )
+        self.async_on_remove(self._cancel_change)
+        self._handle_schedule()
+
+    @callback
+    def _cancel_change(self) -> None:
+        if self._unsub_change is not None:
+            self._unsub_change()
+            self._unsub_change = None
+
+    @callback
+    def _handle_schedule(self) -> None:
+        self._timeline = ScheduleTimeline(
+            (*self._price_hub.schedule_today, *self._price_hub.schedule_tomorrow),
+            self._decision.modes,
+        )
+        self._handle_change()
+
+    @callback
+    def _handle_change(self, now: datetime | None = None) -> None:
+        """Set the state of now and wait for the next run boundary."""
+        if now is not None:
+            # Called by the timer, which is done
+            self._unsub_change = None
+        self._cancel_change()
+        epoch = dt_util.utcnow().timestamp()
+        is_on = self._timeline.is_on(epoch)
+        next_change = self._timeline.next_change(epoch)
+        at = None
+        if next_change is not None:
+            at = datetime.fromtimestamp(next_change, dt_util.UTC)
+            self._unsub_change = async_track_point_in_utc_time(
+                self.hass, self._handle_change, at
+            )
+        attributes = {"next_change": at.isoformat() if at is not None else None}
+        if (
+            is_on == self._attr_is_on
+            and attributes == self._attr_extra_state_attributes
+        ):
+            return
+        self._attr_is_on = is_on
+        self._attr_extra_state_attributes = attributes
+        self.async_write_ha_state()
@@ -0,0 +1,136 @@
+"""Change-only inverter mode commands with read-back verification.
+
+The YAML scripts switch modes by writing every register with a delay of a
+second or more between the writes. CommandWriter keeps the last confirmed
+register values, writes only the registers that differ from the requested
+mode, contiguous ones in a single request, and reads them back right
+away. A write that did not stick is retried with exponential backoff.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+
+from .invertermode import InverterMode
+from .modbus import ModbusReader, ModbusReadError, ModbusWriteError
+from .registers import HOLDING, SOLAX_REGISTERS, Block
+
+_LOGGER = logging.getLogger(__name__)
+
+# Write addresses, Solax reads them back from other registers
+USE_MODE_REGISTER = 31
+MANUAL_MODE_REGISTER = 32
+READ_BACK = {
+    USE_MODE_REGISTER: "inverter_mode_value",
+    MANUAL_MODE_REGISTER: "inverter_manual_mode_value",
+}
+
+USE_SELFUSE = 0
+USE_MANUAL = 3
+MANUAL_STOP = 0
+MANUAL_CHARGE = 1
+MANUAL_DISCHARGE = 2
+
+_STOP = {USE_MODE_REGISTER: USE_MANUAL, MANUAL_MODE_REGISTER: MANUAL_STOP}
+_CHARGE = {USE_MODE_REGISTER: USE_MANUAL, MANUAL_MODE_REGISTER: MANUAL_CHARGE}
+_DISCHARGE = {USE_MODE_REGISTER: USE_MANUAL, MANUAL_MODE_REGISTER: MANUAL_DISCHARGE}
+# Register values per mode, self use leaves the manual mode as it is
+MODE_REGISTERS = {
+    InverterMode.STANDBY: _STOP,
+    InverterMode.FULLYCHARGED: _STOP,
+    InverterMode.BACKUPSOC: _STOP,
+    InverterMode.CHARGING: _CHARGE,
+    InverterMode.CHARGESOC: _CHARGE,
+    InverterMode.FCRDD: _CHARGE,
+    InverterMode.DISCHARGING: _DISCHARGE,
+    InverterMode.FCRDU: _DISCHARGE,
+    InverterMode.SELFUSE: {USE_MODE_REGISTER: USE_SELFUSE},
+}
+
+ATTEMPTS = 4
+# Seconds before the first retry, doubled for every further one
+BACKOFF = 0.05
+
+
+class CommandError(Exception):
+    """The inverter did not take the requested mode."""
+
+
+def plan_writes(
+    target: dict[int, int], confirmed: dict[int, int]
+) -> list[tuple[int, list[int]]]:
+    """Registers differing from confirmed, as (address, values) per request."""
+    changed = sorted(
+        address for address, value in target.items() if confirmed.get(address) != value
+    )
+    writes: list[tuple[int, list[int]]] = []
+    for address in changed:
+        if writes and writes[-1][0] + len(writes[-1][1]) == address:
+            writes[-1][1].append(target[address])
+        else:
+            writes.append((address, [target[address]]))
+    return writes
+
+
+def _read_back_block() -> Block:
+    keys = set(READ_BACK.values())
+    return Block(
+        HOLDING,
+        sorted(
+            (register for register in SOLAX_REGISTERS if register.key in keys),
+            key=lambda register: register.address,
+        ),
+    )
+
+
+class CommandWriter:
+    """Writes inverter modes, keeps the confirmed register values."""
+
+    def __init__(
+        self, reader: ModbusReader, attempts: int = ATTEMPTS, backoff: float = BACKOFF
+    ) -> None:
+        """Initialize without a confirmed state, the first command writes all."""
+        self._reader = reader
+        self._attempts = attempts
+        self._backoff = backoff
+        self._read_back = _read_back_block()
+        self._lock = asyncio.Lock()
+        self.confirmed: dict[int, int] = {}
+        self.requests = 0
+
+    def observe(self, values: dict[str, Any]) -> None:
+        """Take the confirmed values from polled registers."""
+        for address, key in READ_BACK.items():
+            if values.get(key) is not None:
+                self.confirmed[address] = int(values[key])
+
+    async def set_mode(self, mode: InverterMode) -> dict[str, Any] | None:
+        """Bring the inverter to mode, returns the read back values.
+
+        Returns None when the inverter already is in mode, raises
+        CommandError when it is not after all attempts.
+        """
+        target = MODE_REGISTERS.get(mode)
+        if target is None or not plan_writes(target, self.confirmed):
+            return None
+        async with self._lock:
+            error: Exception | None = None
+            for attempt in range(self._attempts):
+                if attempt:
+                    await asyncio.sleep(self._backoff * 2 ** (attempt - 1))
+                writes = plan_writes(target, self.confirmed)
+                try:
+                    for address, values in writes:
+                        await self._reader.write_registers(address, values)
+                        self.requests += 1
+                    values = await self._reader.read_block(self._read_back)
+                except (ModbusReadError, ModbusWriteError) as err:
+                    error = err
+                    continue
+                self.observe(values)
+                if not plan_writes(target, self.confirmed):
+                    _LOGGER.debug("%s confirmed after %s attempts", mode, attempt + 1)
+                    return values
+        raise CommandError(f"{mode.value} not confirmed: {error or self.confirmed}")
@@ -18,17 +18,79 @@ from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import config_validation as cv
 
 from .const import (
+    AUTOTUNE_MODES,
+    AUTOTUNE_OFF,
+    CONF_ADAPTIVE_POLLING,
+    CONF_ARCHIVE,
+    CONF_AUTOTUNE,
+    CONF_AUTOTUNE_HISTORY,
     CONF_BAT_COST,
+    CONF_BATTERY_CAPACITY,
+    CONF_BATTERY_CURRENT_SENSOR,
+    CONF_BATTERY_EFFICIENCY,
+    CONF_CHARGE_POWER,
+    CONF_DISCHARGE_POWER,
     CONF_EXTRA_EXPORT,
     CONF_EXTRA_IMPORT,
     CONF_FCRDD_INPUT,
     CONF_FCRDU_INPUT,
+    CONF_FIT_SCHEDULE,
     CONF_HOURS_SELFUSE,
+    CONF_MODBUS_HOST,
+    CONF_MODBUS_PORT,
+    CONF_MODBUS_UNIT,
+    CONF_MPC,
+    CONF_MPC_DEVIATION,
+    CONF_MQTT_ENCODING,
+    CONF_MQTT_PREFIX,
+    CONF_MQTT_TOPICS,
+    CONF_PEAK_DETECTION,
+    CONF_PRICE_FILE,
+    CONF_PRICE_FILL,
+    CONF_PRICE_RESOLUTION,
     CONF_PRICE_SENSOR,
+    CONF_PRICE_SOURCE,
+    CONF_SCENARIO_FILE,
+    CONF_SCENARIO_SOURCE,
+    CONF_SCENARIOS,
+    CONF_SELFUSE_POWER,
+    CONF_SOC_DEADBAND,
+    CONF_SOC_FAULT_SLOPE,
+    CONF_SOC_HYSTERESIS,
     CONF_SOC_SENSOR,
     CONF_VAT,
+    DEFAULT_AUTOTUNE_HISTORY,
+    DEFAULT_BATTERY_CAPACITY,
+    DEFAULT_BATTERY_EFFICIENCY,
+    DEFAULT_CHARGE_POWER,
+    DEFAULT_DISCHARGE_POWER,
+    DEFAULT_MODBUS_PORT,
+    DEFAULT_MODBUS_UNIT,
+    DEFAULT_MPC_DEVIATION,
+    DEFAULT_PRICE_RESOLUTION,
+    DEFAULT_SELFUSE_POWER,
+    DEFAULT_SOC_DEADBAND,
+    DEFAULT_SOC_FAULT_SLOPE,
+    DEFAULT_SOC_HYSTERESIS,
     DOMAIN,
+    FILL_FORWARD,
+    FILL_METHODS,
+    MPC_MODES,
+    MPC_OFF,
+    MQTT_ENCODING_JSON,
+    MQTT_ENCODINGS,
+    PEAK_DETECTIONS,
+    PEAKS_DELTA,
+    PRICE_RESOLUTIONS,
+    PRICE_SOURCES,
+    SCENARIO_OBJECTIVES,
+    SCENARIO_SOURCES,
+    SCENARIOS_OFF,
+    SCENARIOS_WEEKDAY,
+    SOURCE_AUTO,
+    SOURCE_JSON_FILE,
 )
+from .telemetry import parse_topics
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -44,6 +106,66 @@ CONFIG_SCHEMA = vol.Schema(
         vol.Required(CONF_FCRDU_INPUT): cv.string,
         vol.Required(CONF_FCRDD_INPUT): cv.string,
         vol.Required(CONF_HOURS_SELFUSE): vol.All(cv.string, vol.Coerce(float)),
+        vol.Optional(CONF_PRICE_SOURCE, default=SOURCE_AUTO): vol.In(PRICE_SOURCES),
+        vol.Optional(CONF_PRICE_FILE, default=""): cv.string,
+        vol.Optional(CONF_PRICE_RESOLUTION, default=DEFAULT_PRICE_RESOLUTION): vol.All(
+            vol.Coerce(int), vol.In(PRICE_RESOLUTIONS)
+        ),
+        vol.Optional(CONF_PRICE_FILL, default=FILL_FORWARD): vol.In(FILL_METHODS),
+        vol.Optional(CONF_PEAK_DETECTION, default=PEAKS_DELTA): vol.In(PEAK_DETECTIONS),
+        vol.Optional(CONF_AUTOTUNE, default=AUTOTUNE_OFF): vol.In(AUTOTUNE_MODES),
+        vol.Optional(CONF_AUTOTUNE_HISTORY, default=DEFAULT_AUTOTUNE_HISTORY): vol.All(
+            vol.Coerce(int), vol.Range(min=0, max=31)
+        ),
+        vol.Optional(CONF_SCENARIOS, default=SCENARIOS_OFF): vol.In(
+            SCENARIO_OBJECTIVES
+        ),
+        vol.Optional(CONF_SCENARIO_SOURCE, default=SCENARIOS_WEEKDAY): vol.In(
+            SCENARIO_SOURCES
+        ),
+        vol.Optional(CONF_SCENARIO_FILE, default=""): cv.string,
+        vol.Optional(CONF_MPC, default=MPC_OFF): vol.In(MPC_MODES),
+        vol.Optional(CONF_MPC_DEVIATION, default=DEFAULT_MPC_DEVIATION): vol.All(
+            vol.Coerce(float), vol.Range(min=0.0, max=100.0)
+        ),
+        vol.Optional(CONF_BATTERY_CAPACITY, default=DEFAULT_BATTERY_CAPACITY): vol.All(
+            vol.Coerce(float), vol.Range(min=0.1)
+        ),
+        vol.Optional(CONF_CHARGE_POWER, default=DEFAULT_CHARGE_POWER): vol.All(
+            vol.Coerce(float), vol.Range(min=0.0)
+        ),
+        vol.Optional(CONF_DISCHARGE_POWER, default=DEFAULT_DISCHARGE_POWER): vol.All(
+            vol.Coerce(float), vol.Range(min=0.0)
+        ),
+        vol.Optional(CONF_SELFUSE_POWER, default=DEFAULT_SELFUSE_POWER): vol.All(
+            vol.Coerce(float), vol.Range(min=0.0)
+        ),
+        vol.Optional(
+            CONF_BATTERY_EFFICIENCY, default=DEFAULT_BATTERY_EFFICIENCY
+        ): vol.All(vol.Coerce(float), vol.Range(min=1.0, max=100.0)),
+        vol.Optional(CONF_FIT_SCHEDULE, default=False): cv.boolean,
+        vol.Optional(CONF_ARCHIVE, default=True): cv.boolean,
+        vol.Optional(CONF_MODBUS_HOST, default=""): cv.string,
+        vol.Optional(CONF_MODBUS_PORT, default=DEFAULT_MODBUS_PORT): cv.port,
+        vol.Optional(CONF_MODBUS_UNIT, default=DEFAULT_MODBUS_UNIT): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=247)
+        ),
+        vol.Optional(CONF_ADAPTIVE_POLLING, default=True): cv.boolean,
+        vol.Optional(CONF_SOC_DEADBAND, default=DEFAULT_SOC_DEADBAND): vol.All(
+            vol.Coerce(float), vol.Range(min=0.0, max=10.0)
+        ),
+        vol.Optional(CONF_SOC_HYSTERESIS, default=DEFAULT_SOC_HYSTERESIS): vol.All(
+            vol.Coerce(float), vol.Range(min=0.0, max=10.0)
+        ),
+        vol.Optional(CONF_BATTERY_CURRENT_SENSOR, default=""): cv.string,
+        vol.Optional(CONF_SOC_FAULT_SLOPE, default=DEFAULT_SOC_FAULT_SLOPE): vol.All(
+            vol.Coerce(float), vol.Range(min=0.0)
+        ),
+        vol.Optional(CONF_MQTT_PREFIX, default=""): cv.string,
+        vol.Optional(CONF_MQTT_ENCODING, default=MQTT_ENCODING_JSON): vol.In(
+            MQTT_ENCODINGS
+        ),
+        vol.Optional(CONF_MQTT_TOPICS, default=""): cv.string,
     }
 )
 
@@ -63,6 +185,22 @@ class PlaceholderHub:
         return True
 
 
+def _price_file_missing(data: dict[str, Any]) -> bool:
+    """The json_file price source reads nothing without a file path."""
+    return data.get(CONF_PRICE_SOURCE) == SOURCE_JSON_FILE and not data.get(
+        CONF_PRICE_FILE
+    )
+
+
+def _mqtt_topics_invalid(data: dict[str, Any]) -> bool:
+    """Topic entries of unknown packages or without a topic."""
+    try:
+        parse_topics(data.get(CONF_MQTT_TOPICS, ""))
+    except ValueError:
+        return True
+    return False
+
+
 async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
     """Validate the user input allows us to connect.
 
@@ -87,6 +225,10 @@ async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str,
     # InvalidAuth
     if not hass.states.get(data[CONF_PRICE_SENSOR]):
         raise InvalidSensor
+    if _price_file_missing(data):
+        raise InvalidPriceFile
+    if _mqtt_topics_invalid(data):
+        raise InvalidMqttTopics
 
     # Return info that you want to store in the config entry.
     return {"title": "GridEnforcerControl"}
@@ -96,6 +238,7 @@ class ConfigFlow(ConfigFlow, domain=DOMAIN):  # type: ignore[call-arg]
     """Handle a config flow for GridEnForcerControl."""
 
     VERSION = 1
+    MINOR_VERSION = 2
 
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
@@ -111,6 +254,10 @@ class ConfigFlow(ConfigFlow, domain=DOMAIN):  # type: ignore[call-arg]
                 errors["base"] = "cannot_connect"
             except InvalidAuth:
                 errors["base"] = "invalid_auth"
+            except InvalidPriceFile:
+                errors[CONF_PRICE_FILE] = "price_file_required"
+            except InvalidMqttTopics:
+                errors[CONF_MQTT_TOPICS] = "invalid_mqtt_topics"
             except Exception:
                 _LOGGER.exception("Unexpected exception")
                 errors["base"] = "unknown"
@@ -141,11 +288,19 @@ class OptionsFlowHandler(OptionsFlow):  # type: ignore[misc]
         self, user_input: dict[str, Any] | None = None
     ) -> dict[str, Any]:
         """Manage the options."""
+        errors: dict[str, str] = {}
         if user_input is not None:
-            self.hass.config_entries.async_update_entry(
-                self._config_entry, data=user_input, options=self._config_entry.options
-            )
-            return self.async_create_entry(title="", data={})
+            if _price_file_missing(user_input):
+                errors[CONF_PRICE_FILE] = "price_file_required"
+            if _mqtt_topics_invalid(user_input):
+                errors[CONF_MQTT_TOPICS] = "invalid_mqtt_topics"
+            if not errors:
+                self.hass.config_entries.async_update_entry(
+                    self._config_entry,
+                    data=user_input,
+                    options=self._config_entry.options,
+                )
+                return self.async_create_entry(title="", data={})
 
         schema: dict[Any, Any] = {
             vol.Required(
@@ -182,11 +337,162 @@ class OptionsFlowHandler(OptionsFlow):  # type: ignore[misc]
                 CONF_HOURS_SELFUSE,
                 default=self._config_entry.data.get(CONF_HOURS_SELFUSE),
             ): vol.All(cv.string, vol.Coerce(float)),
+            vol.Optional(
+                CONF_PRICE_SOURCE,
+                default=self._config_entry.data.get(CONF_PRICE_SOURCE, SOURCE_AUTO),
+            ): vol.In(PRICE_SOURCES),
+            vol.Optional(
+                CONF_PRICE_FILE,
+                default=self._config_entry.data.get(CONF_PRICE_FILE, ""),
+            ): cv.string,
+            vol.Optional(
+                CONF_PRICE_RESOLUTION,
+                default=self._config_entry.data.get(
+                    CONF_PRICE_RESOLUTION, DEFAULT_PRICE_RESOLUTION
+                ),
+            ): vol.All(vol.Coerce(int), vol.In(PRICE_RESOLUTIONS)),
+            vol.Optional(
+                CONF_PRICE_FILL,
+                default=self._config_entry.data.get(CONF_PRICE_FILL, FILL_FORWARD),
+            ): vol.In(FILL_METHODS),
+            vol.Optional(
+                CONF_PEAK_DETECTION,
+                default=self._config_entry.data.get(CONF_PEAK_DETECTION, PEAKS_DELTA),
+            ): vol.In(PEAK_DETECTIONS),
+            vol.Optional(
+                CONF_AUTOTUNE,
+                default=self._config_entry.data.get(CONF_AUTOTUNE, AUTOTUNE_OFF),
+            ): vol.In(AUTOTUNE_MODES),
+            vol.Optional(
+                CONF_AUTOTUNE_HISTORY,
+                default=self._config_entry.data.get(
+                    CONF_AUTOTUNE_HISTORY, DEFAULT_AUTOTUNE_HISTORY
+                ),
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=31)),
+            vol.Optional(
+                CONF_SCENARIOS,
+                default=self._config_entry.data.get(CONF_SCENARIOS, SCENARIOS_OFF),
+            ): vol.In(SCENARIO_OBJECTIVES),
+            vol.Optional(
+                CONF_SCENARIO_SOURCE,
+                default=self._config_entry.data.get(
+                    CONF_SCENARIO_SOURCE, SCENARIOS_WEEKDAY
+                ),
+            ): vol.In(SCENARIO_SOURCES),
+            vol.Optional(
+                CONF_SCENARIO_FILE,
+                default=self._config_entry.data.get(CONF_SCENARIO_FILE, ""),
+            ): cv.string,
+            vol.Optional(
+                CONF_MPC, default=self._config_entry.data.get(CONF_MPC, MPC_OFF)
+            ): vol.In(MPC_MODES),
+            vol.Optional(
+                CONF_MPC_DEVIATION,
+                default=self._config_entry.data.get(
+                    CONF_MPC_DEVIATION, DEFAULT_MPC_DEVIATION
+                ),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0.0, max=100.0)),
+            vol.Optional(
+                CONF_BATTERY_CAPACITY,
+                default=self._config_entry.data.get(
+                    CONF_BATTERY_CAPACITY, DEFAULT_BATTERY_CAPACITY
+                ),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+            vol.Optional(
+                CONF_CHARGE_POWER,
+                default=self._config_entry.data.get(
+                    CONF_CHARGE_POWER, DEFAULT_CHARGE_POWER
+                ),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0.0)),
+            vol.Optional(
+                CONF_DISCHARGE_POWER,
+                default=self._config_entry.data.get(
+                    CONF_DISCHARGE_POWER, DEFAULT_DISCHARGE_POWER
+                ),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0.0)),
+            vol.Optional(
+                CONF_SELFUSE_POWER,
+                default=self._config_entry.data.get(
+                    CONF_SELFUSE_POWER, DEFAULT_SELFUSE_POWER
+                ),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0.0)),
+            vol.Optional(
+                CONF_BATTERY_EFFICIENCY,
+                default=self._config_entry.data.get(
+                    CONF_BATTERY_EFFICIENCY, DEFAULT_BATTERY_EFFICIENCY
+                ),
+            ): vol.All(vol.Coerce(float), vol.Range(min=1.0, max=100.0)),
+            vol.Optional(
+                CONF_FIT_SCHEDULE,
+                default=self._config_entry.data.get(CONF_FIT_SCHEDULE, False),
+            ): cv.boolean,
+            vol.Optional(
+                CONF_ARCHIVE,
+                default=self._config_entry.data.get(CONF_ARCHIVE, True),
+            ): cv.boolean,
+            vol.Optional(
+                CONF_MODBUS_HOST,
+                default=self._config_entry.data.get(CONF_MODBUS_HOST, ""),
+            ): cv.string,
+            vol.Optional(
+                CONF_MODBUS_PORT,
+                default=self._config_entry.data.get(
+                    CONF_MODBUS_PORT, DEFAULT_MODBUS_PORT
+                ),
+            ): cv.port,
+            vol.Optional(
+                CONF_MODBUS_UNIT,
+                default=self._config_entry.data.get(
+                    CONF_MODBUS_UNIT, DEFAULT_MODBUS_UNIT
+                ),
+            ): vol.All(vol.Coerce(int), vol.Range(min=1, max=247)),
+            vol.Optional(
+                CONF_ADAPTIVE_POLLING,
+                default=self._config_entry.data.get(CONF_ADAPTIVE_POLLING, True),
+            ): cv.boolean,
+            vol.Optional(
+                CONF_SOC_DEADBAND,
+                default=self._config_entry.data.get(
+                    CONF_SOC_DEADBAND, DEFAULT_SOC_DEADBAND
+                ),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0.0, max=10.0)),
+            vol.Optional(
+                CONF_SOC_HYSTERESIS,
+                default=self._config_entry.data.get(
+                    CONF_SOC_HYSTERESIS, DEFAULT_SOC_HYSTERESIS
+                ),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0.0, max=10.0)),
+            vol.Optional(
+                CONF_BATTERY_CURRENT_SENSOR,
+                default=self._config_entry.data.get(CONF_BATTERY_CURRENT_SENSOR, ""),
+            ): cv.string,
+            vol.Optional(
+                CONF_SOC_FAULT_SLOPE,
+                default=self._config_entry.data.get(
+                    CONF_SOC_FAULT_SLOPE, DEFAULT_SOC_FAULT_SLOPE
+                ),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0.0)),
+            vol.Optional(
+                CONF_MQTT_PREFIX,
+                default=self._config_entry.data.get(CONF_MQTT_PREFIX, ""),
+            ): cv.string,
+            vol.Optional(
+                CONF_MQTT_ENCODING,
+                default=self._config_entry.data.get(
+                    CONF_MQTT_ENCODING, MQTT_ENCODING_JSON
+                ),
+            ): vol.In(MQTT_ENCODINGS),
+            vol.Optional(
+                CONF_MQTT_TOPICS,
+                default=self._config_entry.data.get(CONF_MQTT_TOPICS, ""),
+            ): cv.string,
         }
 
         return cast(
             dict[str, Any],
-            self.async_show_form(step_id="init", data_schema=vol.Schema(schema)),
+            self.async_show_form(
+                step_id="init", data_schema=vol.Schema(schema), errors=errors
+            ),
         )
 
 
@@ -200,3 +506,11 @@ class InvalidAuth(HomeAssistantError):
 
 class InvalidSensor(HomeAssistantError):
     """Error to indicate there is invalid auth."""
+
+
+class InvalidPriceFile(HomeAssistantError):
+    """Error to indicate the json_file price source has no file."""
+
+
+class InvalidMqttTopics(HomeAssistantError):
+    """Error to indicate a topic entry of an unknown package."""
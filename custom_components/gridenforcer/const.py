@@ -13,3 +13,123 @@ CONF_SOC_SENSOR = "bat_soc"
 CONF_FCRDU_INPUT = "fcr_d_up_input"
 CONF_FCRDD_INPUT = "fcr_d_down_input"
 CONF_HOURS_SELFUSE = "hours_selfuse"
+CONF_PRICE_SOURCE = "price_source"
+CONF_PRICE_FILE = "price_file"
+
+# Price source adapters, see pricesource.py
+SOURCE_AUTO = "auto"
+SOURCE_NORDPOOL = "nordpool"
+SOURCE_ENTSOE = "entsoe"
+SOURCE_FLAT = "flat"
+SOURCE_JSON_FILE = "json_file"
+PRICE_SOURCES = [
+    SOURCE_AUTO,
+    SOURCE_NORDPOOL,
+    SOURCE_ENTSOE,
+    SOURCE_FLAT,
+    SOURCE_JSON_FILE,
+]
+
+# Resolution (minutes) and gap filling of price series, see resample.py
+CONF_PRICE_RESOLUTION = "price_resolution"
+CONF_PRICE_FILL = "price_fill"
+DEFAULT_PRICE_RESOLUTION = 60
+PRICE_RESOLUTIONS = [15, 60]
+FILL_FORWARD = "ffill"
+FILL_INTERPOLATE = "interpolate"
+# Entries may still hold "none" from when gaps could be kept, it forward fills
+FILL_METHODS = [FILL_FORWARD, FILL_INTERPOLATE]
+
+# Peak detection, fixed DELTA or prominence relative to the day, see peaks.py
+CONF_PEAK_DETECTION = "peak_detection"
+PEAKS_DELTA = "delta"
+PEAKS_PROMINENCE = "prominence"
+PEAK_DETECTIONS = [PEAKS_DELTA, PEAKS_PROMINENCE]
+
+# Auto-tuning of the planning parameters, see tuning.py
+CONF_AUTOTUNE = "autotune"
+CONF_AUTOTUNE_HISTORY = "autotune_history_days"
+AUTOTUNE_OFF = "off"
+AUTOTUNE_SUGGEST = "suggest"
+AUTOTUNE_APPLY = "apply"
+AUTOTUNE_MODES = [AUTOTUNE_OFF, AUTOTUNE_SUGGEST, AUTOTUNE_APPLY]
+# Past days of prices kept for the sweep and the scenario planning
+DEFAULT_AUTOTUNE_HISTORY = 7
+
+# Planning tomorrow over price scenarios until its prices are published
+CONF_SCENARIOS = "scenario_planning"
+CONF_SCENARIO_SOURCE = "scenario_source"
+CONF_SCENARIO_FILE = "scenario_file"
+SCENARIOS_OFF = "off"
+SCENARIOS_EXPECTED = "expected"
+SCENARIOS_WORST_CASE = "worst_case"
+SCENARIO_OBJECTIVES = [SCENARIOS_OFF, SCENARIOS_EXPECTED, SCENARIOS_WORST_CASE]
+SCENARIOS_WEEKDAY = "weekday"
+SCENARIOS_AVERAGE = "average"
+SCENARIOS_FILE = "file"
+SCENARIO_SOURCES = [SCENARIOS_WEEKDAY, SCENARIOS_AVERAGE, SCENARIOS_FILE]
+
+# Re-planning of the remaining horizon from the measured SoC, see mpc.py
+CONF_MPC = "mpc"
+CONF_MPC_DEVIATION = "mpc_soc_deviation"
+MPC_OFF = "off"
+MPC_ADVISE = "advise"
+MPC_CONTROL = "control"
+MPC_MODES = [MPC_OFF, MPC_ADVISE, MPC_CONTROL]
+# SoC difference in % from the projection that triggers a re-plan
+DEFAULT_MPC_DEVIATION = 5.0
+
+# Battery used for the projected SoC of the schedules, see simulate.py
+CONF_BATTERY_CAPACITY = "battery_capacity"
+CONF_CHARGE_POWER = "charge_power"
+CONF_DISCHARGE_POWER = "discharge_power"
+CONF_SELFUSE_POWER = "selfuse_power"
+CONF_BATTERY_EFFICIENCY = "battery_efficiency"
+CONF_FIT_SCHEDULE = "fit_schedule"
+DEFAULT_BATTERY_CAPACITY = 10.0
+DEFAULT_CHARGE_POWER = 5.0
+DEFAULT_DISCHARGE_POWER = 5.0
+DEFAULT_SELFUSE_POWER = 2.5
+# One way efficiency in %
+DEFAULT_BATTERY_EFFICIENCY = 95.0
+
+# Append finished days to the archive under the config directory
+CONF_ARCHIVE = "archive"
+
+# Inverter polled directly over Modbus TCP, off without a host
+CONF_MODBUS_HOST = "modbus_host"
+CONF_MODBUS_PORT = "modbus_port"
+CONF_MODBUS_UNIT = "modbus_unit"
+DEFAULT_MODBUS_PORT = 502
+DEFAULT_MODBUS_UNIT = 1
+# Adapt the polling interval of each register block, see polling.py
+CONF_ADAPTIVE_POLLING = "adaptive_polling"
+
+# SoC limits of the inverter mode, see soccontrol.py
+CONF_SOC_DEADBAND = "soc_deadband"
+CONF_SOC_HYSTERESIS = "soc_hysteresis"
+# SoC change in % that is worth a decision
+DEFAULT_SOC_DEADBAND = 0.5
+# SoC in % past a threshold before the mode taken at it is left
+DEFAULT_SOC_HYSTERESIS = 1.0
+# BMS SoC jumps, see socfault.py
+CONF_BATTERY_CURRENT_SENSOR = "battery_current_sensor"
+CONF_SOC_FAULT_SLOPE = "soc_fault_slope"
+# SoC change in %/h that is a jump when the battery is idle
+DEFAULT_SOC_FAULT_SLOPE = 20.0
+EVENT_SOC_FAULT = f"{DOMAIN}_soc_fault"
+
+# Telemetry published over MQTT, off without a topic prefix, see telemetry.py
+CONF_MQTT_PREFIX = "mqtt_prefix"
+CONF_MQTT_ENCODING = "mqtt_encoding"
+# "package=topic" entries for the packages not published under the prefix
+CONF_MQTT_TOPICS = "mqtt_topics"
+MQTT_ENCODING_JSON = "json"
+MQTT_ENCODING_BINARY = "binary"
+MQTT_ENCODINGS = [MQTT_ENCODING_JSON, MQTT_ENCODING_BINARY]
+
+# Shared between config entries, keyed outside hass.data[DOMAIN] (entry_id -> hub)
+DATA_MODBUS = f"{DOMAIN}_modbus"
+DATA_TELEMETRY = f"{DOMAIN}_telemetry"
+DATA_WEBSOCKET = f"{DOMAIN}_websocket"
+DATA_PRICE_CACHE = f"{DOMAIN}_price_cache"
@@ -0,0 +1,83 @@
+"""Coordinator polling the inverter registers over Modbus."""
+
+from __future__ import annotations
+
+import logging
+import time
+from datetime import timedelta
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .commands import CommandWriter
+from .const import DOMAIN
+from .invertermode import InverterMode
+from .modbus import ModbusReader, ModbusReadError
+from .polling import AdaptivePoller
+from .registers import SOLAX_REGISTERS, Block, Register, plan_blocks
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SolaxModbusCoordinator(DataUpdateCoordinator[dict[str, Any]]):
+    """Reads the register blocks that are due on every tick.
+
+    The coordinator ticks at the shortest interval any block may get, the
+    poller decides which blocks are due. Blocks not read keep their values.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        config_entry: ConfigEntry,
+        reader: ModbusReader,
+        blocks: list[Block] | None = None,
+        adaptive: bool = True,
+    ) -> None:
+        """Initialize with the blocks of the Solax register map by default."""
+        self.blocks = blocks or plan_blocks(SOLAX_REGISTERS)
+        self._poller = AdaptivePoller(self.blocks, adapt=adaptive)
+        super().__init__(
+            hass,
+            _LOGGER,
+            config_entry=config_entry,
+            name=f"{DOMAIN} modbus",
+            update_interval=timedelta(seconds=self._poller.tick),
+        )
+        self._reader = reader
+        self.writer = CommandWriter(reader)
+
+    @property
+    def registers(self) -> list[Register]:
+        return [register for block in self.blocks for register in block.registers]
+
+    @property
+    def poll_metrics(self) -> dict[str, Any]:
+        return self._poller.metrics(time.monotonic())
+
+    async def _async_update_data(self) -> dict[str, Any]:
+        values = dict(self.data or {})
+        try:
+            for index in self._poller.due(time.monotonic()):
+                start = time.monotonic()
+                block_values = await self._reader.read_block(self.blocks[index])
+                now = time.monotonic()
+                self._poller.record(index, now, block_values, now - start)
+                values.update(block_values)
+            self.writer.observe(values)
+        except ModbusReadError as err:
+            self._reader.close()
+            raise UpdateFailed(str(err)) from err
+        return values
+
+    async def async_set_mode(self, mode: InverterMode) -> None:
+        """Write the registers of mode that differ, raises CommandError."""
+        if (values := await self.writer.set_mode(mode)) is not None:
+            self.async_set_updated_data({**(self.data or {}), **values})
+
+    async def async_shutdown(self) -> None:
+        """Stop polling and close the connection."""
+        await super().async_shutdown()
+        self._reader.close()
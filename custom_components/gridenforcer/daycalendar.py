@@ -0,0 +1,97 @@
+"""Local day calendar with precomputed slot boundaries.
+
+Local days are 23 or 25 hours long on DST transition days, so days are
+split on the epoch of local midnight instead of every 24 slots. Calendars
+and zones are cached, stages look slots up by index instead of doing
+datetime arithmetic.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, tzinfo
+from functools import lru_cache
+from typing import NamedTuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+DEFAULT_TIME_ZONE = "Europe/Stockholm"
+
+
+@lru_cache(maxsize=None)
+def get_zone(key: str = DEFAULT_TIME_ZONE) -> ZoneInfo:
+    """Return the zone for key, created once."""
+    return ZoneInfo(key)
+
+
+class DayCalendar(NamedTuple):
+    """Slot boundaries of one local day."""
+
+    day: date
+    tz: tzinfo
+    step: int
+    # Epoch seconds of local midnight starting and ending the day
+    start: int
+    end: int
+    # Epoch seconds of every slot start
+    starts: np.ndarray
+
+    @property
+    def slots(self) -> int:
+        """Number of slots, e.g. 23, 24 or 25 for hourly prices."""
+        return len(self.starts)
+
+    def slot_of(self, epoch: float) -> int | None:
+        """Index of the slot containing epoch, None outside the day."""
+        if not self.start <= epoch < self.end:
+            return None
+        return int((epoch - self.start) // self.step)
+
+    def start_datetime(self, slot: int) -> datetime:
+        """Start of a slot as an aware local datetime."""
+        return datetime.fromtimestamp(int(self.starts[slot]), self.tz)
+
+
+@lru_cache(maxsize=64)
+def day_calendar(tz: tzinfo, day: date, step: int = 3600) -> DayCalendar:
+    """Return the calendar for a local day, computed once per zone and date."""
+    following = day + timedelta(days=1)
+    start = int(datetime(day.year, day.month, day.day, tzinfo=tz).timestamp())
+    end = int(
+        datetime(following.year, following.month, following.day, tzinfo=tz).timestamp()
+    )
+    starts = np.arange(start, end, step, dtype=np.int64)
+    starts.setflags(write=False)
+    return DayCalendar(day, tz, step, start, end, starts)
+
+
+def calendar_for(epoch: float, tz: tzinfo, step: int = 3600) -> DayCalendar:
+    """Return the calendar of the local day containing epoch."""
+    return day_calendar(tz, datetime.fromtimestamp(epoch, tz).date(), step)
+
+
+def day_slices(starts: np.ndarray, tz: tzinfo) -> list[slice]:
+    """Split sorted slot starts (epoch seconds) into local days.
+
+    Returns one slice per local day present in starts.
+    """
+    if not len(starts):
+        return []
+    slices = []
+    begin = 0
+    calendar = calendar_for(int(starts[0]), tz)
+    while begin < len(starts):
+        stop = int(np.searchsorted(starts, calendar.end, side="left"))
+        slices.append(slice(begin, stop))
+        begin = stop
+        if begin < len(starts):
+            calendar = calendar_for(int(starts[begin]), tz)
+    return slices
+
+
+def slot_index(starts: np.ndarray, ends: np.ndarray, epoch: float) -> int | None:
+    """Index of the slot containing epoch in sorted slot starts, if any."""
+    index = int(np.searchsorted(starts, epoch, side="right")) - 1
+    if index < 0 or epoch >= ends[index]:
+        return None
+    return index
@@ -0,0 +1,116 @@
+"""FCR-D activation fast path and its latency.
+
+An FCR-D input flips when the grid frequency leaves the normal band and the
+battery has to respond within seconds. The flip switches the inverter mode
+straight away, no schedule is recomputed, and the mode from before the
+activation is restored when the last activation ends. Modes requested by
+the schedule or the SoC limits while FCR-D is active only replace the mode
+to restore.
+
+The latency from the input flip to the mode state write is kept per
+activation, with the time until the inverter confirmed the mode when it
+is commanded over Modbus.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+
+import numpy as np
+
+from .invertermode import InverterMode
+
+# Milliseconds from input flip to state write
+TARGET_MS = 50.0
+# Latencies the percentiles are computed over
+WINDOW = 100
+
+
+class FcrdOverride:
+    """Mode of the active FCR-D inputs and the mode to restore."""
+
+    def __init__(self) -> None:
+        """Initialize without an active input."""
+        # Active inputs, up or not, in the order they activated
+        self._active: dict[bool, None] = {}
+        self.restore_mode: InverterMode | None = None
+
+    @property
+    def active(self) -> bool:
+        return bool(self._active)
+
+    @property
+    def mode(self) -> InverterMode | None:
+        """Mode of the latest active input."""
+        if not self._active:
+            return None
+        return (
+            InverterMode.FCRDU if next(reversed(self._active)) else InverterMode.FCRDD
+        )
+
+    def set(self, up: bool, active: bool, current: InverterMode) -> InverterMode | None:
+        """Mode after an input flipped, None when the mode stays.
+
+        current is the mode before the flip, restored when no input is
+        active any more.
+        """
+        before = self.mode
+        if active:
+            if not self._active:
+                self.restore_mode = current
+            self._active.pop(up, None)
+            self._active[up] = None
+        elif self._active.pop(up, False) is False:
+            return None
+        after = self.mode if self._active else self.restore_mode
+        if after == (before or current):
+            return None
+        return after
+
+    def defer(self, mode: InverterMode) -> bool:
+        """Restore mode after FCR-D, False when no input is active."""
+        if not self._active:
+            return False
+        self.restore_mode = mode
+        return True
+
+
+class LatencyStats:
+    """Recent latencies in milliseconds against a target."""
+
+    def __init__(self, target_ms: float = TARGET_MS, window: int = WINDOW) -> None:
+        """Initialize without latencies."""
+        self.target_ms = target_ms
+        self._latencies: deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.over_target = 0
+
+    def record(self, milliseconds: float) -> bool:
+        """Add a latency, False when it missed the target."""
+        self._latencies.append(milliseconds)
+        self.count += 1
+        if milliseconds > self.target_ms:
+            self.over_target += 1
+            return False
+        return True
+
+    def to_dict(self) -> dict[str, float | int | None]:
+        result: dict[str, float | int | None] = {
+            "count": self.count,
+            "over_target": self.over_target,
+            "target_ms": self.target_ms,
+            "last_ms": None,
+            "p50_ms": None,
+            "p95_ms": None,
+            "max_ms": None,
+        }
+        if self._latencies:
+            latencies = np.fromiter(self._latencies, np.float64)
+            p50, p95 = np.percentile(latencies, [50, 95])
+            result.update(
+                last_ms=round(self._latencies[-1], 1),
+                p50_ms=round(float(p50), 1),
+                p95_ms=round(float(p95), 1),
+                max_ms=round(float(latencies.max()), 1),
+            )
+        return result
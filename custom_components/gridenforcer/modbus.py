@@ -0,0 +1,104 @@
+"""Batched Modbus TCP reads and writes of the inverter registers."""
+
+from __future__ import annotations
+
+import inspect
+import logging
+import struct
+from collections.abc import Callable
+from typing import Any
+
+from pymodbus.client import AsyncModbusTcpClient
+from pymodbus.exceptions import ModbusException
+
+from .registers import HOLDING, MAX_REGISTERS, Block
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ModbusReadError(Exception):
+    """A block could not be read."""
+
+
+class ModbusWriteError(Exception):
+    """Registers could not be written."""
+
+
+def unit_keyword(method: Callable[..., Any]) -> str:
+    """Keyword of the unit id, pymodbus 3.10 renamed slave to device_id.
+
+    Home Assistant's own modbus integration pins older versions, both have
+    to work in the same install.
+    """
+    if "device_id" in inspect.signature(method).parameters:
+        return "device_id"
+    return "slave"
+
+
+class ModbusReader:
+    """Reads blocks of registers into one shared buffer."""
+
+    def __init__(self, host: str, port: int = 502, unit: int = 1) -> None:
+        """Initialize without connecting."""
+        self._client = AsyncModbusTcpClient(host, port=port)
+        # Unit id as the keyword the installed pymodbus expects
+        self._unit_kwargs = {
+            unit_keyword(AsyncModbusTcpClient.read_holding_registers): unit
+        }
+        # Registers of every block are packed here and decoded in place
+        self._buffer = bytearray(2 * MAX_REGISTERS)
+        self._packers: dict[int, struct.Struct] = {}
+        self.requests = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._client.connected
+
+    async def connect(self) -> None:
+        """Connect if not connected, raises ModbusReadError on failure."""
+        if not self._client.connected and not await self._client.connect():
+            raise ModbusReadError("Could not connect to the inverter")
+
+    def close(self) -> None:
+        self._client.close()
+
+    async def read_block(self, block: Block) -> dict[str, Any]:
+        """Read and decode one block."""
+        await self.connect()
+        read = (
+            self._client.read_holding_registers
+            if block.table == HOLDING
+            else self._client.read_input_registers
+        )
+        try:
+            response = await read(block.address, count=block.count, **self._unit_kwargs)
+        except ModbusException as err:
+            raise ModbusReadError(f"{block}: {err}") from err
+        self.requests += 1
+        if response.isError():
+            raise ModbusReadError(f"{block}: {response}")
+        packer = self._packers.get(block.count)
+        if packer is None:
+            packer = self._packers[block.count] = struct.Struct(f">{block.count}H")
+        packer.pack_into(self._buffer, 0, *response.registers)
+        return block.decode(self._buffer)
+
+    async def read(self, blocks: list[Block]) -> dict[str, Any]:
+        """Read the blocks one after the other, values by register key."""
+        values: dict[str, Any] = {}
+        for block in blocks:
+            values.update(await self.read_block(block))
+        return values
+
+    async def write_registers(self, address: int, values: list[int]) -> None:
+        """Write contiguous holding registers with one request."""
+        await self.connect()
+        try:
+            response = await self._client.write_registers(
+                address, values, **self._unit_kwargs
+            )
+        except ModbusException as err:
+            raise ModbusWriteError(f"{address}: {err}") from err
+        self.requests += 1
+        if response.isError():
+            raise ModbusWriteError(f"{address}: {response}")
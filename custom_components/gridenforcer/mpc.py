@@ -0,0 +1,199 @@
+"""Model predictive re-optimization of the remaining plan from the live SoC.
+
+The horizon (the remaining slots of today and tomorrow) is solved with a
+backward dynamic program over SoC levels in 1 % steps:
+
+    V[t, soc] = max over modes of reward(t, mode, soc) + V[t + 1, next soc]
+
+The value table does not depend on the measured SoC, only on prices and
+battery limits. It is kept between calls and reused as the warm start, so
+a re-plan at a slot boundary or after a SoC deviation is a forward rollout
+over the stored policy. The table is only solved again when the prices or
+limits change.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+from typing import NamedTuple
+
+import numpy as np
+
+from .simulate import FEASIBLE_SHARE, BatterySpec
+from .tuning import BatteryModel
+
+_LOGGER = logging.getLogger(__name__)
+
+# Index of each mode in the policy, standby first so ties keep the battery idle
+MODES = ("Standby", "Charge", "Sell", "Selfuse")
+# SoC levels of the grid, 0-100 % in 1 % steps
+LEVELS = 101
+
+
+class MpcPlan(NamedTuple):
+    """Modes and projected SoC from a slot to the end of the horizon."""
+
+    # Epoch seconds of the planned slots
+    starts: np.ndarray
+    modes: list[str]
+    # Projected SoC in % at the start of every slot and at the end
+    soc: np.ndarray
+    value: float
+
+    def projected_soc(self, epoch: float, step: int) -> float | None:
+        """Projected SoC at epoch, interpolated inside the slot."""
+        if not len(self.starts) or epoch < self.starts[0]:
+            return None
+        slot = int((epoch - self.starts[0]) // step)
+        if slot >= len(self.starts):
+            return None
+        share = (epoch - self.starts[slot]) / step
+        return float(self.soc[slot] + share * (self.soc[slot + 1] - self.soc[slot]))
+
+
+class _Solution(NamedTuple):
+    key: bytes
+    starts: np.ndarray
+    step: int
+    # Mode index per slot and level, shape (slots, LEVELS)
+    policy: np.ndarray
+    # Value per slot and level, shape (slots + 1, LEVELS)
+    value: np.ndarray
+    # Next level per mode and level, shape (modes, LEVELS)
+    moves: np.ndarray
+
+
+def battery_model(spec: BatterySpec) -> BatteryModel:
+    """Rates of spec, the SoC moves the same as in simulate."""
+    return BatteryModel(
+        charge_rate=spec.charge_kw * spec.efficiency / spec.capacity_kwh,
+        sell_rate=spec.discharge_kw / spec.efficiency / spec.capacity_kwh,
+        selfuse_rate=spec.selfuse_kw / spec.efficiency / spec.capacity_kwh,
+        efficiency=spec.efficiency,
+    )
+
+
+def _moves(
+    step: int, soc_min: float, soc_max: float, model: BatteryModel
+) -> np.ndarray:
+    """Next SoC level for every mode from every level."""
+    level = np.arange(LEVELS)
+    hours = step / 3600
+    low = int(round(soc_min))
+    high = int(round(soc_max))
+    charge = int(round(model.charge_rate * 100 * hours))
+    sell = int(round(model.sell_rate * 100 * hours))
+    selfuse = int(round(model.selfuse_rate * 100 * hours))
+    # Charging stops at soc_max and discharging at soc_min, a SoC already
+    # outside the limits only moves back towards them
+    return np.stack(
+        [
+            level,
+            np.minimum(level + charge, np.maximum(level, high)),
+            np.maximum(level - sell, np.minimum(level, low)),
+            np.maximum(level - selfuse, np.minimum(level, low)),
+        ]
+    )
+
+
+def _feasible(moves: np.ndarray, step: int, model: BatteryModel) -> np.ndarray:
+    """Modes from every level that simulate does not flag as infeasible.
+
+    A charge has to move the SoC at all, a discharge FEASIBLE_SHARE of its
+    request. Standby is always feasible.
+    """
+    moved = np.abs(moves - np.arange(LEVELS))
+    requested = np.array(
+        [0.0, model.charge_rate, model.sell_rate, model.selfuse_rate]
+    ) * (100 * step / 3600)
+    feasible = moved >= FEASIBLE_SHARE * requested[:, None]
+    feasible[1] = moved[1] > 0
+    feasible[0] = True
+    return feasible
+
+
+class MpcController:
+    """Keeps the solved horizon and re-plans from measured SoC."""
+
+    def __init__(self, model: BatteryModel = BatteryModel()) -> None:
+        """Initialize without a solution."""
+        self._model = model
+        self._solution: _Solution | None = None
+        self.solves = 0
+        self.reuses = 0
+
+    @staticmethod
+    def _key(*arrays: np.ndarray, params: tuple) -> bytes:
+        digest = hashlib.sha1(repr(params).encode())
+        for array in arrays:
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.digest()
+
+    def solve(
+        self,
+        starts: np.ndarray,
+        buy: np.ndarray,
+        sell: np.ndarray,
+        step: int,
+        soc_min: float,
+        soc_max: float,
+        wear_cost: float,
+    ) -> bool:
+        """Solve the horizon, returns False when the last solution was reused.
+
+        Energy left at the end of the horizon is valued at the lowest buy
+        price, what it would cost to charge it again, so the battery is
+        neither filled up nor emptied just because the known prices end.
+        """
+        key = self._key(
+            starts, buy, sell, params=(step, soc_min, soc_max, wear_cost, self._model)
+        )
+        if self._solution is not None and self._solution.key == key:
+            self.reuses += 1
+            return False
+        moves = _moves(step, soc_min, soc_max, self._model)
+        feasible = _feasible(moves, step, self._model)
+        level = np.arange(LEVELS)
+        # Energy moved per mode and level as a share of the capacity
+        energy = np.abs(moves - level) / 100
+        # Charging buys more than the cells store, discharging delivers less
+        efficiency = self._model.efficiency
+        grid = energy * np.array([[0.0], [1 / efficiency], [efficiency], [efficiency]])
+        wear = energy * np.array([[0.0], [0.0], [wear_cost], [wear_cost]])
+        slots = len(starts)
+        value = np.zeros((slots + 1, LEVELS))
+        policy = np.zeros((slots, LEVELS), np.int8)
+        if slots:
+            value[slots] = level / 100 * float(np.min(buy))
+        for t in range(slots - 1, -1, -1):
+            reward = grid * np.array([[0.0], [-buy[t]], [sell[t]], [buy[t]]]) - wear
+            total = np.where(feasible, reward + value[t + 1][moves], -np.inf)
+            policy[t] = np.argmax(total, axis=0)
+            value[t] = total[policy[t], level]
+        self._solution = _Solution(key, starts, step, policy, value, moves)
+        self.solves += 1
+        return True
+
+    def plan(self, epoch: float, soc: float) -> MpcPlan | None:
+        """Roll the stored policy forward from soc at epoch."""
+        solution = self._solution
+        if solution is None or not len(solution.starts):
+            return None
+        first = int(np.searchsorted(solution.starts, epoch, side="right")) - 1
+        if first < 0 or epoch >= solution.starts[-1] + solution.step:
+            return None
+        level = min(max(int(round(soc)), 0), LEVELS - 1)
+        value = float(solution.value[first, level])
+        policy = solution.policy.tolist()
+        moves = solution.moves.tolist()
+        modes = []
+        levels = [level]
+        for t in range(first, len(solution.starts)):
+            mode = policy[t][level]
+            level = moves[mode][level]
+            modes.append(MODES[mode])
+            levels.append(level)
+        return MpcPlan(
+            solution.starts[first:], modes, np.array(levels, np.float64), value
+        )
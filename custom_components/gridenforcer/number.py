@@ -2,6 +2,9 @@
 
 from __future__ import annotations
 
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING
+
 from homeassistant.components.number import (
     NumberDeviceClass,
     NumberEntity,
@@ -13,7 +16,10 @@ from homeassistant.core import HomeAssistant
 from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from . import DOMAIN
+from .const import DOMAIN
+
+if TYPE_CHECKING:
+    from .pricecalculator import PriceCalculator
 
 
 async def async_setup_entry(
@@ -22,6 +28,7 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up the demo number platform."""
+    price_hub: PriceCalculator = hass.data[DOMAIN][config_entry.entry_id]
     async_add_entities(
         [
             # GridEnforcerNumber(
@@ -68,6 +75,7 @@ async def async_setup_entry(
                 mode=NumberMode.BOX,
                 icon="mdi:battery-charging-low",
                 unit_of_measurement="%",
+                on_change=price_hub.async_set_parameter,
             ),
             GridEnforcerNumber(
                 "soc_max",
@@ -77,6 +85,7 @@ async def async_setup_entry(
                 mode=NumberMode.BOX,
                 icon="mdi:battery-charging-high",
                 unit_of_measurement="%",
+                on_change=price_hub.async_set_parameter,
             ),
             GridEnforcerNumber(
                 "selfuse_hours",
@@ -86,6 +95,7 @@ async def async_setup_entry(
                 mode=NumberMode.BOX,
                 icon="mdi:clock",
                 unit_of_measurement="h",
+                on_change=price_hub.async_set_parameter,
             ),
             GridEnforcerNumber(
                 "charge_hours",
@@ -95,6 +105,7 @@ async def async_setup_entry(
                 mode=NumberMode.BOX,
                 icon="mdi:lightning-bolt",
                 unit_of_measurement="h",
+                on_change=price_hub.async_set_parameter,
             ),
         ]
     )
@@ -120,15 +131,22 @@ class GridEnforcerNumber(RestoreNumber):
         native_step: float | None = None,
         unit_of_measurement: str | None = None,
         icon: str | None = None,
+        on_change: Callable[[str, float | None], Awaitable[None]] | None = None,
     ) -> None:
-        """Initialize the GridEnforcer Number entity."""
+        """Initialize the GridEnforcer Number entity.
+
+        on_change is called with the key and the new value when the value is
+        set or restored, the hub uses it to replan.
+        """
+        self._key = unique_id
+        self._on_change = on_change
         self._attr_assumed_state = False
         self._attr_device_class = device_class
         self._attr_translation_key = unique_id
         self._attr_mode = mode
         self._attr_native_unit_of_measurement = unit_of_measurement
         # self._attr_native_value = state
-        self._attr_unique_id = unique_id
+        self._attr_unique_id = f"{device_unique_id}_{unique_id}"
         self._attr_name = entity_name
 
         if native_min_value is not None:
@@ -152,6 +170,8 @@ class GridEnforcerNumber(RestoreNumber):
         """Update the current value."""
         self._attr_native_value = value
         self.async_write_ha_state()
+        if self._on_change:
+            await self._on_change(self._key, value)
 
     async def async_added_to_hass(self) -> None:
         """Handle entity which will be added."""
@@ -160,3 +180,5 @@ class GridEnforcerNumber(RestoreNumber):
         if not number_data:
             return
         self._attr_native_value = number_data.native_value
+        if self._on_change:
+            await self._on_change(self._key, self._attr_native_value)
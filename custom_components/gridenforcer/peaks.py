@@ -0,0 +1,109 @@
+"""Adaptive peak and valley detection on price arrays.
+
+find_min_max confirms a turn once the price moved a fixed DELTA away from
+the last extreme, which finds nothing on flat days and every wiggle on
+volatile days. find_peak_indices scales the swing it requires with the day:
+
+    threshold = max(prominence * (max - min), spread * bat_cost)
+
+so a turn needs a relative prominence on volatile days and at least the
+battery cost on flat ones. Extremes of the same kind closer than distance
+slots are merged, keeping the more extreme one.
+
+The result is two index arrays into the price array, valleys and peaks,
+the same as find_min_max returns and filter_min_max takes.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+# Required swing as a share of the day's price range
+PROMINENCE = 0.1
+# Required swing as a multiple of the battery cost
+SPREAD = 1.0
+# Minimum slots between two valleys or two peaks
+DISTANCE = 2
+
+
+def turning_points(values: np.ndarray) -> np.ndarray:
+    """Indices of local extremes, the first slot of a plateau, and both ends."""
+    if len(values) < 3:
+        return np.arange(len(values))
+    change = np.diff(values)
+    moving = np.flatnonzero(change)
+    if not len(moving):
+        return np.array([0, len(values) - 1])
+    direction = np.sign(change[moving])
+    # A turn is where the direction of two consecutive moves differs, it
+    # starts right after the first of the two moves
+    turns = moving[:-1][direction[1:] != direction[:-1]] + 1
+    return np.unique(np.concatenate(([0], turns, [len(values) - 1])))
+
+
+def _zigzag(values: np.ndarray, points: np.ndarray, threshold: float) -> list:
+    """Confirmed extremes as (index, is_max), alternating."""
+    extremes = []
+    first = int(points[0])
+    mn_pos = mx_pos = first
+    mn = mx = float(values[first])
+    look_for_max = None
+    # Plain floats, indexing the array per point is several times slower
+    for pos, value in zip(points.tolist()[1:], values[points[1:]].tolist()):
+        if value > mx:
+            mx, mx_pos = value, pos
+        if value < mn:
+            mn, mn_pos = value, pos
+        if look_for_max is not False and value < mx - threshold:
+            # A local maximum, as in find_min_max not at the first slot
+            if mx_pos != first:
+                extremes.append((mx_pos, True))
+            mn, mn_pos = value, pos
+            look_for_max = False
+        elif look_for_max is not True and value > mn + threshold:
+            extremes.append((mn_pos, False))
+            mx, mx_pos = value, pos
+            look_for_max = True
+    return extremes
+
+
+def _merge_close(values: list[float], extremes: list, distance: int) -> list:
+    """Merge extremes of the same kind closer than distance slots."""
+    merged: list = []
+    for pos, is_max in extremes:
+        merged.append((pos, is_max))
+        while len(merged) >= 3 and merged[-1][0] - merged[-3][0] < distance:
+            latest, _, earlier = merged.pop(), merged.pop(), merged.pop()
+            if is_max:
+                keep = latest if values[latest[0]] > values[earlier[0]] else earlier
+            else:
+                keep = latest if values[latest[0]] < values[earlier[0]] else earlier
+            merged.append(keep)
+    return merged
+
+
+def find_peak_indices(
+    values: np.ndarray,
+    bat_cost: float,
+    prominence: float = PROMINENCE,
+    distance: int = DISTANCE,
+    spread: float = SPREAD,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return the indices of the valleys and the peaks of values.
+
+    Like find_min_max there is always at least one valley, the lowest
+    price, and the first slot is never a peak.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        empty = np.empty(0, np.intp)
+        return empty, empty
+    threshold = max(prominence * float(np.ptp(values)), spread * bat_cost)
+    extremes = _zigzag(values, turning_points(values), threshold)
+    if distance > 1:
+        extremes = _merge_close(values.tolist(), extremes, distance)
+    minima = np.array([pos for pos, is_max in extremes if not is_max], np.intp)
+    maxima = np.array([pos for pos, is_max in extremes if is_max], np.intp)
+    if not len(minima):
+        minima = np.array([np.argmin(values)], np.intp)
+    return minima, maxima
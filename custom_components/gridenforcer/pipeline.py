@@ -0,0 +1,140 @@
+"""Planning as a chain of cached stages.
+
+Each stage keeps its last result together with the inputs it was computed
+from. A run only recomputes a stage when its own parameters or an upstream
+stage changed:
+
+    prices     <- priced series
+    peaks      <- prices, delta (bat_cost with prominence peaks)
+    validpeaks <- peaks, bat_cost
+    schedule   <- validpeaks, selfuse_hours, charge_hours
+
+so a new selfuse_hours value reuses the prices and peaks of the last run.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable
+from typing import Any
+
+from . import planner
+from .const import PEAKS_PROMINENCE
+from .timevalue import TimeValue
+
+_LOGGER = logging.getLogger(__name__)
+
+STAGES = ("prices", "peaks", "validpeaks", "schedule")
+
+
+class _Stage:
+    """Result of one stage and the key it was computed for."""
+
+    __slots__ = ("key", "value", "version")
+
+    def __init__(self) -> None:
+        self.key: Any = None
+        self.value: Any = None
+        self.version = 0
+
+
+class PlanPipeline:
+    """Cached planning stages for one price day."""
+
+    def __init__(self) -> None:
+        """Initialize without results."""
+        self._stages = {name: _Stage() for name in STAGES}
+        self._source: planner.PricedSeries | None = None
+        self.computed = dict.fromkeys(STAGES, 0)
+        self.reused = dict.fromkeys(STAGES, 0)
+        # Stages recomputed by the last run
+        self.last_computed: list[str] = []
+
+    @property
+    def metrics(self) -> dict[str, Any]:
+        """Computed and reused counts per stage."""
+        return {
+            "computed": dict(self.computed),
+            "reused": dict(self.reused),
+            "last_computed": list(self.last_computed),
+        }
+
+    @property
+    def prices(self) -> list[TimeValue]:
+        """TimeValues of the last run."""
+        return self._stages["prices"].value or []
+
+    def _run_stage(self, name: str, key: Any, compute: Callable[[], Any]) -> _Stage:
+        stage = self._stages[name]
+        if stage.version and stage.key == key:
+            self.reused[name] += 1
+            return stage
+        stage.value = compute()
+        stage.key = key
+        stage.version += 1
+        self.computed[name] += 1
+        self.last_computed.append(name)
+        return stage
+
+    def run(
+        self, priced: planner.PricedSeries, params: planner.PlanParameters
+    ) -> planner.PlanResult:
+        """Plan the priced series, reusing unchanged stages."""
+        self.last_computed = []
+        # The price cache returns the same object while the data is unchanged
+        if priced is not self._source:
+            self._source = priced
+            self._stages["prices"].key = None
+        prices = self._run_stage(
+            "prices",
+            "source",
+            lambda: planner.timevalues_from_series(priced),
+        )
+        if not prices.value:
+            return planner.PlanResult([], None, None)
+        # Prominence peaks depend on bat_cost, delta peaks on delta
+        if params.peaks == PEAKS_PROMINENCE:
+            peaks_key = (prices.version, params.peaks, params.bat_cost)
+        else:
+            peaks_key = (prices.version, params.peaks, params.delta)
+        peaks = self._run_stage(
+            "peaks",
+            peaks_key,
+            lambda: planner.find_peaks(prices.value, params),
+        )
+        validpeaks = self._run_stage(
+            "validpeaks",
+            (peaks.version, params.bat_cost),
+            lambda: planner.filter_min_max(
+                *peaks.value, params.bat_cost, priced.buy, priced.sell
+            ),
+        )
+        # The parameters are hours, the schedule counts slots
+        selfuse_slots = planner.hours_to_slots(
+            params.selfuse_hours or 1, priced.series.step
+        )
+        charge_slots = planner.hours_to_slots(params.charge_hours, priced.series.step)
+        schedule = self._run_stage(
+            "schedule",
+            (validpeaks.version, selfuse_slots, charge_slots),
+            lambda: self._schedule(
+                prices.value, validpeaks.value, selfuse_slots, charge_slots
+            ),
+        )
+        _LOGGER.debug("Planned, recomputed stages %s", self.last_computed)
+        return schedule.value
+
+    @staticmethod
+    def _schedule(
+        prices: list[TimeValue],
+        validpeaks: list,
+        selfuse_slots: int,
+        charge_slots: int | None,
+    ) -> planner.PlanResult:
+        # create_schedule sets the mode of the TimeValues it gets, plan on
+        # copies so the cached prices stay untouched
+        copies = [TimeValue(tv.start, tv.end, tv.value, tv.sell_value) for tv in prices]
+        result = planner.create_schedule(
+            copies, validpeaks, selfuse_slots, charge_slots
+        )
+        return result._replace(schedule=sorted(result.schedule, key=lambda s: s.start))
@@ -0,0 +1,172 @@
+"""Batch planning from the command line.
+
+Reads price days as JSON lines from files or stdin and writes one schedule
+per line, for example::
+
+    PYTHONPATH=custom_components python -m gridenforcer.plan days.jsonl \
+        --vat 25 --extra-import 0.15 --extra-export 0.05 --bat-cost 0.2 \
+        --selfuse-hours 4 --charge-hours 2 --workers 4
+
+Each input line is either a list of price entries or an object with the
+entries under "prices" (or the Nordpool attribute name "raw_today"). Price
+entries have start, end and value (spot price). Other keys of an input
+object, e.g. "id" or "date", are copied to the output line.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import logging
+import sys
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, TextIO
+
+from .const import PEAK_DETECTIONS, PEAKS_DELTA
+from .daycalendar import DEFAULT_TIME_ZONE
+from .planner import PlanParameters, plan_day
+
+PRICE_KEYS = ("prices", "raw_today")
+# Lines handed to the worker pool at a time, bounds memory on long streams
+BATCH_SIZE = 256
+
+
+def parse_line(line: str) -> tuple[dict[str, Any], list]:
+    """Split an input line into passthrough fields and price entries."""
+    data = json.loads(line)
+    if isinstance(data, list):
+        return {}, data
+    for key in PRICE_KEYS:
+        if key in data:
+            extra = {k: v for k, v in data.items() if k not in PRICE_KEYS}
+            return extra, data[key]
+    raise ValueError(f"No price entries found, expected one of {PRICE_KEYS}")
+
+
+def plan_line(line: str, params: PlanParameters) -> str:
+    """Plan one JSON line and return the result as a JSON line."""
+    extra, entries = parse_line(line)
+    result = plan_day(entries, params)
+    output = dict(extra)
+    output["selfuse_max"] = result.selfuse_max
+    output["sell_max"] = result.sell_max
+    output["schedule"] = [
+        {
+            "start": tv.start.isoformat(),
+            "end": tv.end.isoformat(),
+            "value": tv.value,
+            "sell_value": tv.sell_value,
+            "mode": tv.mode,
+        }
+        for tv in result.schedule
+    ]
+    return json.dumps(output)
+
+
+def _plan_batch(lines: list[str], params: PlanParameters) -> list[str]:
+    return [plan_line(line, params) for line in lines]
+
+
+def _batches(lines: Iterable[str], size: int) -> Iterator[list[str]]:
+    iterator = iter(lines)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def iter_lines(paths: list[str]) -> Iterator[str]:
+    """Yield non empty lines from the given files, '-' is stdin."""
+    for path in paths or ["-"]:
+        if path == "-":
+            stream = sys.stdin
+            yield from (line for line in stream if line.strip())
+            continue
+        with open(path, encoding="utf-8") as stream:
+            yield from (line for line in stream if line.strip())
+
+
+def run(
+    lines: Iterable[str],
+    params: PlanParameters,
+    output: TextIO,
+    workers: int = 1,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """Plan all lines and write the results in input order.
+
+    Returns the number of planned days.
+    """
+    count = 0
+    if workers <= 1:
+        for line in lines:
+            output.write(plan_line(line, params) + "\n")
+            count += 1
+        return count
+
+    # Split each batch so every worker gets a few lines per round trip
+    chunk = max(1, batch_size // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for batch in _batches(lines, batch_size):
+            chunks = [batch[i : i + chunk] for i in range(0, len(batch), chunk)]
+            for results in executor.map(_plan_batch, chunks, itertools.repeat(params)):
+                for result in results:
+                    output.write(result + "\n")
+                    count += 1
+    return count
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command line entry point."""
+    arg_parser = argparse.ArgumentParser(
+        prog="python -m gridenforcer.plan",
+        description="Create battery schedules from JSON lines price days.",
+    )
+    arg_parser.add_argument("files", nargs="*", help="Input files, default stdin")
+    arg_parser.add_argument("-o", "--output", help="Output file, default stdout")
+    arg_parser.add_argument("-j", "--workers", type=int, default=1)
+    arg_parser.add_argument("--vat", type=float, default=25.0)
+    arg_parser.add_argument("--extra-import", type=float, default=0.0)
+    arg_parser.add_argument("--extra-export", type=float, default=0.0)
+    arg_parser.add_argument("--bat-cost", type=float, default=0.0)
+    arg_parser.add_argument("--selfuse-hours", type=int, default=None)
+    arg_parser.add_argument("--charge-hours", type=int, default=None)
+    arg_parser.add_argument("--delta", type=float, default=None)
+    arg_parser.add_argument(
+        "--peaks",
+        choices=PEAK_DETECTIONS,
+        default=PEAKS_DELTA,
+        help="Peak detection, fixed delta or prominence relative to the day",
+    )
+    arg_parser.add_argument(
+        "--tz", default=DEFAULT_TIME_ZONE, help="Time zone of the price days"
+    )
+    arg_parser.add_argument("-v", "--verbose", action="store_true")
+    args = arg_parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    params = PlanParameters(
+        vat=args.vat,
+        extra_import=args.extra_import,
+        extra_export=args.extra_export,
+        bat_cost=args.bat_cost,
+        selfuse_hours=args.selfuse_hours,
+        charge_hours=args.charge_hours,
+        tz=args.tz,
+        peaks=args.peaks,
+    )
+    if args.delta is not None:
+        params = params._replace(delta=args.delta)
+
+    lines = iter_lines(args.files)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            run(lines, params, output, args.workers)
+    else:
+        run(lines, params, sys.stdout, args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,455 @@
+"""Price based battery planning for GridEnForcerControl.
+
+This module does not depend on Home Assistant so it can be used from batch
+jobs and tests, see plan.py for the command line interface.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+from datetime import datetime
+from typing import NamedTuple
+
+import numpy as np
+
+from .const import PEAKS_DELTA, PEAKS_PROMINENCE
+from .daycalendar import DEFAULT_TIME_ZONE, day_slices, get_zone
+from .peaks import find_peak_indices
+from .priceseries import PriceSeries
+from .pricesource import series_from_entries
+from .resample import prepare_series
+from .timevalue import TimeValue
+
+_LOGGER = logging.getLogger(__name__)
+
+# Minimum price difference (SEK) between a local minimum and maximum
+DELTA = 0.1
+
+
+class PlanParameters(NamedTuple):
+    """Parameters for planning one price day."""
+
+    vat: float
+    extra_import: float
+    extra_export: float
+    bat_cost: float
+    selfuse_hours: int | None = None
+    charge_hours: int | None = None
+    delta: float = DELTA
+    # Zone of the price day, splits days at local midnight
+    tz: str = DEFAULT_TIME_ZONE
+    # PEAKS_DELTA or PEAKS_PROMINENCE, PEAKS_PROMINENCE ignores delta
+    peaks: str = PEAKS_DELTA
+
+
+class PricedSeries(NamedTuple):
+    """Spot price series with buy and sell price arrays."""
+
+    series: PriceSeries
+    buy: np.ndarray
+    sell: np.ndarray
+
+
+class PlanResult(NamedTuple):
+    """Schedule for the planned prices and the thresholds it was built from."""
+
+    schedule: list[TimeValue]
+    selfuse_max: float | None
+    sell_max: float | None
+
+
+def calc_buy_price(buy_val: float, vat: float, extra_import: float) -> float:
+    """Spot price to buy price including VAT and import fees."""
+    return round(buy_val * (1 + (vat / 100)) + extra_import, 3)
+
+
+def calc_sell_price(sell_val: float, extra_export: float) -> float:
+    """Spot price to sell price including export compensation."""
+    return round(sell_val + extra_export, 3)
+
+
+def find_min_max(prices: list[TimeValue], DELTA) -> tuple[np.ndarray, np.ndarray]:
+    """Find local minima and maxima that differ more than DELTA.
+
+    Returns the indices into prices of the minima and of the maxima.
+    """
+    mn, mx = math.inf, -math.inf
+    minpeaks = []
+    maxpeaks = []
+    lookformax = True
+    start = True
+    # Iterate over items in series
+    for time_pos, time in enumerate(prices):
+        value = time.value
+        if value > mx:
+            mx = value
+            mxpos = time_pos
+        if value < mn:
+            mn = value
+            mnpos = time_pos
+        if lookformax:
+            if value < mx - DELTA:
+                # a local maxima
+                if mxpos != 0:
+                    maxpeaks.append(mxpos)
+                mn = value
+                mnpos = time_pos
+                lookformax = False
+            elif start:
+                # a local minima at beginning
+                # minpeaks.append((mnpos, mn))
+                mx = value
+                mxpos = time_pos
+                start = False
+        else:
+            if value > mn + DELTA:
+                # a local minima
+                minpeaks.append(mnpos)
+                mx = value
+                mxpos = time_pos
+                lookformax = True
+    # check for extrema at end
+    # if value > mn+DELTA:
+    # maxpeaks.append((mxpos, mx))
+    # elif value < mx-DELTA:
+    # minpeaks.append((mnpos, mn))
+    if not minpeaks:
+        minpeaks.append(min(range(len(prices)), key=lambda i: prices[i].value))
+    return np.array(minpeaks, np.intp), np.array(maxpeaks, np.intp)
+
+
+def find_peaks(
+    prices: list[TimeValue], params: PlanParameters
+) -> tuple[np.ndarray, np.ndarray]:
+    """Indices of the minima and maxima with the peak detection of params."""
+    if params.peaks == PEAKS_PROMINENCE:
+        values = np.fromiter((tv.value for tv in prices), np.float64, len(prices))
+        return find_peak_indices(values, params.bat_cost)
+    return find_min_max(prices, params.delta)
+
+
+def filter_min_max(
+    minpeaks: np.ndarray,
+    maxpeaks: np.ndarray,
+    batterycost: float,
+    buy: np.ndarray,
+    sell: np.ndarray,
+) -> list[tuple[int, str]]:
+    """Keep the minima and maxima that pay for the battery cost.
+
+    The peaks are index arrays into the buy and sell prices of the slots.
+    Returns (slot, "min" or "max") of the valid peaks.
+    """
+    buy_values = buy.tolist()
+    sell_values = sell.tolist()
+    valid_peaks = []
+    prev_peak = None
+    next_min = True
+    # Minima before maxima on the same slot
+    slots = np.concatenate((minpeaks, maxpeaks)).astype(np.intp)
+    is_max = np.arange(len(slots)) >= len(minpeaks)
+    order = np.argsort(slots, kind="stable")
+    for slot, peak_is_max in zip(slots[order].tolist(), is_max[order].tolist()):
+        if not peak_is_max and next_min:
+            next_min = False
+            prev_peak = slot
+        elif peak_is_max and not next_min:
+            if sell_values[slot] > (buy_values[prev_peak] + batterycost):
+                valid_peaks.append((prev_peak, "min"))
+                valid_peaks.append((slot, "max"))
+            next_min = True
+            prev_peak = slot
+        elif peak_is_max and next_min:
+            # Vi har en topp utan en dal före kolla om det finns en dal före
+            # som är tillräckligt låg
+            minval = int(np.argmin(buy[:slot]))
+            if sell_values[slot] > (buy_values[minval] + batterycost):
+                valid_peaks.append((minval, "min"))
+                valid_peaks.append((slot, "max"))
+    # Om vi inte hittat en dal/topp så tar
+    # vi bara ut högsta priset och lägsta som topp/dal om det finns tillräcklig skillnad
+    if len(valid_peaks) == 0:
+        maxval = int(np.argmax(buy))
+        minval = int(np.argmin(buy[:maxval]))
+        if sell_values[maxval] > (buy_values[minval] + batterycost):
+            valid_peaks.append((minval, "min"))
+            valid_peaks.append((maxval, "max"))
+    return valid_peaks
+
+
+def get_sell_max(prices: list[TimeValue]):
+    return max(prices, key=lambda tv: tv.sell_value)
+
+
+def get_value_min(prices: list[TimeValue]):
+    return min(prices, key=lambda tv: tv.value)
+
+
+def get_value_max(prices: list[TimeValue]):
+    return max(prices, key=lambda tv: tv.value)
+
+
+def get_n_high_val(prices: list[TimeValue], nvalue: int):
+    sorted_prices = sorted(prices, key=lambda pr: pr.value, reverse=True)
+    return sorted_prices[nvalue - 1].value
+
+
+def hours_to_slots(hours: int | None, step: int) -> int | None:
+    """Number of step long slots in hours, the planning parameters are hours."""
+    return None if hours is None else hours * 3600 // step
+
+
+def create_schedule(
+    prices: list[TimeValue],
+    validpeaks: list[tuple[int, str]],
+    selfuse_hours: int,
+    charge_hours: int | None = None,
+) -> PlanResult:
+    """Assign a mode to every slot in prices from the valid peaks.
+
+    The valid peaks are (slot, kind) from filter_min_max. selfuse_hours
+    and charge_hours count slots, see hours_to_slots. Slots are compared
+    by their index in prices, the prices are sorted by start so the index
+    order is the time order.
+    """
+    _selfuse_hours = selfuse_hours
+    _charge_hours = charge_hours
+    sell_max = None
+    selfuse_max = None
+    schedule: list[int] = []
+    if not _selfuse_hours:
+        _selfuse_hours = 1
+    # Loop throw prices per local day (23-25 hours) and create a schedule
+    tz = prices[0].start.tzinfo if prices else None
+    starts = np.fromiter((tv.start.timestamp() for tv in prices), np.int64, len(prices))
+    for day in day_slices(starts, tz):
+        chunk = prices[day]
+        sell_max = get_sell_max(chunk).sell_value
+        _LOGGER.info(f"Sell Max = {sell_max}")
+
+        selfuse_max = get_n_high_val(chunk, _selfuse_hours)
+        selfuse_peak = get_value_max(chunk).value
+        _LOGGER.info(f"Selfuse Max = {selfuse_max} Selfuse Peak = {selfuse_peak}")
+
+        schedule = []
+        scheduled: set[int] = set()
+        sel_prices: list[int] = []
+        # Vi tillåter 2 cyklingar på batteriet
+        # Kolla så var min och max efter varandra i rätt följd
+        prev_peak = None
+        cycle_no = 1
+        next_min = True
+        # Peaks before the next local midnight, day.stop is its first slot
+        peaks = sorted(
+            (peak for peak in validpeaks if peak[0] < day.stop),
+            key=lambda peak: peak[0],
+        )
+        if len(peaks) > 2:
+            limit_search = peaks[2][0]
+            _selfuse_hours = _selfuse_hours * 2
+            selfuse_max = get_n_high_val(chunk, _selfuse_hours)
+            _LOGGER.info(
+                f"More than 2 peaks found Limit search = {prices[limit_search].start} Selfuse hours = {_selfuse_hours} Selfuse Max = {selfuse_max} Selfuse Peak = {selfuse_peak}"
+            )
+        else:
+            limit_search = day.stop - 1
+            _LOGGER.info("2 or less peaks found, searching to the end of the day")
+
+        for slot, kind in peaks:
+            if kind == "min" and next_min:
+                next_min = False
+                prev_peak = slot
+                sel_prices = []
+            elif kind == "max" and not next_min:
+                next_min = True
+                # TODO: Kika på om vi skall titta priser in på nästa dygn också för att hitta nästa dal
+                sel_prices = list(
+                    range(max(day.start, prev_peak), min(day.stop, limit_search + 1))
+                )
+                cycle_no = cycle_no + 1
+                prev_peak = slot
+
+            limit_search = day.stop - 1
+            if len(sel_prices) > 0:
+                # Första priset = det längsta eftersom vi sorterat
+                # används för Laddning
+                selfuse_counter = 0
+                charge = sel_prices.pop(0)
+                prices[charge].mode = "Charge"
+                if charge not in scheduled:
+                    scheduled.add(charge)
+                    schedule.append(charge)
+
+                sorted_sel_prices = sorted(
+                    sel_prices, key=lambda i: prices[i].value, reverse=True
+                )
+
+                if selfuse_max > sell_max:
+                    _LOGGER.info("Selfuse max is higher than sell max")
+                else:
+                    _LOGGER.info("Sell max is higher than selfuse max")
+                    sell = sorted_sel_prices.pop(0)
+                    prices[sell].mode = "Sell"
+                    if sell not in scheduled:
+                        scheduled.add(sell)
+                        schedule.append(sell)
+                for i in sorted_sel_prices:
+                    p = prices[i]
+                    if p.value > sell_max and selfuse_counter < _selfuse_hours:
+                        p.mode = "Selfuse"
+                        selfuse_counter = selfuse_counter + 1
+                    else:
+                        p.mode = "Standby"
+                    # Check if value already exsists
+                    if i not in scheduled:
+                        scheduled.add(i)
+                        schedule.append(i)
+
+        schedule = fill_empty_schedule(prices, schedule, scheduled)
+
+        # Add additional charging hours if charge hours are more than 1
+
+        if _charge_hours and _charge_hours > 1:
+            # Get charge hour from schedule
+            charges = [i for i in schedule if prices[i].mode == "Charge"]
+            # Earliest use slot first
+            use_hours = sorted(
+                i for i in schedule if prices[i].mode in ("Selfuse", "Sell")
+            )
+            for i in sorted(charges):
+                # Get next selfuse or sell hour
+                _LOGGER.info(f"Charge hour {prices[i].start}")
+                # Get prev hour for sell och selfuse if any
+                prev_use_hour = next((j for j in use_hours if j < i), None)
+                next_use_hour = next((j for j in use_hours if j > i), None)
+                _LOGGER.info(f"Use hours around {i}: {prev_use_hour} {next_use_hour}")
+                # Between the use hours, or the ends of the schedule
+                first = -1 if prev_use_hour is None else prev_use_hour
+                end = len(prices) if next_use_hour is None else next_use_hour
+                candidates = [j for j in schedule if first < j < end]
+                min_charges = sorted(
+                    (j for j in candidates if prices[j].mode != "Charge"),
+                    key=lambda j: prices[j].value,
+                )
+                # Log schedule
+                counter = _charge_hours - 1
+                _LOGGER.info(f"Charge counter {counter}")
+                # change standby to charge for correct amount of hours
+                for j in min_charges:
+                    if counter >= 1:
+                        _LOGGER.info(f"Charge hour {prices[j].start}")
+                        prices[j].mode = "Charge"
+                        counter = counter - 1
+                        if counter == 0:
+                            break
+    # for tv in sorted(schedule, key=lambda s: s.start):
+    #    _LOGGER.info(f"Scedule: {tv.start} {tv.mode} {tv.value} {tv.sell_value}")
+    return PlanResult([prices[i] for i in schedule], selfuse_max, sell_max)
+
+
+def fill_empty_schedule(
+    prices: list[TimeValue], schedule: list[int], scheduled: set[int]
+) -> list[int]:
+    """Add the slots missing from schedule as Standby."""
+    for i, p in enumerate(prices):
+        if i not in scheduled:
+            p.mode = "Standby"
+            scheduled.add(i)
+            schedule.append(i)
+    return schedule
+
+
+def get_schedule(
+    prices: list[TimeValue],
+    hours_for_self_use: int,
+    battery_cost: float,
+    charge_hours: int | None = None,
+    delta: float = DELTA,
+    peaks: str = PEAKS_DELTA,
+) -> PlanResult:
+    """Compute the schedule for the prices of one or more days."""
+    buy = np.fromiter((tv.value for tv in prices), np.float64, len(prices))
+    sell = np.fromiter((tv.sell_value for tv in prices), np.float64, len(prices))
+    # Hitta alla toppar och dalar
+    if peaks == PEAKS_PROMINENCE:
+        minpeaks, maxpeaks = find_peak_indices(buy, battery_cost)
+    else:
+        minpeaks, maxpeaks = find_min_max(prices, DELTA=delta)
+    _LOGGER.info(f"Own Minima: {len(minpeaks)}, Maxima: {len(maxpeaks)}")
+    for slot in maxpeaks.tolist():
+        _LOGGER.info(f"Max Time: {prices[slot].start}, Value: {buy[slot]:.2f}")
+    for slot in minpeaks.tolist():
+        _LOGGER.info(f"Min Time: {prices[slot].start}, Value: {buy[slot]:.2f}")
+    # Filtrera resultatet så vi bara har giltliga toppar/dalar dvs en topp
+    # föregås av en dal som ger "tillräcklig besparing" och verifiera att
+    # vi verkligen hittat en topp/dal
+    validpeaks = filter_min_max(minpeaks, maxpeaks, battery_cost, buy, sell)
+    # Börja med att kontrollera att vi har peak värden som matchar
+    # varandra (dal följs av topp)
+    step = int((prices[0].end - prices[0].start).total_seconds()) if prices else 3600
+    result = create_schedule(
+        prices,
+        validpeaks,
+        hours_to_slots(hours_for_self_use or 1, step),
+        hours_to_slots(charge_hours, step),
+    )
+    return result._replace(schedule=sorted(result.schedule, key=lambda s: s.start))
+
+
+def transform_series(series: PriceSeries, params: PlanParameters) -> PricedSeries:
+    """Add buy and sell prices to a spot price series in one vectorized pass.
+
+    Rounding uses round() per value, np.round rounds differently at ties and
+    would change which slots the planner picks.
+    """
+    buy = series.values * (1 + (params.vat / 100)) + params.extra_import
+    sell = series.values + params.extra_export
+    return PricedSeries(series, _round3(buy), _round3(sell))
+
+
+def _round3(values: np.ndarray) -> np.ndarray:
+    return np.fromiter(
+        (round(value, 3) for value in values.tolist()), np.float64, len(values)
+    )
+
+
+def timevalues_from_series(priced: PricedSeries) -> list[TimeValue]:
+    """Create new TimeValues from a priced series."""
+    series = priced.series
+    return [
+        TimeValue(
+            start=datetime.fromtimestamp(start, series.tz),
+            end=datetime.fromtimestamp(start + series.step, series.tz),
+            value=buy,
+            sell_value=sell,
+        )
+        for start, buy, sell in zip(
+            series.starts.tolist(), priced.buy.tolist(), priced.sell.tolist()
+        )
+    ]
+
+
+def build_timevalues(entries: list, params: PlanParameters) -> list[TimeValue]:
+    """Create TimeValues with buy and sell price from raw price entries.
+
+    Entries are dicts with start, end and value (spot price), start and end
+    may be datetimes or ISO 8601 strings.
+    """
+    series = prepare_series(series_from_entries(entries, get_zone(params.tz)))
+    return timevalues_from_series(transform_series(series, params))
+
+
+def plan_day(entries: list, params: PlanParameters) -> PlanResult:
+    """Plan one price day given as raw price entries."""
+    prices = build_timevalues(entries, params)
+    if not prices:
+        return PlanResult([], None, None)
+    return get_schedule(
+        prices,
+        params.selfuse_hours,
+        params.bat_cost,
+        params.charge_hours,
+        params.delta,
+        params.peaks,
+    )
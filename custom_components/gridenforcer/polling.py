@@ -0,0 +1,152 @@
+"""Adaptive polling intervals for the register blocks.
+
+Serial numbers never change while the battery power changes every second,
+so every block gets its own interval, adapted after each read:
+
+    values changed     interval = max(low, interval * SPEEDUP)
+    values unchanged   interval = min(high, interval * SLOWDOWN)
+
+low and high come from the most demanding consumer of the block's
+registers, FCR-D needs fresh values within seconds, static registers are
+read once an hour. Blocks are classified by the share of reads that saw a
+change, and the bus time spent is reported as utilization.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Any
+
+from .registers import (
+    CONSUMER_CONTROL,
+    CONSUMER_DASHBOARD,
+    CONSUMER_FCRD,
+    CONSUMER_STATIC,
+    Block,
+)
+
+# Shortest and longest seconds between reads per consumer
+POLL_BOUNDS = {
+    CONSUMER_FCRD: (1.0, 2.0),
+    CONSUMER_CONTROL: (1.0, 30.0),
+    CONSUMER_DASHBOARD: (5.0, 300.0),
+    CONSUMER_STATIC: (300.0, 3600.0),
+}
+SPEEDUP = 0.5
+SLOWDOWN = 1.5
+# Weight of the latest read in the change rate
+RATE_WEIGHT = 0.2
+# Change rates separating fast, slow and static blocks
+FAST_RATE = 0.5
+SLOW_RATE = 0.05
+# Seconds of reads the utilization is measured over
+WINDOW = 60.0
+
+
+def block_bounds(
+    block: Block, bounds: dict[str, tuple[float, float]] = POLL_BOUNDS
+) -> tuple[float, float]:
+    """Interval bounds of a block, set by its most demanding register."""
+    lows, highs = zip(*(bounds[register.consumer] for register in block.registers))
+    return min(lows), min(highs)
+
+
+class _Schedule:
+    """Polling state of one block."""
+
+    __slots__ = ("low", "high", "interval", "next_read", "rate", "reads", "values")
+
+    def __init__(self, low: float, high: float, interval: float) -> None:
+        self.low = low
+        self.high = high
+        self.interval = min(max(interval, low), high)
+        self.next_read = 0.0
+        # Share of recent reads that saw a change, starts as changing
+        self.rate = 1.0
+        self.reads = 0
+        self.values: dict[str, Any] | None = None
+
+
+class AdaptivePoller:
+    """Decides which blocks are due and adapts their intervals.
+
+    Without adapt the blocks keep the scan interval of their registers.
+    """
+
+    def __init__(
+        self,
+        blocks: list[Block],
+        bounds: dict[str, tuple[float, float]] = POLL_BOUNDS,
+        adapt: bool = True,
+    ) -> None:
+        """Initialize with every block due."""
+        self.blocks = blocks
+        self.adapt = adapt
+        self._schedules = []
+        for block in blocks:
+            low, high = block_bounds(block, bounds)
+            if not adapt:
+                low = high = float(block.scan_interval)
+            self._schedules.append(_Schedule(low, high, block.scan_interval))
+        self._busy: deque[tuple[float, float]] = deque()
+
+    @property
+    def tick(self) -> float:
+        """Seconds between checks for due blocks."""
+        return min(schedule.low for schedule in self._schedules)
+
+    def due(self, now: float) -> list[int]:
+        """Indices of the blocks to read at now."""
+        return [
+            index
+            for index, schedule in enumerate(self._schedules)
+            if schedule.next_read <= now
+        ]
+
+    def record(
+        self, index: int, now: float, values: dict[str, Any], duration: float
+    ) -> None:
+        """Adapt the interval of a block after reading values in duration."""
+        schedule = self._schedules[index]
+        changed = schedule.values is not None and values != schedule.values
+        if schedule.values is not None:
+            schedule.rate += RATE_WEIGHT * (float(changed) - schedule.rate)
+        if self.adapt and schedule.values is not None:
+            factor = SPEEDUP if changed else SLOWDOWN
+            schedule.interval = min(
+                max(schedule.interval * factor, schedule.low), schedule.high
+            )
+        schedule.values = values
+        schedule.reads += 1
+        schedule.next_read = now + schedule.interval
+        self._busy.append((now, duration))
+        while self._busy and self._busy[0][0] < now - WINDOW:
+            self._busy.popleft()
+
+    def classify(self, index: int) -> str:
+        rate = self._schedules[index].rate
+        if rate >= FAST_RATE:
+            return "fast"
+        if rate >= SLOW_RATE:
+            return "slow"
+        return "static"
+
+    def metrics(self, now: float) -> dict[str, Any]:
+        """Bus utilization over the last WINDOW seconds and the block states."""
+        busy = [duration for at, duration in self._busy if at >= now - WINDOW]
+        return {
+            "utilization": round(100 * sum(busy) / WINDOW, 2),
+            "reads_per_minute": round(len(busy) * 60 / WINDOW, 1),
+            "blocks": [
+                {
+                    "block": f"{block.table} {block.address}+{block.count}",
+                    "interval": round(schedule.interval, 1),
+                    "change_rate": round(schedule.rate, 2),
+                    "class": self.classify(index),
+                    "reads": schedule.reads,
+                }
+                for index, (block, schedule) in enumerate(
+                    zip(self.blocks, self._schedules)
+                )
+            ],
+        }
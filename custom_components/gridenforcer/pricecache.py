@@ -0,0 +1,134 @@
+"""Price series cache shared by all GridEnForcerControl config entries.
+
+Entries referencing the same price sensor share one normalized series, and
+entries that also use the same VAT and fees share the transformed series.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable, Mapping
+from typing import Any, NamedTuple
+
+from . import planner
+from .const import (
+    CONF_PRICE_FILE,
+    CONF_PRICE_FILL,
+    CONF_PRICE_RESOLUTION,
+    CONF_PRICE_SENSOR,
+    CONF_PRICE_SOURCE,
+    DEFAULT_PRICE_RESOLUTION,
+    FILL_FORWARD,
+    SOURCE_AUTO,
+)
+from .pricesource import DaySeries
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TransformedSeries(NamedTuple):
+    """Buy and sell prices for today and tomorrow."""
+
+    today: planner.PricedSeries
+    tomorrow: planner.PricedSeries
+
+
+def price_cache_key(
+    price_sensor: str,
+    price_source: str,
+    price_file: str | None = None,
+    resolution: int = DEFAULT_PRICE_RESOLUTION,
+    fill: str = FILL_FORWARD,
+) -> str:
+    """Cache key for a price sensor read through a price source adapter."""
+    return f"{price_sensor}|{price_source}|{price_file or ''}|{resolution}|{fill}"
+
+
+def entry_cache_key(data: Mapping[str, Any]) -> str:
+    """Cache key for the price settings of a config entry."""
+    return price_cache_key(
+        data[CONF_PRICE_SENSOR],
+        data.get(CONF_PRICE_SOURCE, SOURCE_AUTO),
+        data.get(CONF_PRICE_FILE) or None,
+        int(data.get(CONF_PRICE_RESOLUTION, DEFAULT_PRICE_RESOLUTION)),
+        data.get(CONF_PRICE_FILL, FILL_FORWARD),
+    )
+
+
+class _SensorEntry:
+    """Cached series for one price sensor."""
+
+    def __init__(self) -> None:
+        self.refcount = 0
+        self.token: Any = None
+        self.series: DaySeries | None = None
+        self.transformed: dict[tuple[float, float, float], TransformedSeries] = {}
+
+
+class PriceSeriesCache:
+    """Refcounted cache of normalized and transformed price series."""
+
+    def __init__(self) -> None:
+        """Initialize an empty cache."""
+        self._sensors: dict[str, _SensorEntry] = {}
+        self.parse_count = 0
+        self.transform_count = 0
+
+    def acquire(self, key: str) -> None:
+        """Register a user of the price sensor."""
+        self._sensors.setdefault(key, _SensorEntry()).refcount += 1
+
+    def release(self, key: str) -> None:
+        """Unregister a user, the series is dropped with the last user."""
+        entry = self._sensors.get(key)
+        if entry is None:
+            return
+        entry.refcount -= 1
+        if entry.refcount <= 0:
+            del self._sensors[key]
+
+    def refcount(self, key: str) -> int:
+        """Return the number of users of the price sensor."""
+        entry = self._sensors.get(key)
+        return entry.refcount if entry else 0
+
+    def invalidate(self, key: str) -> None:
+        """Drop the cached series, the next get normalizes the data again."""
+        entry = self._sensors.get(key)
+        if entry is not None:
+            entry.token = None
+            entry.transformed.clear()
+
+    def get(
+        self,
+        key: str,
+        token: Any,
+        load: Callable[[], DaySeries],
+        params: planner.PlanParameters,
+    ) -> TransformedSeries:
+        """Return the transformed series for the sensor data.
+
+        The token identifies the sensor data, e.g. the state last_updated
+        timestamp. load is only called when the token changes.
+        """
+        entry = self._sensors.get(key)
+        if entry is None:
+            # Not acquired, compute without caching
+            entry = _SensorEntry()
+        if token is None or entry.token != token or entry.series is None:
+            entry.series = load()
+            entry.transformed.clear()
+            entry.token = token
+            self.parse_count += 1
+            _LOGGER.debug("Normalized prices for %s", key)
+
+        transform_key = (params.vat, params.extra_import, params.extra_export)
+        transformed = entry.transformed.get(transform_key)
+        if transformed is None:
+            transformed = TransformedSeries(
+                planner.transform_series(entry.series.today, params),
+                planner.transform_series(entry.series.tomorrow, params),
+            )
+            entry.transformed[transform_key] = transformed
+            self.transform_count += 1
+        return transformed
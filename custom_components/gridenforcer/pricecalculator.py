@@ -1,14 +1,12 @@
 import logging
 import math
-import zoneinfo
-from collections import namedtuple
-from datetime import datetime, timedelta
+import multiprocessing
+import os
+from collections import deque
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
 
-# import numpy as np
-# from scipy.signal import find_peaks
-from typing import List, Tuple
-
-from dateutil import parser
+import numpy as np
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import (
     Event,
@@ -17,17 +15,98 @@ from homeassistant.core import (
     State,
     callback,
 )
+from homeassistant.helpers import entity_registry as er
+from homeassistant.util import dt as dt_util
 
+from . import planner
+from .archive import DayArchive, battery_energy, soc_at
 from .const import (
+    AUTOTUNE_APPLY,
+    AUTOTUNE_OFF,
+    CONF_ARCHIVE,
+    CONF_AUTOTUNE,
+    CONF_AUTOTUNE_HISTORY,
     CONF_BAT_COST,
+    CONF_BATTERY_CAPACITY,
+    CONF_BATTERY_CURRENT_SENSOR,
+    CONF_BATTERY_EFFICIENCY,
+    CONF_CHARGE_POWER,
+    CONF_DISCHARGE_POWER,
     CONF_EXTRA_EXPORT,
     CONF_EXTRA_IMPORT,
+    CONF_FIT_SCHEDULE,
     CONF_HOURS_SELFUSE,
+    CONF_MPC,
+    CONF_MPC_DEVIATION,
+    CONF_PEAK_DETECTION,
+    CONF_PRICE_FILE,
+    CONF_PRICE_FILL,
+    CONF_PRICE_RESOLUTION,
     CONF_PRICE_SENSOR,
+    CONF_PRICE_SOURCE,
+    CONF_SCENARIO_FILE,
+    CONF_SCENARIO_SOURCE,
+    CONF_SCENARIOS,
+    CONF_SELFUSE_POWER,
+    CONF_SOC_DEADBAND,
+    CONF_SOC_FAULT_SLOPE,
+    CONF_SOC_HYSTERESIS,
     CONF_VAT,
+    DATA_MODBUS,
+    DEFAULT_AUTOTUNE_HISTORY,
+    DEFAULT_BATTERY_CAPACITY,
+    DEFAULT_BATTERY_EFFICIENCY,
+    DEFAULT_CHARGE_POWER,
+    DEFAULT_DISCHARGE_POWER,
+    DEFAULT_MPC_DEVIATION,
+    DEFAULT_PRICE_RESOLUTION,
+    DEFAULT_SELFUSE_POWER,
+    DEFAULT_SOC_DEADBAND,
+    DEFAULT_SOC_FAULT_SLOPE,
+    DEFAULT_SOC_HYSTERESIS,
+    DOMAIN,
+    EVENT_SOC_FAULT,
+    FILL_FORWARD,
+    MPC_CONTROL,
+    MPC_OFF,
+    PEAKS_DELTA,
+    SCENARIOS_FILE,
+    SCENARIOS_OFF,
+    SCENARIOS_WEEKDAY,
+    SOURCE_AUTO,
 )
+from .daycalendar import calendar_for, get_zone, slot_index
 from .invertermode import InverterMode
+from .mpc import MpcController, MpcPlan, battery_model
+from .pipeline import PlanPipeline
+from .pricecache import PriceSeriesCache, TransformedSeries, entry_cache_key
+from .priceseries import PriceSeries
+from .pricesource import DaySeries, create_price_source, series_from_entries
+from .pricesummary import PriceSummary
+from .resample import prepare_series
+from .rollups import Rollups
+from .scenarios import (
+    ScenarioPlan,
+    load_scenario_file,
+    next_day,
+    plan_scenarios,
+    scenarios_from_history,
+)
+from .simulate import BatterySpec, fit_schedule, simulate
+from .soccontrol import SocController
+from .socfault import SocFaultDetector
+from .storage import (
+    ROLLUP_SAVE_DELAY,
+    SAVE_DELAY,
+    RollupStore,
+    ScheduleStore,
+    schedule_covers,
+    series_from_snapshot,
+    timevalues_from_list,
+    timevalues_to_list,
+)
 from .timevalue import TimeValue
+from .tuning import TuneCache, TuneResult
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -37,7 +116,7 @@ class PriceCalculator:
         self,
         hass: HomeAssistant,
         config: ConfigEntry,
-        # price_sensor_state: State,
+        price_cache: PriceSeriesCache | None = None,
     ):
         self._config = config
         self._hass = hass
@@ -70,6 +149,93 @@ class PriceCalculator:
         self._selfuse_tomorrow_max = None
         self._sell_tomorrow_max = None
         self._charge_hours = None
+        self._prices: DaySeries | None = None
+        self._store = ScheduleStore(hass, config.entry_id)
+        # Without a shared cache the series is normalized on every update
+        self._price_cache = price_cache or PriceSeriesCache()
+        source_name = config.data.get(CONF_PRICE_SOURCE, SOURCE_AUTO)
+        price_file = config.data.get(CONF_PRICE_FILE) or None
+        self._price_source = create_price_source(
+            source_name, dt_util.DEFAULT_TIME_ZONE, price_file
+        )
+        self._price_cache_key = entry_cache_key(config.data)
+        self._price_resolution = 60 * int(
+            config.data.get(CONF_PRICE_RESOLUTION, DEFAULT_PRICE_RESOLUTION)
+        )
+        self._price_fill = config.data.get(CONF_PRICE_FILL, FILL_FORWARD)
+        self._peak_detection = config.data.get(CONF_PEAK_DETECTION, PEAKS_DELTA)
+        self._number_entity_ids: dict[str, str] = {}
+        # Cached planning stages, a parameter change only reruns what depends on it
+        self._series: TransformedSeries | None = None
+        self._pipeline_today = PlanPipeline()
+        self._pipeline_tomorrow = PlanPipeline()
+        # Epoch slot boundaries of schedule_today for lookups by index
+        self._schedule_starts = np.empty(0, np.int64)
+        self._schedule_ends = np.empty(0, np.int64)
+        # Auto-tuning of the planning parameters once tomorrow's prices land
+        self._autotune = config.data.get(CONF_AUTOTUNE, AUTOTUNE_OFF)
+        self._tune_cache = TuneCache()
+        self._tune_result: TuneResult | None = None
+        self._tuning = False
+        # Tomorrow's prices the last sweep was started for
+        self._tuned_for: planner.PricedSeries | None = None
+        # Delta and bat_cost picked by the sweep, there are no entities for them
+        self._tuned_delta: float | None = None
+        self._tuned_bat_cost: float | None = None
+        # Re-planning of the remaining horizon from the measured SoC
+        self._mpc_mode = config.data.get(CONF_MPC, MPC_OFF)
+        self._mpc_deviation = float(
+            config.data.get(CONF_MPC_DEVIATION, DEFAULT_MPC_DEVIATION)
+        )
+        # Same battery as the SoC projection, so MPC plans project feasible
+        self._mpc = MpcController(battery_model(self._battery_spec()))
+        self._mpc_plan: MpcPlan | None = None
+        self._soc: float | None = None
+        # Projected SoC of the remaining slots, see simulate.py
+        self._fit_schedule = bool(config.data.get(CONF_FIT_SCHEDULE, False))
+        self._soc_projection: dict[int, dict] = {}
+        # Buy and sell price sensors, rebuilt once per price update
+        self._price_summaries: dict[str, PriceSummary] = {}
+        self._price_listeners: list[Callable[[], None]] = []
+        self._schedule_listeners: list[Callable[[], None]] = []
+        # Finished days are archived with the SoC measured during the day
+        self._archive = (
+            DayArchive(hass.config.path(DOMAIN, "archive", config.entry_id))
+            if config.data.get(CONF_ARCHIVE, True)
+            else None
+        )
+        self._soc_samples: list[tuple[float, float]] = []
+        # Daily and monthly totals for the dashboards, see rollups.py
+        self._rollups = Rollups(
+            dt_util.DEFAULT_TIME_ZONE,
+            float(config.data.get(CONF_BATTERY_CAPACITY, DEFAULT_BATTERY_CAPACITY)),
+        )
+        # Not saved before the stored totals are loaded, that would drop them
+        self._rollup_store = RollupStore(hass, config.entry_id)
+        self._rollups_loaded = False
+        self._fcrd_active_since: dict[bool, float] = {}
+        # Mode for the SoC limits, thresholds pushed by the number entities
+        self._soc_control = SocController(
+            float(config.data.get(CONF_SOC_DEADBAND, DEFAULT_SOC_DEADBAND)),
+            float(config.data.get(CONF_SOC_HYSTERESIS, DEFAULT_SOC_HYSTERESIS)),
+        )
+        self._soc_fault = SocFaultDetector(
+            float(config.data.get(CONF_SOC_FAULT_SLOPE, DEFAULT_SOC_FAULT_SLOPE))
+        )
+        self._battery_current_sensor = config.data.get(CONF_BATTERY_CURRENT_SENSOR)
+        # Tomorrow planned over price scenarios until its prices are published
+        self._scenario_objective = config.data.get(CONF_SCENARIOS, SCENARIOS_OFF)
+        self._scenario_source = config.data.get(CONF_SCENARIO_SOURCE, SCENARIOS_WEEKDAY)
+        self._scenario_file = config.data.get(CONF_SCENARIO_FILE) or None
+        self._scenario_plan: ScenarioPlan | None = None
+        self._scenario_key = None
+        self._price_history: deque[planner.PricedSeries] = deque(
+            maxlen=int(config.data.get(CONF_AUTOTUNE_HISTORY, DEFAULT_AUTOTUNE_HISTORY))
+        )
+
+    @property
+    def price_cache_key(self) -> str:
+        return self._price_cache_key
 
     @property
     def today_lowest_price(self) -> TimeValue:
@@ -111,6 +277,14 @@ class PriceCalculator:
     def next_discharge_slot2(self) -> TimeValue:
         return self._next_discharge_slot2
 
+    @property
+    def selfuse_hours(self) -> int | None:
+        return self._hours_self_use
+
+    @property
+    def charge_hours(self) -> int | None:
+        return self._charge_hours
+
     @property
     def raw_buy_today(self) -> list:
         return self._raw_buy_today
@@ -151,15 +325,177 @@ class PriceCalculator:
     def sell_tomorrow_max(self) -> float:
         return self._sell_tomorrow_max
 
+    def _index_schedule(self) -> None:
+        self._schedule_starts = np.fromiter(
+            (tv.start.timestamp() for tv in self._schedule_today),
+            np.int64,
+            len(self._schedule_today),
+        )
+        self._schedule_ends = np.fromiter(
+            (tv.end.timestamp() for tv in self._schedule_today),
+            np.int64,
+            len(self._schedule_today),
+        )
+        for update_callback in list(self._schedule_listeners):
+            update_callback()
+
+    def current_slot(self, now: datetime | None = None) -> TimeValue | None:
+        """Slot of today's schedule containing now."""
+        epoch = (now or dt_util.utcnow()).timestamp()
+        index = slot_index(self._schedule_starts, self._schedule_ends, epoch)
+        return None if index is None else self._schedule_today[index]
+
+    def _config_parameters(self) -> dict:
+        """Config parameters a stored schedule was computed with."""
+        return {
+            CONF_BAT_COST: self._config.data[CONF_BAT_COST],
+            CONF_VAT: self._config.data[CONF_VAT],
+            CONF_EXTRA_IMPORT: self._config.data[CONF_EXTRA_IMPORT],
+            CONF_EXTRA_EXPORT: self._config.data[CONF_EXTRA_EXPORT],
+        }
+
+    def _snapshot_data(self) -> dict:
+        """Build the snapshot written by the store."""
+        return {
+            "saved_at": datetime.now(timezone.utc).isoformat(),
+            "parameters": self._config_parameters(),
+            "hours_self_use": self._hours_self_use,
+            "charge_hours": self._charge_hours,
+            "prices_today": self._prices.today.to_dict() if self._prices else None,
+            "prices_tomorrow": (
+                self._prices.tomorrow.to_dict() if self._prices else None
+            ),
+            "schedule_today": timevalues_to_list(self._schedule_today),
+            "schedule_tomorrow": timevalues_to_list(self._schedule_tomorrow),
+            "selfuse_today_max": self._selfuse_today_max,
+            "sell_today_max": self._sell_today_max,
+            "selfuse_tomorrow_max": self._selfuse_tomorrow_max,
+            "sell_tomorrow_max": self._sell_tomorrow_max,
+        }
+
+    async def async_restore_snapshot(self) -> bool:
+        """Restore the last stored schedule if it is still valid.
+
+        Returns True if a schedule covering the current time was restored.
+        """
+        try:
+            data = await self._store.async_load()
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Failed to load stored schedule, ignoring it")
+            return False
+        if not data:
+            return False
+        if data.get("parameters") != self._config_parameters():
+            _LOGGER.info("Stored schedule computed with other parameters, ignoring")
+            return False
+
+        schedule_today = timevalues_from_list(data.get("schedule_today"))
+        schedule_tomorrow = timevalues_from_list(data.get("schedule_tomorrow"))
+        prices_today = series_from_snapshot(data.get("prices_today"))
+        prices_tomorrow = series_from_snapshot(data.get("prices_tomorrow"))
+        selfuse_today_max = data.get("selfuse_today_max")
+        sell_today_max = data.get("sell_today_max")
+        selfuse_tomorrow_max = data.get("selfuse_tomorrow_max")
+        sell_tomorrow_max = data.get("sell_tomorrow_max")
+        if not schedule_covers(schedule_today) and schedule_covers(schedule_tomorrow):
+            # Restarted after midnight, the stored tomorrow is today
+            schedule_today, schedule_tomorrow = schedule_tomorrow, []
+            prices_today, prices_tomorrow = prices_tomorrow, None
+            selfuse_today_max, sell_today_max = selfuse_tomorrow_max, sell_tomorrow_max
+            selfuse_tomorrow_max, sell_tomorrow_max = None, None
+        if not schedule_covers(schedule_today):
+            _LOGGER.info("Stored schedule has expired, ignoring")
+            return False
+
+        if not self._hours_self_use:
+            self._hours_self_use = data.get("hours_self_use")
+        if not self._charge_hours:
+            self._charge_hours = data.get("charge_hours")
+        if prices_today is not None:
+            self._prices = DaySeries(
+                prices_today,
+                prices_tomorrow or prices_today.slice(0, 0),
+            )
+        self._schedule_today = schedule_today
+        self._schedule_tomorrow = schedule_tomorrow
+        self._index_schedule()
+        self._selfuse_today_max = selfuse_today_max
+        self._sell_today_max = sell_today_max
+        self._selfuse_tomorrow_max = selfuse_tomorrow_max
+        self._sell_tomorrow_max = sell_tomorrow_max
+        _LOGGER.info("Restored schedule saved at %s", data.get("saved_at"))
+        return True
+
+    @property
+    def stage_metrics(self) -> dict:
+        return {
+            "today": self._pipeline_today.metrics,
+            "tomorrow": self._pipeline_tomorrow.metrics,
+        }
+
+    async def async_set_parameter(self, key: str, value: float | None) -> None:
+        """Take a new value pushed by one of the number entities.
+
+        Planning parameters replan from the last prices, only the stages
+        depending on the parameter are recomputed.
+        """
+        _LOGGER.debug("Parameter %s set to %s", key, value)
+        if key in ("soc_backup", "soc_max"):
+            if key == "soc_backup":
+                self._bat_soc_backup = value
+                self._soc_control.set_thresholds(backup=value)
+            else:
+                self._bat_soc_max = value
+                self._soc_control.set_thresholds(soc_max=value)
+            await self._async_apply_soc_limits()
+            if self._mpc_mode != MPC_OFF and self._series is not None:
+                await self._async_mpc_solve()
+                if self._inverter_mode_sonsor:
+                    await self._inverter_mode_sonsor.async_update()
+            return
+        value = int(value) if value is not None else None
+        if key == "selfuse_hours":
+            changed = value != self._hours_self_use
+            self._hours_self_use = value
+        elif key == "charge_hours":
+            changed = value != self._charge_hours
+            self._charge_hours = value
+        else:
+            return
+        if changed and self._series is not None:
+            await self._update_from_series(self._series)
+
+    def _number_entity_id(self, key: str) -> str | None:
+        """Entity id of this entry's number entity, e.g. selfuse_hours.
+
+        None until the entity is registered. Guessing the default id could
+        pick the number of another entry, the entity pushes its value
+        through async_set_parameter once it is added instead.
+        """
+        if key not in self._number_entity_ids:
+            registry = er.async_get(self._hass)
+            entity_id = registry.async_get_entity_id(
+                "number", DOMAIN, f"{self._config.entry_id}_{key}"
+            )
+            if entity_id is None:
+                return None
+            self._number_entity_ids[key] = entity_id
+        return self._number_entity_ids[key]
+
+    def _number_value(self, key: str) -> int | None:
+        """Value of this entry's number entity, None while unknown."""
+        if (entity_id := self._number_entity_id(key)) is None:
+            return None
+        state = self._hass.states.get(entity_id)
+        if not state or state.state in ("unavailable", "unknown"):
+            return None
+        return int(float(state.state))
+
     async def async_update_price_calculator(self, force_update: bool = False):
         if not self._hours_self_use:
-            state = self._hass.states.get("number.gridenforcer_selfuse_hours")
-            if state and state.state != "unavailable":
-                self._hours_self_use = int(float(state.state))
+            self._hours_self_use = self._number_value("selfuse_hours")
         if not self._charge_hours:
-            state = self._hass.states.get("number.gridenforcer_charge_hours")
-            if state and state.state != "unavailable":
-                self._charge_hours = int(float(state.state))
+            self._charge_hours = self._number_value("charge_hours")
 
         if (
             not self._price_sensor_data
@@ -170,10 +506,7 @@ class PriceCalculator:
 
         if self._price_sensor_data and self._price_sensor_data.state != "unknown":
             _LOGGER.info("Update prices (async_update_price_calculator)")
-            await self.update_timevalues_from_dict(
-                self._price_sensor_data.attributes["raw_today"],
-                self._price_sensor_data.attributes["raw_tomorrow"],
-            )
+            await self.update_timevalues_from_state(self._price_sensor_data)
 
     @callback
     async def async_update_from_state_fcrddown(
@@ -182,7 +515,9 @@ class PriceCalculator:
         entity_id = event.data["entity_id"]
         old_state = event.data["old_state"]
         new_state = event.data["new_state"]
+        await self._async_switch_fcrd(False, new_state)
         _LOGGER.info(f"FCRD Down changed {old_state} {new_state}")
+        self._track_fcrd(False, new_state)
         # await self.async_update_price_calculator(True)
 
     @callback
@@ -192,7 +527,31 @@ class PriceCalculator:
         entity_id = event.data["entity_id"]
         old_state = event.data["old_state"]
         new_state = event.data["new_state"]
+        await self._async_switch_fcrd(True, new_state)
         _LOGGER.info(f"FCRD Up changed {old_state} {new_state}")
+        self._track_fcrd(True, new_state)
+
+    async def _async_switch_fcrd(self, up: bool, new_state: State | None) -> None:
+        """Switch the inverter mode before anything else runs."""
+        if self._inverter_mode_sonsor is None:
+            return
+        active = new_state is not None and new_state.state == "on"
+        flipped = new_state.last_changed if new_state else dt_util.utcnow()
+        await self._inverter_mode_sonsor.async_set_fcrd(up, active, flipped)
+
+    def _track_fcrd(self, up: bool, new_state: State | None) -> None:
+        """Count FCR-D activations and add the active time when one ends."""
+        now = dt_util.utcnow().timestamp()
+        active = new_state is not None and new_state.state == "on"
+        since = self._fcrd_active_since.get(up)
+        if active and since is None:
+            self._fcrd_active_since[up] = now
+            self._rollups.add_fcrd(now, up, 0.0, True)
+            self._save_rollups()
+        elif not active and since is not None:
+            del self._fcrd_active_since[up]
+            self._rollups.add_fcrd(now, up, now - since, False)
+            self._save_rollups()
 
     @callback
     async def async_update_from_state_soc(
@@ -201,44 +560,85 @@ class PriceCalculator:
         entity_id = event.data["entity_id"]
         old_state = event.data["old_state"]
         new_state = event.data["new_state"]
+        if new_state is None or new_state.state in ("unknown", "unavailable"):
+            return
+        try:
+            soc = float(new_state.state)
+        except ValueError:
+            return
+        fault = self._soc_fault.add(
+            new_state.last_updated.timestamp(), soc, self._battery_current()
+        )
+        if fault is not None:
+            await self._async_soc_fault(fault)
+        if not self._soc_control.update(soc):
+            # Inside the deadband, e.g. the 0.0001 forcing a new state
+            return
         _LOGGER.info(f"Soc changed {old_state} {new_state}")
-        if not self._bat_soc_backup:
-            state = self._hass.states.get("number.gridenforcer_soc_backup")
-            self._bat_soc_backup = (
-                float(state.state)
-                if state and state.state not in ("unknown", "unavailable")
-                else 20.0
+        previous = self._soc
+        self._soc = soc
+        if previous is not None and (slot := self.current_slot()) is not None:
+            self._rollups.add_energy(
+                dt_util.utcnow().timestamp(),
+                (self._soc - previous) * self._battery_spec().capacity_kwh / 100,
+                slot.mode,
+                slot.value,
+                slot.sell_value,
             )
-
-        if not self._bat_soc_max:
-            state = self._hass.states.get("number.gridenforcer_soc_max")
-            self._bat_soc_max = (
-                float(state.state)
-                if state and state.state not in ("unknown", "unavailable")
-                else 80.0
-            )
-
-        if self._inverter_mode_sonsor.state == InverterMode.CHARGING.value:
-            if float(new_state.state) < self._bat_soc_max:
-                return
-
-        if self._inverter_mode_sonsor.state == InverterMode.DISCHARGING.value:
-            if float(new_state.state) > self._bat_soc_backup:
-                return
-
-        if float(new_state.state) < self._bat_soc_backup:
-            await self._inverter_mode_sonsor.set_state(InverterMode.CHARGESOC)
+            self._save_rollups()
+        if self._archive is not None:
+            self._soc_samples.append((dt_util.utcnow().timestamp(), self._soc))
+        if self._mpc_mode != MPC_OFF:
+            await self.async_update_mpc()
+        self._project_soc()
+        await self._async_apply_soc_limits()
+
+    async def _async_apply_soc_limits(self) -> None:
+        """Set the mode the SoC limits require, nothing when it may stay."""
+        if self._inverter_mode_sonsor is None or self._soc_fault.fault:
             return
+        mode = self._soc_control.decide(self._inverter_mode_sonsor.requested_mode)
+        if mode is not None:
+            await self._inverter_mode_sonsor.set_state(mode)
 
-        if (
-            float(new_state.state) >= self._bat_soc_backup
-            and float(new_state.state) < self._bat_soc_max
-        ):
-            await self._inverter_mode_sonsor.set_state(InverterMode.STANDBY)
-            return
+    @property
+    def soc_control(self) -> dict:
+        return self._soc_control.to_dict()
 
-        if float(new_state.state) == self._bat_soc_max:
-            await self._inverter_mode_sonsor.set_state(InverterMode.FULLYCHARGED)
+    @property
+    def soc_fault(self) -> dict:
+        return self._soc_fault.to_dict()
+
+    def _battery_current(self) -> float:
+        """Battery current in A from the sensor or the inverter, NaN if unknown."""
+        if self._battery_current_sensor:
+            state = self._hass.states.get(self._battery_current_sensor)
+            try:
+                return float(state.state) if state else math.nan
+            except ValueError:
+                return math.nan
+        coordinator = self._hass.data.get(DATA_MODBUS, {}).get(self._config.entry_id)
+        if coordinator is not None and coordinator.data:
+            return float(coordinator.data.get("battery_current", math.nan))
+        return math.nan
+
+    async def _async_soc_fault(self, fault: bool) -> None:
+        """Announce a SoC jump and hold the inverter in Fault until it ends."""
+        _LOGGER.warning(
+            "SoC fault %s, slope %s %%/h",
+            "detected" if fault else "cleared",
+            self._soc_fault.slope,
+        )
+        self._hass.bus.async_fire(
+            EVENT_SOC_FAULT,
+            {"entry_id": self._config.entry_id, **self._soc_fault.to_dict()},
+        )
+        if self._inverter_mode_sonsor is None:
+            return
+        if fault:
+            await self._inverter_mode_sonsor.set_state(InverterMode.FAULT)
+        else:
+            await self._inverter_mode_sonsor.async_update()
 
     async def async_update_from_state_prices(
         self, event: Event[EventStateChangedData]
@@ -252,10 +652,7 @@ class PriceCalculator:
             self._price_sensor_data = new_state
         if self._price_sensor_data and self._price_sensor_data.state != "unknown":
             _LOGGER.info("Update prices")
-            await self.update_timevalues_from_dict(
-                self._price_sensor_data.attributes["raw_today"],
-                self._price_sensor_data.attributes["raw_tomorrow"],
-            )
+            await self.update_timevalues_from_state(self._price_sensor_data)
 
     async def async_update_from_schedule(self, time):
         """Update the sensors."""
@@ -272,6 +669,9 @@ class PriceCalculator:
     ):
         """Recalc sensor values if not already set"""
         self._inverter_mode_sonsor = mode_sensor
+        if self._schedule_today and schedule_covers(self._schedule_today):
+            # Schedule restored from storage, use it until the recompute is done
+            mode_sensor.set_state_from_schedule()
         # self._next_charge_slot_1_sensor = next_charge_slot_1
         # self._next_discharge_slot_1_sensor = next_discharge_slot_1
         # self._next_charge_slot_2_sensor = next_charge_slot_2
@@ -287,108 +687,622 @@ class PriceCalculator:
         #     await self._next_charge_slot_2_sensor.async_update()
         #     await self._next_discharge_slot_2_sensor.async_update()
 
+    def _plan_parameters(self) -> planner.PlanParameters:
+        params = planner.PlanParameters(
+            vat=self._config.data[CONF_VAT],
+            extra_import=self._config.data[CONF_EXTRA_IMPORT],
+            extra_export=self._config.data[CONF_EXTRA_EXPORT],
+            bat_cost=self._battery_use,
+            selfuse_hours=self._hours_self_use,
+            charge_hours=self._charge_hours,
+            peaks=self._peak_detection,
+        )
+        if self._tuned_delta is not None:
+            params = params._replace(delta=self._tuned_delta)
+        if self._tuned_bat_cost is not None:
+            params = params._replace(bat_cost=self._tuned_bat_cost)
+        return params
+
     def calc_buy_price(self, buy_val: float) -> float:
-        return round(
-            buy_val * (1 + (self._config.data[CONF_VAT] / 100))
-            + self._config.data[CONF_EXTRA_IMPORT],
-            3,
+        return planner.calc_buy_price(
+            buy_val,
+            self._config.data[CONF_VAT],
+            self._config.data[CONF_EXTRA_IMPORT],
         )
 
     def calc_sell_price(self, sell_val: float) -> float:
-        return round(sell_val + self._config.data[CONF_EXTRA_EXPORT], 3)
+        return planner.calc_sell_price(sell_val, self._config.data[CONF_EXTRA_EXPORT])
+
+    async def update_timevalues_from_state(self, state: State):
+        """Recompute the schedules from the price sensor state.
+
+        The configured price source adapter normalizes the attributes, the
+        state's last_updated identifies the data in the shared price cache.
+        """
+        attributes = dict(state.attributes)
+        now = dt_util.now()
+        if self._price_source.blocking:
+            prices = await self._hass.async_add_executor_job(
+                self._price_source.normalize, attributes, now
+            )
+            series = self._price_cache.get(
+                self._price_cache_key,
+                None,
+                lambda: self._prepare(prices),
+                self._plan_parameters(),
+            )
+        else:
+            series = self._price_cache.get(
+                self._price_cache_key,
+                state.last_updated,
+                lambda: self._prepare(self._price_source.normalize(attributes, now)),
+                self._plan_parameters(),
+            )
+        await self._update_from_series(series)
 
-    async def update_timevalues_from_dict(self, today_data: list, tomorrow_data: list):
-        today_values = []
-        self._raw_buy_today = []
-        self._raw_sell_today = []
+    async def update_timevalues_from_dict(
+        self, today_data: list, tomorrow_data: list, token=None
+    ):
+        """Recompute the schedules from raw price entries.
+
+        token identifies the price sensor data for the shared price cache.
+        """
+        tz = dt_util.DEFAULT_TIME_ZONE
+        series = self._price_cache.get(
+            self._price_cache_key,
+            token,
+            lambda: self._prepare(
+                DaySeries(
+                    series_from_entries(today_data, tz),
+                    series_from_entries(tomorrow_data, tz),
+                )
+            ),
+            self._plan_parameters(),
+        )
+        await self._update_from_series(series)
 
-        for entry in today_data:
-            if isinstance(entry["start"], str):
-                start = parser.parse(entry["start"])
-            else:
-                start = entry["start"]
+    def _prepare(self, prices: DaySeries) -> DaySeries:
+        """Repair gaps and duplicates and resample to the configured resolution."""
+        return DaySeries(
+            prepare_series(prices.today, self._price_resolution, self._price_fill),
+            prepare_series(prices.tomorrow, self._price_resolution, self._price_fill),
+        )
 
-            if isinstance(entry["end"], str):
-                end = parser.parse(entry["end"])
-            else:
-                end = entry["end"]
-            value_raw = entry["value"]
-            today_values.append(
-                TimeValue(
-                    start=start,
-                    end=end,
-                    value=self.calc_buy_price(value_raw),
-                    sell_value=self.calc_sell_price(value_raw),
+    async def _update_from_series(self, series: TransformedSeries):
+        self._remember_day(series)
+        self._series = series
+        self._prices = DaySeries(series.today.series, series.tomorrow.series)
+        params = self._plan_parameters()
+        today_result = self._pipeline_today.run(series.today, params)
+        tomorrow_result = self._pipeline_tomorrow.run(series.tomorrow, params)
+        today_values = self._pipeline_today.prices
+        tomorrow_values = self._pipeline_tomorrow.prices
+        self._raw_buy_today = [
+            {"start": tv.start, "end": tv.end, "value": tv.value} for tv in today_values
+        ]
+        self._raw_sell_today = [
+            {"start": tv.start, "end": tv.end, "value": tv.sell_value}
+            for tv in today_values
+        ]
+        self._raw_buy_tomorrow = [
+            {"start": tv.start, "end": tv.end, "value": tv.value}
+            for tv in tomorrow_values
+        ]
+        self._raw_sell_tomorrow = [
+            {"start": tv.start, "end": tv.end, "value": tv.sell_value}
+            for tv in tomorrow_values
+        ]
+        self._price_summaries = {
+            kind: PriceSummary(
+                series.today.series,
+                getattr(series.today, kind),
+                series.tomorrow.series,
+                getattr(series.tomorrow, kind),
+            )
+            for kind in ("buy", "sell")
+        }
+        for update_callback in list(self._price_listeners):
+            update_callback()
+
+        if not today_values:
+            _LOGGER.warning("No prices for today from %s", self._price_sensor_name)
+            return
+
+        # await self.update_prices(today_values, tomorrow_values)
+        self._schedule_today = today_result.schedule
+        self._selfuse_today_max = today_result.selfuse_max
+        self._sell_today_max = today_result.sell_max
+        if len(tomorrow_values) > 0:
+            self._schedule_tomorrow = tomorrow_result.schedule
+            self._selfuse_tomorrow_max = tomorrow_result.selfuse_max
+            self._sell_tomorrow_max = tomorrow_result.sell_max
+            self._scenario_plan = None
+            self._scenario_key = None
+        elif self._scenario_objective != SCENARIOS_OFF:
+            await self._plan_tomorrow_scenarios(series)
+        self._index_schedule()
+        self._project_soc(fit=self._fit_schedule and self._mpc_mode != MPC_CONTROL)
+        if self._mpc_mode != MPC_OFF:
+            await self._async_mpc_solve()
+        self._store.async_delay_save(self._snapshot_data, SAVE_DELAY)
+        if self._inverter_mode_sonsor:
+            await self._inverter_mode_sonsor.async_update()
+        if (
+            self._autotune != AUTOTUNE_OFF
+            and len(tomorrow_values) > 0
+            and not self._tuning
+            and series.tomorrow is not self._tuned_for
+        ):
+            # The price cache returns the same object until new prices land,
+            # so a replan after applying the result does not sweep again
+            self._tuning = True
+            self._tuned_for = series.tomorrow
+            self._hass.async_create_background_task(
+                self.async_autotune(series), f"{DOMAIN} autotune"
+            )
+
+    def _mpc_horizon(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, int] | None:
+        """Slot starts, buy and sell prices of today and tomorrow."""
+        if self._series is None or not len(self._series.today.series):
+            return None
+        days = [priced for priced in self._series if len(priced.series)]
+        return (
+            np.concatenate([priced.series.starts for priced in days]),
+            np.concatenate([priced.buy for priced in days]),
+            np.concatenate([priced.sell for priced in days]),
+            days[0].series.step,
+        )
+
+    async def _async_mpc_solve(self) -> None:
+        """Solve the horizon again, then re-plan from the last SoC."""
+        horizon = self._mpc_horizon()
+        if horizon is None:
+            return
+        starts, buy, sell, step = horizon
+        # Same defaults as the SoC overrides when the numbers are not set
+        await self._hass.async_add_executor_job(
+            self._mpc.solve,
+            starts,
+            buy,
+            sell,
+            step,
+            self._bat_soc_backup or 20.0,
+            self._bat_soc_max or 80.0,
+            self._battery_use,
+        )
+        self._mpc_plan = None
+        await self.async_update_mpc()
+
+    async def async_update_mpc(self, now: datetime | None = None) -> None:
+        """Re-plan the remaining horizon from the measured SoC.
+
+        Runs at every slot boundary and when the SoC is further than the
+        allowed deviation from the projection, otherwise the current plan
+        is kept. Called from the SoC listener and a timer.
+        """
+        if self._mpc_mode == MPC_OFF or self._soc is None:
+            return
+        epoch = (now or dt_util.utcnow()).timestamp()
+        plan = self._mpc_plan
+        if plan is not None and self._series is not None:
+            step = self._series.today.series.step
+            projected = plan.projected_soc(epoch, step)
+            if (
+                projected is not None
+                and epoch < plan.starts[0] + step
+                and abs(self._soc - projected) <= self._mpc_deviation
+            ):
+                return
+        plan = self._mpc.plan(epoch, self._soc)
+        if plan is None:
+            return
+        self._mpc_plan = plan
+        _LOGGER.debug(
+            "MPC re-plan from SoC %s: %s, value %.3f",
+            self._soc,
+            plan.modes[:4],
+            plan.value,
+        )
+        if self._mpc_mode == MPC_CONTROL:
+            self._apply_mpc_plan(plan)
+            if self._inverter_mode_sonsor:
+                await self._inverter_mode_sonsor.async_update()
+
+    def _apply_mpc_plan(self, plan: MpcPlan) -> None:
+        """Use the modes of the plan for the remaining slots of the schedules."""
+        self._apply_modes(dict(zip(plan.starts.tolist(), plan.modes)))
+        self._project_soc()
+
+    def _apply_modes(self, modes: dict[int, str]) -> None:
+        """Set the modes of slots by start epoch.
+
+        Changed slots are copied, the planned TimeValues stay cached in the
+        pipelines.
+        """
+
+        def _replan(schedule: list[TimeValue]) -> list[TimeValue]:
+            result = []
+            for tv in schedule:
+                mode = modes.get(int(tv.start.timestamp()))
+                if mode is not None and mode != tv.mode:
+                    tv = TimeValue(tv.start, tv.end, tv.value, tv.sell_value)
+                    tv.mode = mode
+                result.append(tv)
+            return result
+
+        self._schedule_today = _replan(self._schedule_today)
+        self._schedule_tomorrow = _replan(self._schedule_tomorrow)
+        self._index_schedule()
+
+    def _battery_spec(self) -> BatterySpec:
+        return BatterySpec(
+            capacity_kwh=float(
+                self._config.data.get(CONF_BATTERY_CAPACITY, DEFAULT_BATTERY_CAPACITY)
+            ),
+            charge_kw=float(
+                self._config.data.get(CONF_CHARGE_POWER, DEFAULT_CHARGE_POWER)
+            ),
+            discharge_kw=float(
+                self._config.data.get(CONF_DISCHARGE_POWER, DEFAULT_DISCHARGE_POWER)
+            ),
+            selfuse_kw=float(
+                self._config.data.get(CONF_SELFUSE_POWER, DEFAULT_SELFUSE_POWER)
+            ),
+            efficiency=float(
+                self._config.data.get(
+                    CONF_BATTERY_EFFICIENCY, DEFAULT_BATTERY_EFFICIENCY
                 )
             )
-            self._raw_buy_today.append(
-                {
-                    "start": start,
-                    "end": end,
-                    "value": self.calc_buy_price(value_raw),
-                }
+            / 100,
+            soc_min=self._bat_soc_backup or 20.0,
+            soc_max=self._bat_soc_max or 80.0,
+        )
+
+    def _project_soc(self, fit: bool = False) -> None:
+        """Simulate the remaining slots of today and tomorrow from the SoC.
+
+        With fit the modes are first made feasible, charge slots are added
+        before discharges the battery can not serve and the rest trimmed.
+        Without a measured SoC the projection starts at soc_backup.
+        """
+        today = self._schedule_today
+        now = dt_util.utcnow().timestamp()
+        first = slot_index(self._schedule_starts, self._schedule_ends, now)
+        if first is None:
+            before = not len(self._schedule_starts) or now < self._schedule_starts[0]
+            first = 0 if before else len(today)
+        remaining = today[first:] + self._schedule_tomorrow
+        self._soc_projection = {}
+        if not remaining:
+            return
+        spec = self._battery_spec()
+        step = int((remaining[0].end - remaining[0].start).total_seconds())
+        soc = self._soc if self._soc is not None else spec.soc_min
+        modes = [tv.mode for tv in remaining]
+        if fit:
+            fitted, result = fit_schedule(
+                modes, [tv.value for tv in remaining], step, soc, spec
             )
-            self._raw_sell_today.append(
-                {
-                    "start": start,
-                    "end": end,
-                    "value": self.calc_sell_price(value_raw),
-                }
+            changes = {
+                int(tv.start.timestamp()): mode
+                for tv, mode in zip(remaining, fitted)
+                if mode != tv.mode
+            }
+            if changes:
+                _LOGGER.info("Fitted %s slots to the battery", len(changes))
+                self._apply_modes(changes)
+        else:
+            result = simulate(modes, step, soc, spec)
+        self._soc_projection = {
+            int(tv.start.timestamp()): {
+                "soc": round(end_soc, 1),
+                "feasible": not infeasible,
+            }
+            for tv, end_soc, infeasible in zip(
+                remaining, result.soc[1:].tolist(), result.infeasible.tolist()
             )
-        tomorrow_values = []
-        self._raw_buy_tomorrow = []
-        self._raw_sell_tomorrow = []
-        for entry in tomorrow_data:
-            if isinstance(entry["start"], str):
-                start = parser.parse(entry["start"])
-            else:
-                start = entry["start"]
+        }
 
-            if isinstance(entry["end"], str):
-                end = parser.parse(entry["end"])
-            else:
-                end = entry["end"]
-            value_raw = entry["value"]
-            tomorrow_values.append(
-                TimeValue(
-                    start=start,
-                    end=end,
-                    value=self.calc_buy_price(value_raw),
-                    sell_value=self.calc_sell_price(value_raw),
+    def price_summary(self, kind: str) -> PriceSummary | None:
+        """Buy or sell prices of the last price update."""
+        return self._price_summaries.get(kind)
+
+    @callback
+    def async_add_price_listener(
+        self, update_callback: Callable[[], None]
+    ) -> Callable[[], None]:
+        """Call update_callback after every price update, returns a remover."""
+        self._price_listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._price_listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def async_add_schedule_listener(
+        self, update_callback: Callable[[], None]
+    ) -> Callable[[], None]:
+        """Call update_callback after every schedule change, returns a remover."""
+        self._schedule_listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._schedule_listeners.remove(update_callback)
+
+        return remove_listener
+
+    @property
+    def soc_projection(self) -> dict[int, dict]:
+        """Projected SoC at the end of each remaining slot, by start epoch."""
+        return self._soc_projection
+
+    @property
+    def mpc_state(self) -> dict | None:
+        """Projected SoC and solver counters of the last MPC plan."""
+        plan = self._mpc_plan
+        if plan is None:
+            return None
+        return {
+            "soc": self._soc,
+            "projected_soc": plan.soc.tolist(),
+            "value": round(plan.value, 3),
+            "solves": self._mpc.solves,
+            "reuses": self._mpc.reuses,
+        }
+
+    async def _plan_tomorrow_scenarios(self, series: TransformedSeries) -> None:
+        """Plan tomorrow over price scenarios while its prices are unknown."""
+        today = series.today.series
+        day = next_day(today)
+        params = self._plan_parameters()
+        key = (day, len(self._price_history), params)
+        if key == self._scenario_key:
+            return
+        if self._scenario_source == SCENARIOS_FILE:
+            if not self._scenario_file:
+                return
+            try:
+                scenarios = await self._hass.async_add_executor_job(
+                    load_scenario_file, self._scenario_file, day, today.tz, today.step
                 )
+            except (OSError, ValueError) as err:
+                _LOGGER.warning(
+                    "Could not read price scenarios from %s: %s",
+                    self._scenario_file,
+                    err,
+                )
+                return
+        else:
+            # Today is the most recent day of the history
+            scenarios = scenarios_from_history(
+                [today, *(priced.series for priced in self._price_history)],
+                day,
+                today.tz,
+                self._scenario_source,
+                today.step,
             )
-            self._raw_buy_tomorrow.append(
-                {
-                    "start": start,
-                    "end": end,
-                    "value": self.calc_buy_price(value_raw),
-                }
-            )
-            self._raw_sell_tomorrow.append(
-                {
-                    "start": start,
-                    "end": end,
-                    "value": self.calc_sell_price(value_raw),
-                }
+        if scenarios is None:
+            return
+        plan = await self._hass.async_add_executor_job(
+            plan_scenarios, scenarios, params, self._scenario_objective
+        )
+        # The schedule carries the expected prices of the scenarios
+        expected = planner.transform_series(
+            PriceSeries(scenarios.starts, scenarios.expected, scenarios.step, today.tz),
+            params,
+        )
+        schedule = planner.timevalues_from_series(expected)
+        for tv, mode in zip(schedule, plan.modes):
+            tv.mode = mode
+        self._schedule_tomorrow = schedule
+        self._selfuse_tomorrow_max = None
+        self._sell_tomorrow_max = None
+        self._scenario_plan = plan
+        self._scenario_key = key
+        _LOGGER.info(
+            "Planned %s over %s price scenarios, expected %.2f worst case %.2f",
+            day,
+            plan.scenarios,
+            plan.expected_score,
+            plan.worst_score,
+        )
+
+    @property
+    def scenario_plan(self) -> dict | None:
+        """Summary of tomorrow's scenario plan, None once prices are known."""
+        plan = self._scenario_plan
+        if plan is None:
+            return None
+        return {
+            "objective": self._scenario_objective,
+            "scenarios": plan.scenarios,
+            "candidates": plan.candidates,
+            "expected_score": round(plan.expected_score, 3),
+            "worst_score": round(plan.worst_score, 3),
+        }
+
+    def _remember_day(self, series: TransformedSeries) -> None:
+        """Keep the prices of the previous day when a new day starts."""
+        previous = self._series
+        if (
+            previous is None
+            or not len(previous.today.series)
+            or not len(series.today.series)
+            or previous.today.series.starts[0] == series.today.series.starts[0]
+        ):
+            return
+        self._price_history.appendleft(previous.today)
+        if self._archive is not None:
+            self._archive_day(previous.today)
+
+    def _archive_day(self, priced: planner.PricedSeries) -> None:
+        """Append a finished day to the archive in the background."""
+        series = priced.series
+        boundaries = np.append(series.starts, series.starts[-1] + series.step)
+        samples = self._soc_samples
+        soc = soc_at(
+            boundaries,
+            np.array([sample[0] for sample in samples]),
+            np.array([sample[1] for sample in samples]),
+        )
+        # The last sample before the day ended starts the next day
+        end = float(boundaries[-1])
+        earlier = [sample for sample in samples if sample[0] < end]
+        self._soc_samples = earlier[-1:] + [
+            sample for sample in samples if sample[0] >= end
+        ]
+        modes = {int(tv.start.timestamp()): tv.mode for tv in self._schedule_today}
+        self._hass.async_create_background_task(
+            self._async_archive(
+                calendar_for(int(series.starts[0]), series.tz).day,
+                series.step,
+                series.starts,
+                series.values,
+                priced.buy,
+                priced.sell,
+                [modes.get(start, "Standby") for start in series.starts.tolist()],
+                soc[:-1],
+                battery_energy(soc, self._battery_spec().capacity_kwh),
+            ),
+            f"{DOMAIN} archive",
+        )
+
+    async def async_load_rollups(self) -> None:
+        """Add the stored totals and the archived days to the rollups."""
+        try:
+            stored = await self._rollup_store.async_load()
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Failed to load the stored rollups, ignoring them")
+            stored = None
+        if stored:
+            # Summed with what was counted since startup
+            self._rollups.add_stored(stored)
+        self._rollups_loaded = True
+        self._save_rollups()
+        if self._archive is None:
+            return
+        try:
+            data = await self._hass.async_add_executor_job(self._archive.read)
+        except (OSError, ValueError) as err:
+            _LOGGER.warning("Could not read the archive: %s", err)
+            return
+        # Summed off the event loop, days already counted live are kept
+        archived = Rollups(dt_util.DEFAULT_TIME_ZONE, self._battery_spec().capacity_kwh)
+        await self._hass.async_add_executor_job(archived.add_archive, data)
+        self._rollups.merge_days(archived)
+        self._save_rollups()
+        _LOGGER.debug("Rollups loaded from %s archived days", len(data.days))
+
+    def _save_rollups(self) -> None:
+        if self._rollups_loaded:
+            self._rollup_store.async_delay_save(
+                self._rollups.to_stored, ROLLUP_SAVE_DELAY
             )
 
-        # await self.update_prices(today_values, tomorrow_values)
-        self._schedule_today = self.get_schedule(
-            today_values, self._hours_self_use, self._battery_use
+    @property
+    def rollups(self) -> Rollups:
+        return self._rollups
+
+    async def _async_archive(self, day, *columns) -> None:
+        try:
+            if await self._hass.async_add_executor_job(
+                self._archive.append, day, *columns
+            ):
+                _LOGGER.info("Archived %s", day)
+        except (OSError, ValueError) as err:
+            _LOGGER.warning("Could not archive %s: %s", day, err)
+
+    @property
+    def autotune(self) -> dict | None:
+        """Result of the last sweep, exposed on the inverter mode sensor."""
+        result = self._tune_result
+        if result is None:
+            return None
+        return {
+            "selfuse_hours": result.params.selfuse_hours,
+            "charge_hours": result.params.charge_hours,
+            "bat_cost": result.params.bat_cost,
+            "delta": result.params.delta,
+            "score": round(result.score, 3),
+            "baseline_score": round(result.baseline_score, 3),
+            "candidates": result.candidates,
+            "applied": self._autotune == AUTOTUNE_APPLY,
+        }
+
+    async def async_autotune(self, series: TransformedSeries) -> None:
+        """Sweep the planning parameters on tomorrow and the past days.
+
+        The sweep runs in a process pool from the executor. In apply mode
+        the best parameters are taken over and planned with once, the number
+        entities are set to the new hours and push them back unchanged.
+        """
+        try:
+            days = [series.tomorrow, *self._price_history]
+            base = self._plan_parameters()._replace(
+                bat_cost=self._battery_use, delta=planner.DELTA
+            )
+            if base.selfuse_hours is None or base.charge_hours is None:
+                return
+            workers = min(4, os.cpu_count() or 1)
+            result = await self._hass.async_add_executor_job(
+                self._tune_cache.sweep,
+                days,
+                base,
+                workers,
+                multiprocessing.get_context("spawn"),
+            )
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Autotune failed")
+            # Sweep these prices again on the next update
+            self._tuned_for = None
+            return
+        finally:
+            self._tuning = False
+        self._tune_result = result
+        _LOGGER.info(
+            "Autotune over %s days: selfuse_hours=%s charge_hours=%s "
+            "bat_cost=%s delta=%s, score %.2f against %.2f",
+            len(days),
+            result.params.selfuse_hours,
+            result.params.charge_hours,
+            result.params.bat_cost,
+            result.params.delta,
+            result.score,
+            result.baseline_score,
         )
-        if len(tomorrow_values) > 0:
-            self._schedule_tomorrow = self.get_schedule(
-                tomorrow_values, self._hours_self_use, self._battery_use, True
+        if self._autotune != AUTOTUNE_APPLY or result.improvement <= 0:
+            if self._inverter_mode_sonsor:
+                await self._inverter_mode_sonsor.async_update()
+            return
+        self._tuned_delta = result.params.delta
+        self._tuned_bat_cost = result.params.bat_cost
+        self._hours_self_use = result.params.selfuse_hours
+        self._charge_hours = result.params.charge_hours
+        # Already taken over, the pushed back values do not replan
+        for key, value in (
+            ("selfuse_hours", result.params.selfuse_hours),
+            ("charge_hours", result.params.charge_hours),
+        ):
+            if (entity_id := self._number_entity_id(key)) is None:
+                _LOGGER.warning("Number %s is not registered, not updated", key)
+                continue
+            await self._hass.services.async_call(
+                "number",
+                "set_value",
+                {"entity_id": entity_id, "value": value},
+                blocking=True,
             )
-        if self._inverter_mode_sonsor:
-            await self._inverter_mode_sonsor.async_update()
+        if self._series is not None:
+            await self._update_from_series(self._series)
 
     async def update_prices(
         self, today_prices: list[TimeValue], tomorrow_prices: list[TimeValue]
     ):
-        beginning_of_hour = datetime.now(
-            zoneinfo.ZoneInfo(key="Europe/Stockholm")
-        ).replace(minute=0, second=0, microsecond=0) - timedelta(seconds=10)
+        beginning_of_hour = datetime.now(get_zone()).replace(
+            minute=0, second=0, microsecond=0
+        ) - timedelta(seconds=10)
         self._today_prices = today_prices
         self._tomorrow_prices = tomorrow_prices
         self._today_lowest_price = min(today_prices, key=lambda tv: tv.value)
@@ -505,332 +1419,8 @@ class PriceCalculator:
             key=lambda tv: tv.value,
         )
 
-    MinMaxValue = namedtuple("MinMaxValue", ["start", "value", "sell_value", "t"])
-
-    def find_min_max(self, prices: list[TimeValue], DELTA):
-        mn, mx = math.inf, -math.inf
-        minpeaks = []
-        maxpeaks = []
-        lookformax = True
-        start = True
-        # Iterate over items in series
-        for time in prices:
-            value = time.value
-            time_pos = time.start
-            if value > mx:
-                mx = value
-                mx_sell = time.sell_value
-                mxpos = time_pos
-            if value < mn:
-                mn = value
-                mn_sell = time.sell_value
-                mnpos = time_pos
-            if lookformax:
-                if value < mx - DELTA:
-                    # a local maxima
-                    if prices[0].start != mxpos:
-                        maxpeaks.append(self.MinMaxValue(mxpos, mx, mx_sell, "max"))
-                    mn = value
-                    mn_sell = time.sell_value
-                    mnpos = time_pos
-                    lookformax = False
-                elif start:
-                    # a local minima at beginning
-                    # minpeaks.append((mnpos, mn))
-                    mx = value
-                    mx_sell = time.sell_value
-                    mxpos = time_pos
-                    start = False
-            else:
-                if value > mn + DELTA:
-                    # a local minima
-                    minpeaks.append(self.MinMaxValue(mnpos, mn, mn_sell, "min"))
-                    mx = value
-                    mx_sell = time.sell_value
-                    mxpos = time_pos
-                    lookformax = True
-        # check for extrema at end
-        # if value > mn+DELTA:
-        # maxpeaks.append((mxpos, mx))
-        # elif value < mx-DELTA:
-        # minpeaks.append((mnpos, mn))
-        if not any(minpeaks):
-            minval = self.get_value_min(prices)
-            minpeaks.append(
-                self.MinMaxValue(minval.start, minval.value, minval.sell_value, "min")
-            )
-        return minpeaks, maxpeaks
-
-    def filter_min_max(
-        self,
-        minpeaks: list,
-        maxpeaks: list,
-        batterycost: float,
-        prices: list[TimeValue],
-    ):
-        peaks = []
-        valid_peaks = []
-        peaks.extend(minpeaks)
-        peaks.extend(maxpeaks)
-        prev_peak = None
-        next_min = True
-        for peak in sorted(peaks, key=lambda t: t.start, reverse=False):
-            if peak.t == "min" and next_min:
-                next_min = False
-                prev_peak = peak
-            elif peak.t == "max" and not next_min:
-                if peak.sell_value > (prev_peak.value + batterycost):
-                    valid_peaks.append(prev_peak)
-                    valid_peaks.append(peak)
-                next_min = True
-                prev_peak = peak
-            elif peak.t == "max" and next_min:
-                # Vi har en topp utan en dal före kolla om det finns en dal före
-                # som är tillräckligt låg
-                pricesfiltered = filter(lambda x: x.start < peak.start, prices)
-                minval = self.get_value_min(pricesfiltered)
-                if peak.sell_value > (minval.value + batterycost):
-                    valid_peaks.append(
-                        self.MinMaxValue(
-                            minval.start, minval.value, minval.sell_value, "min"
-                        )
-                    )
-                    valid_peaks.append(peak)
-        # Om vi inte hittat en dal/topp så tar
-        # vi bara ut högsta priset och lägsta som topp/dal om det finns tillräcklig skillnad
-        if len(valid_peaks) == 0:
-            valid_peaks = []
-            maxval = self.get_value_max(prices)
-            maxpeak = self.MinMaxValue(
-                maxval.start, maxval.value, maxval.sell_value, "max"
-            )
-            pricesfiltered = filter(lambda x: x.start < maxval.start, prices)
-            minval = self.get_value_min(pricesfiltered)
-            if minval:
-                minpeak = self.MinMaxValue(
-                    minval.start, minval.value, minval.sell_value, "min"
-                )
-
-                if maxpeak.sell_value > (minpeak.value + batterycost):
-                    valid_peaks.append(minpeak)
-                    valid_peaks.append(maxpeak)
-        return valid_peaks
-
-    def get_sell_max(self, prices: list[TimeValue]):
-        return max(prices, key=lambda tv: tv.sell_value)
-
-    def get_value_min(self, prices: list[TimeValue]):
-        return min(prices, key=lambda tv: tv.value)
-
-    def get_value_max(self, prices: list[TimeValue]):
-        return max(prices, key=lambda tv: tv.value)
-
     def get_n_high_val(self, prices: list[TimeValue], nvalue: int):
-        sorted_prices = sorted(prices, key=lambda pr: pr.value, reverse=True)
-        return sorted_prices[nvalue - 1].value
-
-    class no_matching_min_max_slots_error(Exception):
-        def __init__(self, message):
-            super().__init__(message)
-
-    def chunk_list(self, lst, chunk_size):
-        return [lst[i : i + chunk_size] for i in range(0, len(lst), chunk_size)]
-
-    def create_schedule(
-        self,
-        prices: list[TimeValue],
-        validpeaks: list,
-        selfuse_hours: int,
-        is_tomorrow=False,
-    ):
-        _selfuse_hours = selfuse_hours
-        _charge_hours = self._charge_hours
-        if not _selfuse_hours:
-            _selfuse_hours = 1
-        # Loop throw prices per day and create a schedule
-        for chunk in self.chunk_list(prices, 24):
-            sell_max = self.get_sell_max(chunk).sell_value
-            if is_tomorrow:
-                self._sell_tomorrow_max = sell_max
-            else:
-                self._sell_today_max = sell_max
-            _LOGGER.info(f"Sell Max = {sell_max}")
-
-            selfuse_max = self.get_n_high_val(chunk, _selfuse_hours)
-            selfuse_peak = self.get_value_max(chunk).value
-            if is_tomorrow:
-                self._selfuse_tomorrow_max = selfuse_max
-            else:
-                self._selfuse_today_max = selfuse_max
-            _LOGGER.info(f"Selfuse Max = {selfuse_max} Selfuse Peak = {selfuse_peak}")
-
-            next_midnight = chunk[0].start.replace(
-                hour=0, minute=0, second=0, microsecond=0
-            ) + timedelta(days=1)
-            schedule = []
-            sel_prices = []
-            # Vi tillåter 2 cyklingar på batteriet
-            # Kolla så var min och max efter varandra i rätt följd
-            prev_peak = None
-            cycle_no = 1
-            next_min = True
-            peaks = sorted(
-                filter(lambda x: x.start < next_midnight, validpeaks),
-                key=lambda t: t.start,
-                reverse=False,
-            )
-            if len(peaks) > 2:
-                limit_search = peaks[2].start
-                _selfuse_hours = _selfuse_hours * 2
-                selfuse_max = self.get_n_high_val(chunk, _selfuse_hours)
-                if is_tomorrow:
-                    self._selfuse_tomorrow_max = selfuse_max
-                else:
-                    self._selfuse_today_max = selfuse_max
-                _LOGGER.info(
-                    f"More than 2 peaks found Limit search = {limit_search} Selfuse hours = {_selfuse_hours} Selfuse Max = {selfuse_max} Selfuse Peak = {selfuse_peak}"
-                )
-            else:
-                limit_search = next_midnight
-                _LOGGER.info(f"2 or less peaks found Limit search = {limit_search}")
-
-            for peak in peaks:
-                if peak.t == "min" and next_min:
-                    next_min = False
-                    prev_peak = peak
-                    sel_prices = []
-                elif peak.t == "max" and not next_min:
-                    next_min = True
-                    sel_prices = [
-                        tv
-                        for tv in chunk
-                        # TODO: Kika på om vi skall titta priser in på nästa dygn också för att hitta nästa dal
-                        if tv.start >= prev_peak.start
-                        and tv.start <= limit_search  # and tv.start <= peak.start
-                    ]
-                    cycle_no = cycle_no + 1
-                    prev_peak = peak
-
-                limit_search = next_midnight
-                if len(sel_prices) > 0:
-                    # Första priset = det längsta eftersom vi sorterat
-                    # används för Laddning
-                    selfuse_counter = 0
-                    charge = sel_prices[0]
-                    charge.mode = "Charge"
-                    sel_prices.remove(sel_prices[0])
-                    if not any(x.start == charge.start for x in schedule):
-                        schedule.append(charge)
-
-                    sorted_sel_prices = sorted(
-                        sel_prices, key=lambda tv: tv.value, reverse=True
-                    )
-
-                    if selfuse_max > sell_max:
-                        _LOGGER.info("Selfuse max is higher than sell max")
-                        for p in sorted_sel_prices:
-                            if p.value > sell_max and selfuse_counter < _selfuse_hours:
-                                p.mode = "Selfuse"
-                                selfuse_counter = selfuse_counter + 1
-                            else:
-                                p.mode = "Standby"
-                            if not any(x.start == p.start for x in schedule):
-                                schedule.append(p)
-                    else:
-                        _LOGGER.info("Sell max is higher than selfuse max")
-                        sell = sorted_sel_prices[0]
-                        sorted_sel_prices.remove(sorted_sel_prices[0])
-                        sell.mode = "Sell"
-                        if not any(x.start == sell.start for x in schedule):
-                            schedule.append(sell)
-                        for p in sorted_sel_prices:
-                            if p.value > sell_max and selfuse_counter < _selfuse_hours:
-                                p.mode = "Selfuse"
-                                selfuse_counter = selfuse_counter + 1
-                            else:
-                                p.mode = "Standby"
-                            # Check if value already exsists
-                            if not any(x.start == p.start for x in schedule):
-                                schedule.append(p)
-
-            schedule = self.fill_empty_schedule(prices, schedule)
-
-            # Add additional charging hours if charge hours are more than 1
-
-            if _charge_hours and _charge_hours > 1:
-                # Get charge hour from schedule
-                charges = [tv for tv in schedule if tv.mode == "Charge"]
-                use_hours = sorted(
-                    [
-                        tv
-                        for tv in schedule
-                        if tv.mode == "Selfuse" or tv.mode == "Sell"
-                    ],
-                    key=lambda tv: tv.start,
-                )
-                for i in sorted(charges, key=lambda c: c.start):
-                    # Get next selfuse or sell hour
-                    _LOGGER.info(f"Charge hour {i.start}")
-                    # Get prev hour for sell och selfuse if any
-                    sorted_usehours = sorted(use_hours, key=lambda s: s.start)
-                    prev_use_hour = next(
-                        (tv for tv in sorted_usehours if tv.start < i.start),
-                        None,
-                    )
-                    next_use_hour = next(
-                        (tv for tv in sorted_usehours if tv.start > i.start),
-                        None,
-                    )
-                    if prev_use_hour:
-                        _LOGGER.info(
-                            f"Prev hour {prev_use_hour.start} {prev_use_hour.mode}"
-                        )
-                        min_charges = sorted(
-                            [
-                                tv
-                                for tv in schedule
-                                if tv.start > prev_use_hour.start
-                                and tv.start < next_use_hour.start
-                                and tv.mode != "Charge"
-                            ],
-                            key=lambda tv: tv.value,
-                            reverse=False,
-                        )
-                    else:
-                        _LOGGER.info(
-                            f"Next hour {next_use_hour.start} {next_use_hour.mode}"
-                        )
-                        min_charges = sorted(
-                            [
-                                tv
-                                for tv in schedule
-                                if tv.start < next_use_hour.start
-                                and tv.mode != "Charge"
-                            ],
-                            key=lambda tv: tv.value,
-                            reverse=False,
-                        )
-                    # Log schedule
-                    counter = _charge_hours - 1
-                    _LOGGER.info(f"Charge counter {counter}")
-                    # change standby to charge for correct amount of hours
-                    for tv in min_charges:
-                        if counter >= 1:
-                            _LOGGER.info(f"Charge hour {tv.start}")
-                            tv.mode = "Charge"
-                            counter = counter - 1
-                            if counter == 0:
-                                break
-        # for tv in sorted(schedule, key=lambda s: s.start):
-        #    _LOGGER.info(f"Scedule: {tv.start} {tv.mode} {tv.value} {tv.sell_value}")
-        return schedule
-
-    def fill_empty_schedule(self, prices: list[TimeValue], schedule: list[TimeValue]):
-        for p in prices:
-            if not any(x.start == p.start for x in schedule):
-                p.mode = "Standby"
-                schedule.append(p)
-        return schedule
+        return planner.get_n_high_val(prices, nvalue)
 
     def get_schedule(
         self,
@@ -839,78 +1429,13 @@ class PriceCalculator:
         battery_cost: float,
         is_tomorrow=False,
     ):
-        # Hitta alla toppar och dalar
-        minpeaks, maxpeaks = self.find_min_max(prices, DELTA=0.1)
-        _LOGGER.info(f"Own Minima: {len(minpeaks)}, Maxima: {len(maxpeaks)}")
-        for max_point in maxpeaks:
-            _LOGGER.info(f"Max Time: {max_point.start}, Value: {max_point.value:.2f}")
-        for min_point in minpeaks:
-            _LOGGER.info(f"Min Time: {min_point.start}, Value: {min_point.value:.2f}")
-        # maxima, minima = self.find_timevalue_extrema(prices, prominence=0.2)
-        # _LOGGER.info(f"SciPy Maxima: {len(maxima)}, Minima: {len(minima)}")
-        # for max_point in maxima:
-        #     _LOGGER.info(f"Max Time: {max_point.start}, Value: {max_point.value:.2f}")
-        # for min_point in minima:
-        #     _LOGGER.info(f"Min Time: {min_point.start}, Value: {min_point.value:.2f}")
-        # Filtrera resultatet så vi bara har giltliga toppar/dalar dvs en topp
-        # föregås av en dal som ger "tillräcklig besparing" och verifiera att
-        # vi verkligen hittat en topp/dal
-        validpeaks = self.filter_min_max(minpeaks, maxpeaks, battery_cost, prices)
-        # Leta upp sälj max timmen dvs högsta timmen för att sälja.
-        # sellmax = self.get_sell_max(prices)
-        # self._sell_today_max = sellmax.sell_value
-        # _LOGGER.info(f"Sell Max = {sellmax}")
-        # Leta upp ett antal timmar (enligt parametern hours_for_self_use) där
-        # priset ligger som högst
-        # selfuse_max = self.get_n_high_val(prices, hours_for_self_use)
-        # self._selfuse_today_max = selfuse_max
-        # _LOGGER.info(f"Selfuse Max = {selfuse_max}")
-        # Börja med att kontrollera att vi har peak värden som matchar
-        # varandra (dal följs av topp)
-        #
-        schedule = self.create_schedule(
-            prices,
-            validpeaks,  # sellmax.sell_value, selfuse_max,
-            hours_for_self_use,
-            is_tomorrow,
-        )
-        # Fyll på med Standby på alla timmar som inte har något annat state
-        # schedule = self.fill_empty_schedule(prices, schedule)
-        return sorted(schedule, key=lambda s: s.start)
-
-    # def find_timevalue_extrema(
-    #     self, data: List[TimeValue], prominence: float = None, distance: int = None
-    # ) -> Tuple[List[TimeValue], List[TimeValue]]:
-    #     """
-    #     Find local maxima and minima in a list of TimeValue objects.
-
-    #     Parameters:
-    #     -----------
-    #     data : List[TimeValue]
-    #         List of TimeValue objects
-    #     prominence : float, optional
-    #         Required prominence of peaks
-    #     distance : int, optional
-    #         Minimum number of samples between peaks
-
-    #     Returns:
-    #     --------
-    #     Tuple[List[TimeValue], List[TimeValue]]:
-    #         (maxima_timevalues, minima_timevalues)
-    #     """
-    #     # Extract values for analysis
-    #     values = np.array([tv.value for tv in data])
-
-    #     # Find maxima
-    #     maxima_indices, _ = find_peaks(values, prominence=prominence, distance=distance)
-
-    #     # Find minima by inverting the signal
-    #     minima_indices, _ = find_peaks(
-    #         -values, prominence=prominence, distance=distance
-    #     )
-
-    #     # Get TimeValue objects for maxima and minima
-    #     maxima = [data[i] for i in maxima_indices]
-    #     minima = [data[i] for i in minima_indices]
-
-    #     return maxima, minima
+        result = planner.get_schedule(
+            prices, hours_for_self_use, battery_cost, self._charge_hours
+        )
+        if is_tomorrow:
+            self._selfuse_tomorrow_max = result.selfuse_max
+            self._sell_tomorrow_max = result.sell_max
+        else:
+            self._selfuse_today_max = result.selfuse_max
+            self._sell_today_max = result.sell_max
+        return result.schedule
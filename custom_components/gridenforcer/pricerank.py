@@ -0,0 +1,85 @@
+"""N-th cheapest and most expensive prices of a window of slots.
+
+The electricity_price_*_sorted macros in prices.jinja collect prices_all
+into a list and sort it on every render. RankedWindow sorts the prices of
+a window once, any n-th price is then an index into the sorted array.
+The window is rebuilt only when the prices or its bounds change, a new n
+costs nothing.
+"""
+
+from __future__ import annotations
+
+from typing import NamedTuple
+
+import numpy as np
+
+from .pricesummary import PriceSummary
+
+
+class RankSpec(NamedTuple):
+    """A threshold sensor, the n-th price of the next window_hours."""
+
+    key: str
+    # buy or sell prices of the summary
+    kind: str
+    cheapest: bool
+    window_hours: int
+    # Planning parameter holding n in hours
+    hours: str
+
+
+# Same windows as prices/buy.yaml and buybattery.yaml, the selfuse limit
+# ranks the buy prices the way the planner picks self use hours. Own
+# entity ids next to the templates: the window rolls with the slots and n
+# hours count every slot of a quarter hour price, the templates do neither
+RANK_SPECS = (
+    RankSpec("native_electricity_price_limit_charge", "buy", True, 14, "charge_hours"),
+    RankSpec("native_charge_limit_battery_sun", "sell", True, 16, "charge_hours"),
+    RankSpec(
+        "native_electricity_price_limit_selfuse", "buy", False, 14, "selfuse_hours"
+    ),
+)
+
+
+def window_bounds(
+    summary: PriceSummary, epoch: float, hours: int
+) -> tuple[float, float] | None:
+    """From the start of the slot containing epoch to hours later."""
+    index = int(np.searchsorted(summary.starts, epoch, side="right")) - 1
+    if index < 0 or epoch >= summary.ends[index]:
+        return None
+    start = float(summary.starts[index])
+    return start, start + hours * 3600
+
+
+class RankedWindow:
+    """Prices of the slots starting in [start, end), sorted once."""
+
+    __slots__ = ("summary", "start", "end", "step", "sorted")
+
+    def __init__(self, summary: PriceSummary, start: float, end: float) -> None:
+        """Initialize from the prices of summary."""
+        self.summary = summary
+        self.start = start
+        self.end = end
+        mask = (summary.starts >= start) & (summary.starts < end)
+        self.sorted = np.sort(summary.values[mask])
+        lengths = (summary.ends - summary.starts)[mask]
+        self.step = int(lengths[0]) if len(lengths) else 3600
+
+    def __len__(self) -> int:
+        return len(self.sorted)
+
+    def matches(self, summary: PriceSummary, start: float, end: float) -> bool:
+        return summary is self.summary and start == self.start and end == self.end
+
+    def nth(self, n: int, cheapest: bool = True) -> float | None:
+        """N-th cheapest or most expensive price, n limited to the window."""
+        if not len(self.sorted):
+            return None
+        n = min(max(n, 1), len(self.sorted))
+        return float(self.sorted[n - 1] if cheapest else self.sorted[-n])
+
+    def nth_hours(self, hours: int, cheapest: bool = True) -> float | None:
+        """Price at the end of the cheapest or most expensive hours."""
+        return self.nth(hours * 3600 // self.step, cheapest)
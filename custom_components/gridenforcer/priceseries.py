@@ -0,0 +1,137 @@
+"""Compact, array backed price series used by the planner."""
+
+from __future__ import annotations
+
+from datetime import datetime, tzinfo
+from typing import Any
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+UTC = ZoneInfo("UTC")
+
+
+class PriceSeries:
+    """Prices for consecutive slots.
+
+    Slot starts are UTC epoch seconds and values are spot prices, both numpy
+    arrays. Slicing returns views sharing the same buffers.
+    """
+
+    __slots__ = ("starts", "values", "step", "tz")
+
+    def __init__(
+        self,
+        starts: np.ndarray,
+        values: np.ndarray,
+        step: int,
+        tz: tzinfo | None = None,
+    ) -> None:
+        """Initialize from slot starts, values and slot length in seconds."""
+        if len(starts) != len(values):
+            raise ValueError("starts and values must have the same length")
+        self.starts = starts
+        self.values = values
+        self.step = int(step)
+        self.tz = tz or UTC
+
+    @classmethod
+    def from_uniform(
+        cls,
+        start: float,
+        step: int,
+        values: Any,
+        tz: tzinfo | None = None,
+    ) -> PriceSeries:
+        """Create a series of equally long slots from the first slot start."""
+        values = np.asarray(values, dtype=np.float64)
+        starts = np.int64(start) + np.arange(len(values), dtype=np.int64) * int(step)
+        return cls(starts, values, step, tz)
+
+    @classmethod
+    def from_timestamps(
+        cls,
+        starts: Any,
+        values: Any,
+        step: int | None = None,
+        tz: tzinfo | None = None,
+    ) -> PriceSeries:
+        """Create a series from explicit slot starts in epoch seconds.
+
+        Without step the smallest distance between slot starts is used.
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if step is None:
+            diffs = np.diff(starts)
+            diffs = diffs[diffs > 0]
+            step = int(diffs.min()) if len(diffs) else 3600
+        return cls(starts, values, step, tz)
+
+    @classmethod
+    def empty(cls, step: int = 3600, tz: tzinfo | None = None) -> PriceSeries:
+        """Create a series without slots."""
+        return cls(np.empty(0, np.int64), np.empty(0, np.float64), step, tz)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __repr__(self) -> str:
+        return (
+            f"PriceSeries(start={self.start_datetime(0) if len(self) else None}, "
+            f"slots={len(self)}, step={self.step})"
+        )
+
+    @property
+    def end(self) -> int:
+        """End of the last slot in epoch seconds."""
+        return int(self.starts[-1]) + self.step if len(self) else 0
+
+    def is_uniform(self) -> bool:
+        """Return True if all slots follow each other with the same length."""
+        if len(self) < 2:
+            return True
+        return bool(np.all(np.diff(self.starts) == self.step))
+
+    def start_datetime(self, index: int) -> datetime:
+        """Start of a slot as an aware datetime in the series time zone."""
+        return datetime.fromtimestamp(int(self.starts[index]), self.tz)
+
+    def end_datetime(self, index: int) -> datetime:
+        """End of a slot as an aware datetime in the series time zone."""
+        return datetime.fromtimestamp(int(self.starts[index]) + self.step, self.tz)
+
+    def slice(self, start: int, stop: int) -> PriceSeries:
+        """Return the slots [start, stop) as a view."""
+        return PriceSeries(
+            self.starts[start:stop], self.values[start:stop], self.step, self.tz
+        )
+
+    def concat(self, other: PriceSeries) -> PriceSeries:
+        """Return a new series with the slots of other appended."""
+        if not len(other):
+            return self
+        if not len(self):
+            return other
+        return PriceSeries(
+            np.concatenate((self.starts, other.starts)),
+            np.concatenate((self.values, other.values)),
+            min(self.step, other.step),
+            self.tz,
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        """Serialize to JSON friendly data."""
+        return {
+            "starts": self.starts.tolist(),
+            "values": self.values.tolist(),
+            "step": self.step,
+            "tz": getattr(self.tz, "key", "UTC"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> PriceSeries:
+        """Deserialize data created by to_dict."""
+        return cls.from_timestamps(
+            data["starts"], data["values"], data["step"], ZoneInfo(data["tz"])
+        )
@@ -0,0 +1,255 @@
+"""Price source adapters.
+
+Each adapter turns the attributes of a price sensor (or a local file) into
+today's and tomorrow's PriceSeries. Adapters read flat value arrays where
+the source provides them and only look at the first and last timestamp to
+place the slots, instead of parsing one dict per slot.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Mapping
+from datetime import datetime, timedelta, tzinfo
+from typing import Any, NamedTuple
+
+from .const import (
+    SOURCE_AUTO,
+    SOURCE_ENTSOE,
+    SOURCE_FLAT,
+    SOURCE_JSON_FILE,
+    SOURCE_NORDPOOL,
+)
+from .daycalendar import day_calendar
+from .priceseries import UTC, PriceSeries
+
+
+class DaySeries(NamedTuple):
+    """Normalized prices for today and tomorrow."""
+
+    today: PriceSeries
+    tomorrow: PriceSeries
+
+
+def to_epoch(value: datetime | str) -> int:
+    """Timestamp (datetime or ISO 8601 string) to epoch seconds."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return int(value.timestamp())
+
+
+def _tz_of(value: Any, default: tzinfo) -> tzinfo:
+    """Time zone of a timestamp, the default zone if it has the same offset.
+
+    ISO strings only carry a fixed offset, which can not split days at DST
+    transitions, so the configured zone is preferred when it agrees.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime) or value.tzinfo is None:
+        return default
+    if value.utcoffset() == value.astimezone(default).utcoffset():
+        return default
+    return value.tzinfo
+
+
+def local_day_bounds(now: datetime, tz: tzinfo, days: int = 0) -> tuple[int, int]:
+    """Epoch seconds of local midnight starting and ending a day.
+
+    days selects the day relative to now, the length is 23 or 25 hours on
+    DST transition days.
+    """
+    calendar = day_calendar(tz, now.astimezone(tz).date() + timedelta(days=days))
+    return calendar.start, calendar.end
+
+
+def series_from_entries(
+    entries: list | None,
+    tz: tzinfo = UTC,
+    start_key: str = "start",
+    end_key: str | None = "end",
+    value_key: str = "value",
+) -> PriceSeries:
+    """Create a series from a list of dicts with one timestamp per slot."""
+    if not entries:
+        return PriceSeries.empty(tz=tz)
+    tz = _tz_of(entries[0][start_key], tz)
+    starts = [to_epoch(entry[start_key]) for entry in entries]
+    values = [entry[value_key] for entry in entries]
+    step = None
+    if end_key is not None:
+        step = to_epoch(entries[0][end_key]) - starts[0]
+    return PriceSeries.from_timestamps(starts, values, step, tz)
+
+
+def series_from_flat(
+    values: list | None, start: int, end: int, tz: tzinfo
+) -> PriceSeries:
+    """Create a series spreading flat values evenly over [start, end)."""
+    if not values:
+        return PriceSeries.empty(tz=tz)
+    return PriceSeries.from_uniform(start, (end - start) // len(values), values, tz)
+
+
+class PriceSource:
+    """Base class for price source adapters."""
+
+    name = ""
+    # normalize does blocking I/O and must run in the executor
+    blocking = False
+
+    def __init__(self, tz: tzinfo = UTC) -> None:
+        """Initialize the adapter, tz is used where the source has no offset."""
+        self._tz = tz
+
+    @staticmethod
+    def matches(attributes: Mapping[str, Any]) -> bool:
+        """Return True if the attributes look like this source."""
+        return False
+
+    def normalize(self, attributes: Mapping[str, Any], now: datetime) -> DaySeries:
+        """Return today's and tomorrow's prices."""
+        raise NotImplementedError
+
+
+class NordpoolSource(PriceSource):
+    """Nordpool custom integration, today/tomorrow plus raw_today/raw_tomorrow."""
+
+    name = SOURCE_NORDPOOL
+
+    @staticmethod
+    def matches(attributes: Mapping[str, Any]) -> bool:
+        return "raw_today" in attributes
+
+    def normalize(self, attributes: Mapping[str, Any], now: datetime) -> DaySeries:
+        tomorrow = attributes.get("tomorrow")
+        if attributes.get("tomorrow_valid") is False:
+            tomorrow = None
+        return DaySeries(
+            self._day(attributes.get("today"), attributes.get("raw_today")),
+            self._day(tomorrow, attributes.get("raw_tomorrow")),
+        )
+
+    def _day(self, flat: list | None, raw: list | None) -> PriceSeries:
+        if not raw:
+            return PriceSeries.empty(tz=self._tz)
+        if flat and len(flat) == len(raw):
+            # The flat list has the values, raw only gives the time range
+            start = to_epoch(raw[0]["start"])
+            end = to_epoch(raw[-1]["end"])
+            step = to_epoch(raw[0]["end"]) - start
+            if step * len(flat) == end - start:
+                return PriceSeries.from_uniform(
+                    start, step, flat, _tz_of(raw[0]["start"], self._tz)
+                )
+        # Gaps or no flat list, place every slot by its own timestamp
+        return series_from_entries(raw, self._tz)
+
+
+class EntsoeSource(PriceSource):
+    """ENTSO-e custom integration, prices_today/prices_tomorrow."""
+
+    name = SOURCE_ENTSOE
+
+    @staticmethod
+    def matches(attributes: Mapping[str, Any]) -> bool:
+        return "prices_today" in attributes
+
+    def normalize(self, attributes: Mapping[str, Any], now: datetime) -> DaySeries:
+        return DaySeries(
+            self._day(attributes.get("prices_today")),
+            self._day(attributes.get("prices_tomorrow")),
+        )
+
+    def _day(self, entries: list | None) -> PriceSeries:
+        return series_from_entries(entries, self._tz, "time", None, "price")
+
+
+class FlatArraySource(PriceSource):
+    """Flat today/tomorrow value arrays starting at local midnight.
+
+    A start attribute (timestamp of the first slot of today) is used if the
+    sensor provides one.
+    """
+
+    name = SOURCE_FLAT
+
+    @staticmethod
+    def matches(attributes: Mapping[str, Any]) -> bool:
+        return isinstance(attributes.get("today"), list)
+
+    def normalize(self, attributes: Mapping[str, Any], now: datetime) -> DaySeries:
+        today_start, today_end = local_day_bounds(now, self._tz)
+        if start := attributes.get("start"):
+            today_start = to_epoch(start)
+        tomorrow_start, tomorrow_end = local_day_bounds(now, self._tz, 1)
+        return DaySeries(
+            series_from_flat(attributes.get("today"), today_start, today_end, self._tz),
+            series_from_flat(
+                attributes.get("tomorrow"), tomorrow_start, tomorrow_end, self._tz
+            ),
+        )
+
+
+class JsonFileSource(PriceSource):
+    """Local JSON file, for testing and manual price input.
+
+    The file holds the attributes of one of the other sources, e.g.
+    {"today": [...], "tomorrow": [...]} or {"raw_today": [...], ...}.
+    """
+
+    name = SOURCE_JSON_FILE
+    blocking = True
+
+    def __init__(self, path: str, tz: tzinfo = UTC) -> None:
+        """Initialize with the path of the JSON file."""
+        super().__init__(tz)
+        self._path = path
+
+    def normalize(self, attributes: Mapping[str, Any], now: datetime) -> DaySeries:
+        with open(self._path, encoding="utf-8") as file:
+            data = json.load(file)
+        return AutoSource(self._tz).normalize(data, now)
+
+
+_DETECT_ORDER: tuple[type[PriceSource], ...] = (
+    NordpoolSource,
+    EntsoeSource,
+    FlatArraySource,
+)
+
+
+class AutoSource(PriceSource):
+    """Pick the adapter from the shape of the attributes."""
+
+    name = SOURCE_AUTO
+
+    def __init__(self, tz: tzinfo = UTC) -> None:
+        """Initialize with one instance per known adapter."""
+        super().__init__(tz)
+        self._sources = [source(tz) for source in _DETECT_ORDER]
+
+    def normalize(self, attributes: Mapping[str, Any], now: datetime) -> DaySeries:
+        for source in self._sources:
+            if source.matches(attributes):
+                return source.normalize(attributes, now)
+        return DaySeries(PriceSeries.empty(tz=self._tz), PriceSeries.empty(tz=self._tz))
+
+
+def create_price_source(
+    name: str, tz: tzinfo = UTC, price_file: str | None = None
+) -> PriceSource:
+    """Create the adapter configured by name."""
+    if name == SOURCE_JSON_FILE:
+        if not price_file:
+            raise ValueError("The json_file price source needs a file path")
+        return JsonFileSource(price_file, tz)
+    sources: dict[str, type[PriceSource]] = {
+        SOURCE_AUTO: AutoSource,
+        SOURCE_NORDPOOL: NordpoolSource,
+        SOURCE_ENTSOE: EntsoeSource,
+        SOURCE_FLAT: FlatArraySource,
+    }
+    if name not in sources:
+        raise ValueError(f"Unknown price source {name}")
+    return sources[name](tz)
@@ -0,0 +1,76 @@
+"""Buy and sell price sensor attributes computed once per price update.
+
+The nordpool package rebuilds these attributes in templates, indexing the
+spot price sensor and applying VAT and fees per value on every render.
+PriceSummary takes the buy or sell prices the planner already derived
+from the spot prices and builds the attributes once, the state is looked
+up by slot start as time moves on.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+import numpy as np
+
+from .priceseries import PriceSeries
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _times(series: PriceSeries) -> list[str]:
+    return [
+        datetime.fromtimestamp(start, series.tz).strftime(TIME_FORMAT)
+        for start in series.starts.tolist()
+    ]
+
+
+class PriceSummary:
+    """Prices of today and tomorrow as a price sensor shows them."""
+
+    __slots__ = ("starts", "ends", "values", "attributes")
+
+    def __init__(
+        self,
+        today: PriceSeries,
+        today_prices: np.ndarray,
+        tomorrow: PriceSeries,
+        tomorrow_prices: np.ndarray,
+    ) -> None:
+        """Initialize from the slots and prices of both days."""
+        self.starts = np.concatenate((today.starts, tomorrow.starts))
+        self.ends = self.starts + np.concatenate(
+            (np.full(len(today), today.step), np.full(len(tomorrow), tomorrow.step))
+        )
+        self.values = np.round(
+            np.concatenate((today_prices, tomorrow_prices)).astype(np.float64), 3
+        )
+        prices_today = self.values[: len(today)]
+        self.attributes: dict[str, Any] = {
+            "max": round(float(prices_today.max()), 3) if len(today) else None,
+            "average": round(float(prices_today.mean()), 3) if len(today) else None,
+            "min": round(float(prices_today.min()), 3) if len(today) else None,
+            "times_today": _times(today),
+            "prices_today": prices_today.tolist(),
+            "times_tomorrow": _times(tomorrow),
+            "prices_tomorrow": self.values[len(today) :].tolist(),
+            "tomorrow_valid": len(tomorrow) > 0,
+            "prices_all": self.values.tolist(),
+        }
+
+    def _index(self, epoch: float) -> int | None:
+        index = int(np.searchsorted(self.starts, epoch, side="right")) - 1
+        if index < 0 or epoch >= self.ends[index]:
+            return None
+        return index
+
+    def value_at(self, epoch: float) -> float | None:
+        """Price of the slot containing epoch."""
+        index = self._index(epoch)
+        return None if index is None else float(self.values[index])
+
+    def next_change(self, epoch: float) -> float | None:
+        """Start of the first slot after epoch."""
+        index = int(np.searchsorted(self.starts, epoch, side="right"))
+        return float(self.starts[index]) if index < len(self.starts) else None
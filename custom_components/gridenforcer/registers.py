@@ -0,0 +1,277 @@
+"""Solax Modbus register map, block planning and decoding.
+
+The YAML modbus integration reads every register with a request of its
+own. plan_blocks groups the registers of one table into as few reads as
+possible: registers closer than MAX_GAP are read together, unused
+registers in between included, up to MAX_REGISTERS per read.
+
+Every Block compiles one struct for all of its registers, gaps as pad
+bytes, so a block decodes with a single unpack_from over the buffer the
+registers were read into.
+"""
+
+from __future__ import annotations
+
+import struct
+from typing import Any, NamedTuple
+
+HOLDING = "holding"
+INPUT = "input"
+
+UINT16 = "uint16"
+INT16 = "int16"
+# 32 bit values are stored low word first
+UINT32 = "uint32"
+INT32 = "int32"
+STRING = "string"
+
+# Unused registers worth reading to save a request
+MAX_GAP = 8
+# Registers per read, the protocol allows 125
+MAX_REGISTERS = 100
+
+# The decisions a register feeds, they bound how often it is polled
+CONSUMER_FCRD = "fcrd"
+CONSUMER_CONTROL = "control"
+CONSUMER_DASHBOARD = "dashboard"
+CONSUMER_STATIC = "static"
+
+_FORMATS = {UINT16: "H", INT16: "h", UINT32: "HH", INT32: "Hh"}
+_WORDS = {UINT16: 1, INT16: 1, UINT32: 2, INT32: 2}
+
+
+class Register(NamedTuple):
+    """One value of the inverter."""
+
+    key: str
+    table: str
+    address: int
+    data_type: str = UINT16
+    scale: float = 1.0
+    precision: int | None = None
+    # Seconds between reads
+    scan_interval: int = 60
+    unit: str | None = None
+    device_class: str | None = None
+    state_class: str | None = None
+    # Registers of a string
+    count: int = 1
+    consumer: str = CONSUMER_DASHBOARD
+
+    @property
+    def words(self) -> int:
+        """Registers the value occupies."""
+        return self.count if self.data_type == STRING else _WORDS[self.data_type]
+
+    def decode(self, raw: tuple, index: int) -> Any:
+        """Value from the unpacked block starting at index."""
+        if self.data_type == STRING:
+            return raw[index].decode("ascii", "ignore").strip("\x00 ")
+        value = raw[index]
+        if self.data_type in (UINT32, INT32):
+            value |= raw[index + 1] << 16
+        if self.scale != 1.0:
+            value *= self.scale
+        if self.precision is not None:
+            value = round(value, self.precision)
+        return value
+
+
+def _r(key, table, address, data_type=UINT16, scale=1.0, precision=None, **kwargs):
+    return Register(key, table, address, data_type, scale, precision, **kwargs)
+
+
+_V = {"unit": "V", "device_class": "voltage", "scan_interval": 1}
+_A = {"unit": "A", "device_class": "current", "scan_interval": 1}
+_W = {"unit": "W", "device_class": "power", "scan_interval": 1}
+_HZ = {"unit": "Hz", "device_class": "frequency", "scan_interval": 1}
+_KWH_TOTAL = {
+    "unit": "kWh",
+    "device_class": "energy",
+    "state_class": "total_increasing",
+}
+_KWH_TODAY = {"unit": "kWh", "device_class": "energy"}
+
+# Same registers as config/packages/gridenforcer/solax/solax1, the
+# "Multiple Registers" structures split into their values
+_SOLAX_REGISTERS = (
+    _r("inverter_sn", HOLDING, 0, STRING, count=7, scan_interval=120),
+    _r("firmware_dsp", HOLDING, 125, scan_interval=120),
+    _r("firmware_modbus_rtu", HOLDING, 130, scan_interval=120),
+    _r("firmware_arm", HOLDING, 131, scan_interval=120),
+    _r("firmware_arm_bootloader", HOLDING, 132, scan_interval=120),
+    _r("inverter_mode_value", HOLDING, 139, scan_interval=1),
+    _r("inverter_manual_mode_value", HOLDING, 140, scan_interval=1),
+    _r("max_charge_current", HOLDING, 144, scale=0.1, precision=1, **_A),
+    _r("max_discharge_current", HOLDING, 145, scale=0.1, precision=1, **_A),
+    _r("registration_code", HOLDING, 170, STRING, count=5, scan_interval=120),
+    _r("export_limit", HOLDING, 182, scale=10, unit="W", scan_interval=5),
+    _r("inverter_rate_power", HOLDING, 186, unit="W"),
+    _r("main_breaker_current_limit", HOLDING, 215, unit="A"),
+    _r("pv1_voltage", INPUT, 3, scale=0.1, precision=1, **_V),
+    _r("pv2_voltage", INPUT, 4, scale=0.1, precision=1, **_V),
+    _r("pv1_current", INPUT, 5, scale=0.1, precision=1, **_A),
+    _r("pv2_current", INPUT, 6, scale=0.1, precision=1, **_A),
+    _r("inverter_radiator_temperature", INPUT, 8, INT16, unit="°C", scan_interval=1),
+    _r("inverter_state_value", INPUT, 9, scan_interval=1),
+    _r("pv1_power", INPUT, 10, **_W),
+    _r("pv2_power", INPUT, 11, **_W),
+    _r("battery_voltage", INPUT, 20, INT16, 0.1, 1, **_V),
+    _r("battery_current", INPUT, 21, INT16, 0.1, 1, **_A),
+    _r("battery_power", INPUT, 22, INT16, **_W),
+    _r("battery_internal_temperature", INPUT, 24, INT16, unit="°C"),
+    _r("battery_soc", INPUT, 28, unit="%", scan_interval=10),
+    _r("battery_output_energy_total", INPUT, 29, UINT32, 0.1, 1, **_KWH_TOTAL),
+    _r("battery_output_energy_today", INPUT, 32, UINT16, 0.1, 1, **_KWH_TODAY),
+    _r("battery_input_energy_total", INPUT, 33, UINT32, 0.1, 1, **_KWH_TOTAL),
+    _r("battery_input_energy_today", INPUT, 35, UINT16, 0.1, 1, **_KWH_TODAY),
+    _r("bms_charge_max_current", INPUT, 36, scale=0.1, precision=1, **_A),
+    _r("bms_discharge_max_current", INPUT, 37, scale=0.1, precision=1, **_A),
+    _r("battery_install_capacity", INPUT, 38, UINT32, 0.001, 2, unit="kWh"),
+    _r("feed_in_total", INPUT, 72, UINT32, 0.01, 1, **_KWH_TOTAL),
+    _r("consumption_total", INPUT, 74, UINT32, 0.01, 1, **_KWH_TOTAL),
+    _r("unlocked", INPUT, 84, scan_interval=10),
+    _r("l1_voltage", INPUT, 106, scale=0.1, precision=1, **_V),
+    _r("l1_current", INPUT, 107, INT16, 0.1, 1, **_A),
+    _r("l1_power", INPUT, 108, INT16, **_W),
+    _r("l1_frequency", INPUT, 109, scale=0.01, precision=2, **_HZ),
+    _r("l2_voltage", INPUT, 110, scale=0.1, precision=1, **_V),
+    _r("l2_current", INPUT, 111, INT16, 0.1, 1, **_A),
+    _r("l2_power", INPUT, 112, INT16, **_W),
+    _r("l2_frequency", INPUT, 113, scale=0.01, precision=2, **_HZ),
+    _r("l3_voltage", INPUT, 114, scale=0.1, precision=1, **_V),
+    _r("l3_current", INPUT, 115, INT16, 0.1, 1, **_A),
+    _r("l3_power", INPUT, 116, INT16, **_W),
+    _r("l3_frequency", INPUT, 117, scale=0.01, precision=2, **_HZ),
+    _r("l1_eps_voltage", INPUT, 118, scale=0.1, precision=1, **_V),
+    _r("l1_eps_current", INPUT, 119, scale=0.1, precision=1, **_A),
+    _r("l1_eps_power", INPUT, 120, INT16, **_W),
+    _r("l2_eps_voltage", INPUT, 122, scale=0.1, precision=1, **_V),
+    _r("l2_eps_current", INPUT, 123, scale=0.1, precision=1, **_A),
+    _r("l2_eps_power", INPUT, 124, INT16, **_W),
+    _r("l3_eps_voltage", INPUT, 126, scale=0.1, precision=1, **_V),
+    _r("l3_eps_current", INPUT, 127, scale=0.1, precision=1, **_A),
+    _r("l3_eps_power", INPUT, 128, INT16, **_W),
+    _r("l1_feed_in_power", INPUT, 130, INT16, **_W),
+    _r("l2_feed_in_power", INPUT, 132, INT16, **_W),
+    _r("l3_feed_in_power", INPUT, 134, INT16, **_W),
+    _r("solar_energy_total", INPUT, 148, UINT32, 0.1, 1, **_KWH_TOTAL),
+    _r("solar_energy_today", INPUT, 150, UINT16, 0.1, 1, **_KWH_TODAY),
+    _r("feed_in_today", INPUT, 152, UINT32, 0.01, 1, **_KWH_TODAY),
+    _r("consumption_today", INPUT, 154, UINT32, 0.01, 1, **_KWH_TODAY),
+    _r("battery_temp_high", INPUT, 186, INT16, 0.1, 1, unit="°C"),
+    _r("battery_temp_low", INPUT, 187, INT16, 0.1, 1, unit="°C"),
+)
+
+# Registers not listed only feed the dashboards
+_CONSUMERS = {
+    CONSUMER_FCRD: (
+        "battery_voltage",
+        "battery_current",
+        "battery_power",
+        "l1_frequency",
+        "l2_frequency",
+        "l3_frequency",
+        "l1_feed_in_power",
+        "l2_feed_in_power",
+        "l3_feed_in_power",
+    ),
+    CONSUMER_CONTROL: (
+        "battery_soc",
+        "inverter_mode_value",
+        "inverter_manual_mode_value",
+        "max_charge_current",
+        "max_discharge_current",
+        "bms_charge_max_current",
+        "bms_discharge_max_current",
+        "export_limit",
+        "unlocked",
+    ),
+    CONSUMER_STATIC: (
+        "inverter_sn",
+        "firmware_dsp",
+        "firmware_modbus_rtu",
+        "firmware_arm",
+        "firmware_arm_bootloader",
+        "registration_code",
+        "inverter_rate_power",
+        "main_breaker_current_limit",
+        "battery_install_capacity",
+    ),
+}
+_CONSUMER = {key: consumer for consumer, keys in _CONSUMERS.items() for key in keys}
+
+SOLAX_REGISTERS = tuple(
+    register._replace(consumer=_CONSUMER.get(register.key, CONSUMER_DASHBOARD))
+    for register in _SOLAX_REGISTERS
+)
+
+
+class Block:
+    """Contiguous registers of one table read with a single request."""
+
+    __slots__ = ("table", "address", "count", "registers", "scan_interval", "_struct")
+
+    def __init__(self, table: str, registers: list[Register]) -> None:
+        """Initialize from registers sorted by address."""
+        self.table = table
+        self.registers = tuple(registers)
+        self.address = registers[0].address
+        end = max(register.address + register.words for register in registers)
+        self.count = end - self.address
+        self.scan_interval = min(register.scan_interval for register in registers)
+        fmt = ">"
+        position = self.address
+        for register in registers:
+            if register.address > position:
+                fmt += f"{2 * (register.address - position)}x"
+            if register.data_type == STRING:
+                fmt += f"{2 * register.count}s"
+            else:
+                fmt += _FORMATS[register.data_type]
+            position = register.address + register.words
+        self._struct = struct.Struct(fmt)
+
+    def __repr__(self) -> str:
+        return f"Block({self.table}, {self.address}, {self.count})"
+
+    def decode(self, buffer: bytes | bytearray | memoryview) -> dict[str, Any]:
+        """Values of the block from the big endian registers in buffer."""
+        raw = self._struct.unpack_from(buffer)
+        values = {}
+        index = 0
+        for register in self.registers:
+            values[register.key] = register.decode(raw, index)
+            index += len(_FORMATS.get(register.data_type, "s"))
+        return values
+
+
+def plan_blocks(
+    registers: tuple[Register, ...] | list[Register],
+    max_gap: int = MAX_GAP,
+    max_registers: int = MAX_REGISTERS,
+) -> list[Block]:
+    """Group registers into as few blocks as possible.
+
+    A block is read as often as its fastest register.
+    """
+    blocks = []
+    for table in (HOLDING, INPUT):
+        current: list[Register] = []
+        end = 0
+        for register in sorted(
+            (register for register in registers if register.table == table),
+            key=lambda register: register.address,
+        ):
+            last = register.address + register.words
+            if current and (
+                register.address - end > max_gap
+                or last - current[0].address > max_registers
+            ):
+                blocks.append(Block(table, current))
+                current = []
+            current.append(register)
+            end = max(end, last) if len(current) > 1 else last
+        if current:
+            blocks.append(Block(table, current))
+    return blocks
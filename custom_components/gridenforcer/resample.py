@@ -0,0 +1,167 @@
+"""Validation and resampling of price series before planning.
+
+Price feeds may deliver missing or duplicated slots and mix hourly and
+15 minute data. prepare_series removes duplicates, fills gaps and brings a
+series to one resolution so the planner always gets a contiguous array.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import NamedTuple
+
+import numpy as np
+
+from .const import FILL_FORWARD, FILL_INTERPOLATE
+from .priceseries import PriceSeries
+
+_LOGGER = logging.getLogger(__name__)
+
+HOURLY = 3600
+QUARTER_HOURLY = 900
+# Longest slot a feed delivers, a larger distance between starts is a gap
+MAX_SLOT = HOURLY
+
+
+class SeriesIssues(NamedTuple):
+    """Problems found in a price series."""
+
+    duplicates: int
+    # Missing time in units of the finest slot length
+    missing_slots: int
+    mixed_resolution: bool
+    unsorted: bool
+
+    @property
+    def ok(self) -> bool:
+        return not (
+            self.duplicates
+            or self.missing_slots
+            or self.mixed_resolution
+            or self.unsorted
+        )
+
+
+def native_step(series: PriceSeries) -> int:
+    """Shortest distance between slot starts, the finest resolution."""
+    diffs = np.diff(series.starts)
+    diffs = diffs[diffs > 0]
+    return int(diffs.min()) if len(diffs) else series.step
+
+
+def _slot_lengths(starts: np.ndarray, step: int) -> np.ndarray:
+    """Length of each slot in a series with finest resolution step.
+
+    A slot followed by the next after exactly an hour is an hourly slot,
+    any other distance is a step long slot followed by a gap.
+    """
+    if len(starts) < 2:
+        return np.full(len(starts), step, np.int64)
+    lengths = np.where(np.diff(starts) == MAX_SLOT, MAX_SLOT, step)
+    # The last slot is as long as the one before it
+    return np.append(lengths, lengths[-1])
+
+
+def inspect_series(series: PriceSeries) -> SeriesIssues:
+    """Detect duplicates, gaps and mixed resolution."""
+    starts = series.starts
+    if len(starts) < 2:
+        return SeriesIssues(0, 0, False, False)
+    diffs = np.diff(starts)
+    unsorted = bool(np.any(diffs < 0))
+    if unsorted:
+        diffs = np.diff(np.sort(starts))
+    duplicates = int(np.count_nonzero(diffs == 0))
+    diffs = diffs[diffs > 0]
+    if not len(diffs):
+        return SeriesIssues(duplicates, 0, False, unsorted)
+    step = int(diffs.min())
+    slot_diffs = np.unique(diffs[diffs <= MAX_SLOT])
+    mixed = len(slot_diffs) > 1 and HOURLY in slot_diffs
+    if mixed:
+        # Hourly slots are not gaps, only distances longer than an hour are
+        missing = int(np.sum(diffs[diffs > MAX_SLOT] - MAX_SLOT) // step)
+    else:
+        missing = int(np.sum(diffs - step) // step)
+    return SeriesIssues(duplicates, missing, mixed, unsorted)
+
+
+def deduplicate(series: PriceSeries) -> PriceSeries:
+    """Sort by start and keep the last delivered value of duplicated slots."""
+    if len(series) < 2 or np.all(np.diff(series.starts) > 0):
+        return series
+    # unique returns the first index, reverse to keep the last delivered value
+    starts, index = np.unique(series.starts[::-1], return_index=True)
+    values = series.values[::-1][index]
+    return PriceSeries(starts, values, series.step, series.tz)
+
+
+def align(
+    series: PriceSeries, step: int | None = None, fill: str = FILL_FORWARD
+) -> PriceSeries:
+    """Place a sorted series without duplicates on a uniform grid.
+
+    Slots longer than step are repeated, gaps are interpolated with
+    FILL_INTERPOLATE and forward filled otherwise. The grid starts at the
+    first slot and ends with the last.
+    """
+    if not len(series):
+        return series
+    finest = native_step(series)
+    step = step or finest
+    starts = series.starts
+    lengths = _slot_lengths(starts, finest)
+    end = int(starts[-1] + lengths[-1])
+    grid = np.arange(int(starts[0]), end, step, dtype=np.int64)
+    index = np.searchsorted(starts, grid, side="right") - 1
+    covered = grid < starts[index] + lengths[index]
+    values = series.values[index]
+    if covered.all():
+        return PriceSeries(grid, values, step, series.tz)
+    if fill == FILL_INTERPOLATE:
+        values = values.copy()
+        values[~covered] = np.interp(grid[~covered], grid[covered], values[covered])
+    # Forward fill is the value of the last slot starting before the gap
+    return PriceSeries(grid, values, step, series.tz)
+
+
+def resample(series: PriceSeries, step: int) -> PriceSeries:
+    """Change the resolution of a uniform series.
+
+    Downsampling averages the slots inside each new slot, upsampling
+    repeats each value.
+    """
+    if not len(series) or step == series.step:
+        return series
+    if step < series.step:
+        if series.step % step:
+            raise ValueError(f"Can not upsample {series.step}s slots to {step}s")
+        factor = series.step // step
+        starts = np.repeat(series.starts, factor) + np.tile(
+            np.arange(factor, dtype=np.int64) * step, len(series)
+        )
+        return PriceSeries(starts, np.repeat(series.values, factor), step, series.tz)
+    if step % series.step:
+        raise ValueError(f"Can not downsample {series.step}s slots to {step}s")
+    origin = int(series.starts[0]) - int(series.starts[0]) % step
+    bins = (series.starts - origin) // step
+    bins, inverse = np.unique(bins, return_inverse=True)
+    sums = np.bincount(inverse, weights=series.values)
+    counts = np.bincount(inverse)
+    return PriceSeries(origin + bins * step, sums / counts, step, series.tz)
+
+
+def prepare_series(
+    series: PriceSeries, step: int = HOURLY, fill: str = FILL_FORWARD
+) -> PriceSeries:
+    """Validate a series and return it contiguous at the given resolution."""
+    if not len(series):
+        return series
+    issues = inspect_series(series)
+    if issues.ok and series.step == step and native_step(series) == step:
+        return series
+    if not issues.ok:
+        _LOGGER.warning("Price series repaired with %s: %s", fill, issues)
+    series = deduplicate(series)
+    finest = min(native_step(series), step)
+    return resample(align(series, finest, fill), step)
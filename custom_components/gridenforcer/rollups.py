@@ -0,0 +1,183 @@
+"""Daily and monthly analytics rollups served to the dashboards.
+
+The dashboards used to chart from history queries over high rate sensors.
+Rollups keep the totals per local day and month instead, updated as SoC
+and FCR-D changes arrive, so a dashboard reads a few hundred numbers from
+memory whatever the length of the history. The totals are stored across
+restarts, including FCR-D and the part of today before the restart. Days
+missing from the store are rebuilt from the archive.
+
+Energy comes from SoC changes. A discharge in Sell earns the sell price,
+in Selfuse it saves the buy price, and a charge in Charge mode costs the
+buy price. Charging in other modes is solar and costs nothing.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, tzinfo
+from typing import Any
+
+import numpy as np
+
+from .archive import MODES, ArchivedDays
+from .daycalendar import day_slices
+
+PERIOD_DAY = "day"
+PERIOD_MONTH = "month"
+PERIODS = (PERIOD_DAY, PERIOD_MONTH)
+
+FIELDS = (
+    "charged_kwh",
+    "discharged_kwh",
+    "cycles",
+    "arbitrage_revenue",
+    "selfuse_savings",
+    "fcrd_up_seconds",
+    "fcrd_down_seconds",
+    "fcrd_up_activations",
+    "fcrd_down_activations",
+)
+_FIELD = {name: index for index, name in enumerate(FIELDS)}
+_CHARGE, _SELL, _SELFUSE = 1, 2, 3
+
+
+def energy_totals(
+    energy: np.ndarray,
+    modes: np.ndarray,
+    buy: np.ndarray,
+    sell: np.ndarray,
+    capacity_kwh: float,
+) -> np.ndarray:
+    """Energy and revenue fields summed over slots, NaN energy is skipped.
+
+    modes holds the MODES codes of the slots.
+    """
+    energy = np.nan_to_num(np.asarray(energy, np.float64))
+    charged = np.maximum(energy, 0.0)
+    discharged = np.maximum(-energy, 0.0)
+    totals = np.zeros(len(FIELDS))
+    totals[_FIELD["charged_kwh"]] = charged.sum()
+    totals[_FIELD["discharged_kwh"]] = discharged.sum()
+    totals[_FIELD["cycles"]] = discharged.sum() / capacity_kwh
+    totals[_FIELD["arbitrage_revenue"]] = (
+        discharged[modes == _SELL] @ sell[modes == _SELL]
+        - charged[modes == _CHARGE] @ buy[modes == _CHARGE]
+    )
+    totals[_FIELD["selfuse_savings"]] = (
+        discharged[modes == _SELFUSE] @ buy[modes == _SELFUSE]
+    )
+    return totals
+
+
+class Rollups:
+    """Totals per local day and month, FIELDS order."""
+
+    def __init__(self, tz: tzinfo, capacity_kwh: float) -> None:
+        """Initialize without any totals."""
+        self._tz = tz
+        self._capacity = capacity_kwh
+        self._totals: dict[str, dict[str, np.ndarray]] = {
+            PERIOD_DAY: {},
+            PERIOD_MONTH: {},
+        }
+
+    def _add(self, epoch: float, totals: np.ndarray) -> None:
+        day = datetime.fromtimestamp(epoch, self._tz).date().isoformat()
+        for period, key in ((PERIOD_DAY, day), (PERIOD_MONTH, day[:7])):
+            current = self._totals[period].get(key)
+            if current is None:
+                self._totals[period][key] = totals.copy()
+            else:
+                current += totals
+
+    def add_energy(
+        self, epoch: float, energy_kwh: float, mode: str, buy: float, sell: float
+    ) -> None:
+        """Add battery energy measured in a slot, + charged, - discharged."""
+        code = MODES.index(mode) if mode in MODES else 0
+        self._add(
+            epoch,
+            energy_totals(
+                np.array([energy_kwh]),
+                np.array([code]),
+                np.array([buy]),
+                np.array([sell]),
+                self._capacity,
+            ),
+        )
+
+    def add_fcrd(
+        self, epoch: float, up: bool, seconds: float, activation: bool
+    ) -> None:
+        """Add an FCR-D activation or the active time of one ending."""
+        direction = "up" if up else "down"
+        totals = np.zeros(len(FIELDS))
+        totals[_FIELD[f"fcrd_{direction}_seconds"]] = seconds
+        totals[_FIELD[f"fcrd_{direction}_activations"]] = float(activation)
+        self._add(epoch, totals)
+
+    def add_archive(self, data: ArchivedDays) -> None:
+        """Add archived days, one vectorized sum per day."""
+        starts = np.asarray(data.starts)
+        modes = np.asarray(data.mode)
+        for day in day_slices(starts, self._tz):
+            self._add(
+                float(starts[day.start]),
+                energy_totals(
+                    data.energy[day],
+                    modes[day],
+                    np.asarray(data.buy[day]),
+                    np.asarray(data.sell[day]),
+                    self._capacity,
+                ),
+            )
+
+    def merge_days(self, other: Rollups) -> None:
+        """Add the days of other that have no totals here yet."""
+        for day, totals in other._totals[PERIOD_DAY].items():
+            if day in self._totals[PERIOD_DAY]:
+                continue
+            self._totals[PERIOD_DAY][day] = totals.copy()
+            month = self._totals[PERIOD_MONTH].setdefault(
+                day[:7], np.zeros(len(FIELDS))
+            )
+            month += totals
+
+    def add_stored(self, data: dict[str, Any]) -> None:
+        """Add totals saved with to_stored, e.g. from before a restart.
+
+        Totals counted since are kept, fields are matched by name.
+        """
+        index = [_FIELD.get(name) for name in data.get("fields", ())]
+        for period in PERIODS:
+            for key, values in data.get(period, {}).items():
+                totals = np.zeros(len(FIELDS))
+                for field, value in zip(index, values):
+                    if field is not None:
+                        totals[field] = value
+                current = self._totals[period].get(key)
+                if current is None:
+                    self._totals[period][key] = totals
+                else:
+                    current += totals
+
+    def to_stored(self) -> dict[str, Any]:
+        """Every total, unrounded, for the store."""
+        data: dict[str, Any] = {"fields": list(FIELDS)}
+        for period in PERIODS:
+            data[period] = {
+                key: totals.tolist() for key, totals in self._totals[period].items()
+            }
+        return data
+
+    def to_dict(
+        self, period: str = PERIOD_DAY, start: str | None = None, end: str | None = None
+    ) -> dict[str, dict[str, float]]:
+        """Totals by ISO date or month from start to end, both included."""
+        result = {}
+        for key in sorted(self._totals[period]):
+            if (start and key < start[: len(key)]) or (end and key > end[: len(key)]):
+                continue
+            values = self._totals[period][key].tolist()
+            result[key] = {name: round(value, 3) for name, value in zip(FIELDS, values)}
+        return result
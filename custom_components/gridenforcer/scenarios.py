@@ -0,0 +1,237 @@
+"""Planning over price scenarios before day-ahead prices are published.
+
+Until tomorrow's prices land around 13:00 there is nothing to plan the
+next day on. A ScenarioSet holds a few possible spot price days, from a
+JSON file or from the days the hub has seen. Every scenario is planned
+with the deterministic planner to get candidate schedules, then all
+candidates are scored on all scenarios at once:
+
+    battery flows per candidate   (C, T)   modes only, no prices
+    scores = flows @ prices.T     (C, S)   one matrix product per flow
+
+and the candidate with the best expected or worst case score is picked.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from datetime import date, timedelta, tzinfo
+from typing import NamedTuple
+
+import numpy as np
+
+from .const import SCENARIOS_AVERAGE, SCENARIOS_WORST_CASE
+from .daycalendar import calendar_for, day_calendar
+from .pipeline import PlanPipeline
+from .planner import PlanParameters, transform_series
+from .priceseries import PriceSeries
+from .tuning import BatteryModel
+
+_LOGGER = logging.getLogger(__name__)
+
+# Weight of a past day on the same weekday as the planned day
+WEEKDAY_WEIGHT = 3.0
+
+MODES = ("Standby", "Charge", "Sell", "Selfuse")
+_CHARGE, _SELL, _SELFUSE = 1, 2, 3
+
+
+class ScenarioSet(NamedTuple):
+    """Possible spot prices of one day, one row per scenario."""
+
+    starts: np.ndarray
+    step: int
+    tz: tzinfo
+    # Spot prices, shape (scenarios, slots)
+    spot: np.ndarray
+    # Probability of each scenario, sums to 1
+    weights: np.ndarray
+
+    @property
+    def expected(self) -> np.ndarray:
+        """Probability weighted spot price per slot."""
+        return self.weights @ self.spot
+
+
+class ScenarioPlan(NamedTuple):
+    """Schedule chosen over a scenario set."""
+
+    starts: np.ndarray
+    modes: list[str]
+    expected_score: float
+    worst_score: float
+    candidates: int
+    scenarios: int
+
+
+def _fit(values: np.ndarray, slots: int) -> np.ndarray:
+    """Cut or pad a day of prices to slots, for 23 and 25 hour days."""
+    if len(values) >= slots:
+        return values[:slots]
+    return np.pad(values, (0, slots - len(values)), mode="edge")
+
+
+def _make_set(
+    day: date, tz: tzinfo, step: int, rows: list[np.ndarray], weights
+) -> ScenarioSet | None:
+    rows = [row for row in rows if len(row)]
+    if not rows:
+        return None
+    calendar = day_calendar(tz, day, step)
+    spot = np.vstack(
+        [_fit(np.asarray(row, np.float64), calendar.slots) for row in rows]
+    )
+    weights = np.asarray(weights[: len(rows)], np.float64)
+    return ScenarioSet(calendar.starts, step, tz, spot, weights / weights.sum())
+
+
+def scenarios_from_history(
+    history: list[PriceSeries], day: date, tz: tzinfo, method: str, step: int = 3600
+) -> ScenarioSet | None:
+    """Scenarios for day from past price days.
+
+    weekday: every past day is a scenario, days on the same weekday as day
+    weigh more. average: the moving average of the past days is added as a
+    scenario of its own.
+    """
+    days = [series for series in history if len(series)]
+    if not days:
+        return None
+    rows = [series.values for series in days]
+    if method == SCENARIOS_AVERAGE:
+        slots = day_calendar(tz, day, step).slots
+        rows.append(np.mean([_fit(row, slots) for row in rows], axis=0))
+        weights = [1.0] * len(rows)
+    else:
+        weights = [
+            (
+                WEEKDAY_WEIGHT
+                if calendar_for(int(series.starts[0]), tz).day.weekday()
+                == day.weekday()
+                else 1.0
+            )
+            for series in days
+        ]
+    return _make_set(day, tz, step, rows, weights)
+
+
+def load_scenario_file(
+    path: str, day: date, tz: tzinfo, step: int = 3600
+) -> ScenarioSet | None:
+    """Scenarios from a JSON file, blocking.
+
+    The file holds {"scenarios": [[price, ...], ...], "weights": [...]}
+    with one spot price per slot of the day, weights are optional.
+    """
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+    rows = data.get("scenarios") or []
+    weights = data.get("weights") or [1.0] * len(rows)
+    if len(weights) != len(rows):
+        raise ValueError(f"{path}: {len(rows)} scenarios but {len(weights)} weights")
+    return _make_set(day, tz, step, rows, weights)
+
+
+def mode_codes(modes: list[str]) -> np.ndarray:
+    """Schedule modes as integer codes, unknown modes are standby."""
+    index = {mode: code for code, mode in enumerate(MODES)}
+    return np.fromiter((index.get(mode, 0) for mode in modes), np.int8, len(modes))
+
+
+def battery_flows(
+    codes: np.ndarray, model: BatteryModel = BatteryModel(), step: int = 3600
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Charged, sold and self used energy per candidate and step long slot.
+
+    codes has shape (candidates, slots). The flows only depend on the
+    modes, so they are computed once for all scenarios.
+    """
+    candidates, slots = codes.shape
+    # The model rates are per hour
+    hours = step / 3600
+    charge_rate = model.charge_rate * hours
+    sell_rate = model.sell_rate * hours
+    selfuse_rate = model.selfuse_rate * hours
+    charge = np.zeros((candidates, slots))
+    sell = np.zeros((candidates, slots))
+    selfuse = np.zeros((candidates, slots))
+    soc = np.zeros(candidates)
+    for slot in range(slots):
+        mode = codes[:, slot]
+        charge[:, slot] = np.where(
+            mode == _CHARGE, np.minimum(charge_rate, 1.0 - soc), 0.0
+        )
+        sell[:, slot] = np.where(mode == _SELL, np.minimum(sell_rate, soc), 0.0)
+        selfuse[:, slot] = np.where(
+            mode == _SELFUSE, np.minimum(selfuse_rate, soc), 0.0
+        )
+        soc += charge[:, slot] - sell[:, slot] - selfuse[:, slot]
+    return charge, sell, selfuse
+
+
+def score_candidates(
+    codes: np.ndarray,
+    buy: np.ndarray,
+    sell: np.ndarray,
+    wear_cost: float,
+    model: BatteryModel = BatteryModel(),
+    step: int = 3600,
+) -> np.ndarray:
+    """Score of every candidate in every scenario, shape (candidates, scenarios).
+
+    buy and sell are the price arrays of step long slots, shape (scenarios,
+    slots). Same model as tuning.score_schedule.
+    """
+    charged, sold, selfused = battery_flows(codes, model, step)
+    return (
+        sold @ (sell - wear_cost).T + selfused @ (buy - wear_cost).T - charged @ buy.T
+    )
+
+
+def plan_scenarios(
+    scenarios: ScenarioSet,
+    params: PlanParameters,
+    objective: str,
+    model: BatteryModel = BatteryModel(),
+) -> ScenarioPlan:
+    """Pick the schedule with the best expected or worst case score.
+
+    Candidates are the deterministic plans of every scenario and of the
+    expected prices.
+    """
+    rows = [*scenarios.spot, scenarios.expected]
+    candidates = []
+    for row in rows:
+        priced = transform_series(
+            PriceSeries(scenarios.starts, row, scenarios.step, scenarios.tz), params
+        )
+        result = PlanPipeline().run(priced, params)
+        candidates.append(mode_codes([tv.mode for tv in result.schedule]))
+    codes = np.unique(np.vstack(candidates), axis=0)
+    buy = scenarios.spot * (1 + params.vat / 100) + params.extra_import
+    sell = scenarios.spot + params.extra_export
+    scores = score_candidates(codes, buy, sell, params.bat_cost, model, scenarios.step)
+    expected = scores @ scenarios.weights
+    worst = scores.min(axis=1)
+    best = int(np.argmax(worst if objective == SCENARIOS_WORST_CASE else expected))
+    _LOGGER.debug(
+        "%s candidates over %s scenarios, best expected %.3f worst %.3f",
+        len(codes),
+        len(scenarios.spot),
+        expected[best],
+        worst[best],
+    )
+    return ScenarioPlan(
+        scenarios.starts,
+        [MODES[code] for code in codes[best].tolist()],
+        float(expected[best]),
+        float(worst[best]),
+        len(codes),
+        len(scenarios.spot),
+    )
+
+
+def next_day(series: PriceSeries) -> date:
+    """Local date of the day after the first slot of series."""
+    return calendar_for(int(series.starts[0]), series.tz).day + timedelta(days=1)
@@ -0,0 +1,88 @@
+"""On and off runs of a decision over the planned schedule.
+
+The charge_battery_grid and discharge_battery template sensors of
+power_logic.yaml re-render on every change of the prices, thresholds and
+helpers they read. The planner has already decided every slot, so
+ScheduleTimeline merges the slots of a decision into runs once per
+schedule update. Its state only changes at a run boundary, which is when
+a binary sensor needs a timer.
+
+The binary sensors follow the plan only. Unlike the templates they do not
+look at the overrides, EPS, FCR-D, EV charging or the hourly energy and
+tariff limits, so they have their own entity ids next to the templates.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from typing import NamedTuple
+
+import numpy as np
+
+from .timevalue import TimeValue
+
+
+class Decision(NamedTuple):
+    """A binary sensor on while the slot mode is one of modes."""
+
+    key: str
+    name: str
+    modes: frozenset[str]
+
+
+# Planned counterparts of charge_battery_grid and discharge_battery in
+# power/power_logic.yaml, using the battery covers self use and selling
+DECISIONS = (
+    Decision(
+        "planned_charge_battery_grid",
+        "Planned Charge Battery Grid",
+        frozenset({"Charge"}),
+    ),
+    Decision(
+        "planned_discharge_battery",
+        "Planned Discharge Battery",
+        frozenset({"Selfuse", "Sell"}),
+    ),
+)
+
+
+class ScheduleTimeline:
+    """Runs of consecutive slots with the mode in modes."""
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, schedule: Iterable[TimeValue], modes: frozenset[str]) -> None:
+        """Initialize from the slots of the schedule in time order."""
+        starts: list[float] = []
+        ends: list[float] = []
+        for tv in schedule:
+            if tv.mode not in modes:
+                continue
+            start = tv.start.timestamp()
+            if ends and ends[-1] == start:
+                ends[-1] = tv.end.timestamp()
+            else:
+                starts.append(start)
+                ends.append(tv.end.timestamp())
+        self.starts = np.array(starts)
+        self.ends = np.array(ends)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def _index(self, epoch: float) -> int:
+        return int(np.searchsorted(self.starts, epoch, side="right")) - 1
+
+    def is_on(self, epoch: float) -> bool:
+        """True inside a run, off outside the schedule."""
+        index = self._index(epoch)
+        return index >= 0 and epoch < self.ends[index]
+
+    def next_change(self, epoch: float) -> float | None:
+        """First run start or end after epoch."""
+        index = self._index(epoch)
+        if index >= 0 and epoch < self.ends[index]:
+            return float(self.ends[index])
+        if index + 1 < len(self.starts):
+            return float(self.starts[index + 1])
+        return None
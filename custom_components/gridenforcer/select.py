@@ -9,7 +9,7 @@ from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.restore_state import RestoreEntity
 
-from . import DOMAIN
+from .const import DOMAIN
 
 
 async def async_setup_entry(
@@ -50,7 +50,7 @@ class GridEnforcerSelect(SelectEntity, RestoreEntity):
         options: list[str],
     ) -> None:
         """Initialize the GridEnforcer select entity."""
-        self._attr_unique_id = unique_id
+        self._attr_unique_id = f"{device_unique_id}_{unique_id}"
         self._attr_current_option = current_option
         self._attr_options = options
         self._attr_translation_key = unique_id
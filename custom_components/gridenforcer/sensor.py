@@ -1,27 +1,41 @@
 """GridenforcerControl sensor entities."""
 
-import logging
-import random
-import zoneinfo
-from datetime import datetime, timedelta
+from __future__ import annotations
 
-from homeassistant.components.sensor import RestoreSensor, SensorEntity
+import logging
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from homeassistant.components.sensor import (
+    RestoreSensor,
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, State
-from homeassistant.helpers.condition import SensorDeviceClass
+from homeassistant.const import EntityCategory
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.device_registry import DeviceInfo
-from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.event import (
-    async_track_point_in_time,
-    async_track_state_change,
-    async_track_time_change,
-    async_track_time_interval,
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    CONF_MQTT_PREFIX,
+    CONF_PRICE_SENSOR,
+    DATA_MODBUS,
+    DATA_TELEMETRY,
+    DOMAIN,
 )
-
-from .const import CONF_PRICE_SENSOR, DOMAIN
+from .fcrd import FcrdOverride, LatencyStats
 from .invertermode import InverterMode
-from .pricecalculator import PriceCalculator
+from .pricerank import RANK_SPECS, RankedWindow, RankSpec, window_bounds
+from .registers import Register
+
+if TYPE_CHECKING:
+    from .coordinator import SolaxModbusCoordinator
+    from .pricecalculator import PriceCalculator
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -33,7 +47,7 @@ async def async_setup_entry(
 ):
     """Set up the sensors."""
 
-    price_hub: PriceCalculator = hass.data[DOMAIN]["price_hub"]
+    price_hub: PriceCalculator = hass.data[DOMAIN][config_entry.entry_id]
 
     inverter_mode_sensor = InverterModeSensor(
         "inverter_mode", config_entry.entry_id, "Inverter Mode", hass, config_entry
@@ -83,12 +97,27 @@ async def async_setup_entry(
     async_add_entities(
         [
             inverter_mode_sensor,
+            PriceSensor(price_hub, config_entry, "buy"),
+            PriceSensor(price_hub, config_entry, "sell"),
+            *(PriceRankSensor(price_hub, config_entry, spec) for spec in RANK_SPECS),
             # next_charge_slot_1,
             # next_discharge_slot_1,
             # next_charge_slot_2,
             # next_discharge_slot_2,
         ]
     )
+    if coordinator := hass.data.get(DATA_MODBUS, {}).get(config_entry.entry_id):
+        async_add_entities(
+            [
+                *(
+                    ModbusRegisterSensor(coordinator, register, config_entry.entry_id)
+                    for register in coordinator.registers
+                ),
+                ModbusUtilizationSensor(coordinator, config_entry.entry_id),
+            ]
+        )
+    if config_entry.data.get(CONF_MQTT_PREFIX):
+        async_add_entities([TelemetrySensor(config_entry.entry_id)])
     await price_hub.async_check_inital_sensor_values(
         inverter_mode_sensor,
         None,
@@ -120,11 +149,12 @@ class InverterModeSensor(SensorEntity):
     ):
         """Initialize the sensor."""
 
-        self._attr_unique_id = unique_id
+        self._attr_unique_id = f"{device_unique_id}_{unique_id}"
         self._attr_name = entity_name
         self._attr_translation_key = unique_id
         self._state = InverterMode.STANDBY  # Default state
-        self._mode_before_fcr = InverterMode.STANDBY
+        self._fcrd = FcrdOverride()
+        self._fcrd_latency = {"state": LatencyStats(), "command": LatencyStats()}
         self.should_poll = False
         self._attr_device_info = DeviceInfo(
             identifiers={
@@ -135,7 +165,7 @@ class InverterModeSensor(SensorEntity):
         )
         self._nextChargeTime = None
         self._nextDischargeTime = None
-        self._price_hub = hass.data[DOMAIN]["price_hub"]
+        self._price_hub = hass.data[DOMAIN][config_entry.entry_id]
         self._lowest_avail_price = None
         self._highest_avail_price = None
         self._next_charge_slot = None
@@ -152,29 +182,29 @@ class InverterModeSensor(SensorEntity):
             self.set_state_from_schedule()
         return self._state.value
 
+    @property
+    def requested_mode(self) -> InverterMode:
+        """Mode set by the schedule or the SoC limits, FCR-D aside."""
+        if self._fcrd.active:
+            return self._fcrd.restore_mode
+        return InverterMode(self.state)
+
     def set_state_from_schedule(self):
-        now = datetime.now(zoneinfo.ZoneInfo(key="Europe/Stockholm"))
-        if len(self._price_hub.schedule_today) > 0:
-            cur_sched = next(
-                filter(
-                    lambda x: x.start <= now and x.end >= now,
-                    self._price_hub.schedule_today,
-                )
-            )
-            if cur_sched:
-                match cur_sched.mode:
-                    case "Standby":
-                        self._state = InverterMode.STANDBY
-                    case "Charge":
-                        self._state = InverterMode.CHARGING
-                    case "Selfuse":
-                        self._state = InverterMode.SELFUSE
-                    case "Sell":
-                        self._state = InverterMode.DISCHARGING
-            else:
-                self._state = InverterMode.STANDBY
-        else:
-            self._state = InverterMode.STANDBY
+        self._state = self._mode_from_schedule()
+
+    def _mode_from_schedule(self) -> InverterMode:
+        cur_sched = self._price_hub.current_slot()
+        if cur_sched:
+            match cur_sched.mode:
+                case "Standby":
+                    return InverterMode.STANDBY
+                case "Charge":
+                    return InverterMode.CHARGING
+                case "Selfuse":
+                    return InverterMode.SELFUSE
+                case "Sell":
+                    return InverterMode.DISCHARGING
+        return InverterMode.STANDBY
 
     @property
     def extra_state_attributes(self) -> dict:
@@ -190,14 +220,20 @@ class InverterModeSensor(SensorEntity):
             next_discharge_slot_price = self._next_discharge_slot.sell_value
             next_discharge_slot_start = self._next_discharge_slot.start
 
+        # Slots still ahead carry the projected SoC and feasibility
+        projection = self._price_hub.soc_projection
         sched = []
         if self._price_hub.schedule_today:
             for i in self._price_hub.schedule_today:
-                sched.append(i.to_dict())
+                sched.append(
+                    {**i.to_dict(), **projection.get(int(i.start.timestamp()), {})}
+                )
         sched_tomorrow = []
         if self._price_hub.schedule_tomorrow:
             for i in self._price_hub.schedule_tomorrow:
-                sched_tomorrow.append(i.to_dict())
+                sched_tomorrow.append(
+                    {**i.to_dict(), **projection.get(int(i.start.timestamp()), {})}
+                )
 
         return {
             # "next_charge_time": self._nextChargeTime,
@@ -218,20 +254,83 @@ class InverterModeSensor(SensorEntity):
             "sell_today_max": self._price_hub.sell_today_max,
             "selfuse_tomorrow_max": self._price_hub.selfuse_tomorrow_max,
             "sell_tomorrow_max": self._price_hub.sell_tomorrow_max,
+            "plan_stages": self._price_hub.stage_metrics,
+            "autotune": self._price_hub.autotune,
+            "scenario_plan": self._price_hub.scenario_plan,
+            "mpc": self._price_hub.mpc_state,
+            "soc_control": self._price_hub.soc_control,
+            "soc_fault": self._price_hub.soc_fault,
+            "fcrd": {
+                "mode": self._fcrd.mode.value if self._fcrd.mode else None,
+                "restore_mode": (
+                    self._fcrd.restore_mode.value if self._fcrd.active else None
+                ),
+                "latency": {
+                    name: stats.to_dict() for name, stats in self._fcrd_latency.items()
+                },
+            },
         }
 
     async def set_state(self, mode: InverterMode):
         """Set the inverter mode"""
+        if self._fcrd.defer(mode) or mode == self._state:
+            return
         self._state = mode
-        # self.async_write_ha_state()
+        if self.hass is not None:
+            self.async_write_ha_state()
+        await self._async_command_inverter()
 
     async def async_update(self):
         """Update the inverter mode state."""
         # In a real scenario, you'd fetch this data from an inverter or API.
         # For demo purposes, we'll randomly select an inverter mode.
-        self._state = self.set_state_from_schedule()
+        if self._fcrd.defer(self._mode_from_schedule()):
+            return
+        if self._price_hub.soc_fault["fault"]:
+            # Held in Fault until the SoC jump has passed
+            return
+        self.set_state_from_schedule()
         # _LOGGER.info(f"Inverter mode updated: {self._state}")
         self.async_write_ha_state()
+        await self._async_command_inverter()
+
+    async def async_set_fcrd(self, up: bool, active: bool, flipped: datetime) -> None:
+        """Switch to or from FCR-D right away, the schedule is not recomputed.
+
+        flipped is when the input changed, the latencies are measured from it.
+        """
+        mode = self._fcrd.set(up, active, InverterMode(self.state))
+        if mode is None:
+            return
+        self._state = mode
+        self.async_write_ha_state()
+        latency = (dt_util.utcnow() - flipped).total_seconds() * 1000
+        if not self._fcrd_latency["state"].record(latency):
+            _LOGGER.warning("FCR-D switch to %s took %.1f ms", mode.value, latency)
+        if await self._async_command_inverter():
+            self._fcrd_latency["command"].record(
+                (dt_util.utcnow() - flipped).total_seconds() * 1000
+            )
+
+    async def _async_command_inverter(self) -> bool:
+        """Write the mode to the inverter when it is polled over Modbus.
+
+        Returns True when the inverter confirmed the mode.
+        """
+        if self.hass is None:
+            return False
+        coordinator = self.hass.data.get(DATA_MODBUS, {}).get(self._config.entry_id)
+        if coordinator is None:
+            return False
+        from .commands import CommandError
+
+        mode = InverterMode(self.state)
+        try:
+            await coordinator.async_set_mode(mode)
+        except CommandError as err:
+            _LOGGER.warning("Could not set the inverter to %s: %s", mode.value, err)
+            return False
+        return True
 
     # async def async_update_from_state_price(
     #     self, entity_id: str, old_state: State | None, new_state: State | None
@@ -260,7 +359,7 @@ class ChargeDateTimeSensor(RestoreSensor):
     ):
         """Initialize the sensor."""
 
-        self._attr_unique_id = unique_id
+        self._attr_unique_id = f"{device_unique_id}_{unique_id}"
         self._attr_name = entity_name
         self._attr_translation_key = unique_id
         self._state = None  # Default state
@@ -274,7 +373,7 @@ class ChargeDateTimeSensor(RestoreSensor):
             name="GridEnforcer",
         )
 
-        self._price_hub: PriceCalculator = hass.data[DOMAIN]["price_hub"]
+        self._price_hub: PriceCalculator = hass.data[DOMAIN][config_entry.entry_id]
         self._date_time_value = None
         self._date_prop_name = date_prop_name
         self._is_charge_sensor = is_charge_sensor
@@ -336,3 +435,300 @@ class ChargeDateTimeSensor(RestoreSensor):
 #        return {
 #            "slot_price": getattr(self._price_hub, self._date_prop_name).value,
 #        }
+
+
+class PriceSensor(SensorEntity):
+    """Buy or sell price of the current slot, the day's prices as attributes."""
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_should_poll = False
+    # Lists of every slot, not worth a copy in the recorder on each change
+    _unrecorded_attributes = frozenset(
+        {
+            "times_today",
+            "prices_today",
+            "times_tomorrow",
+            "prices_tomorrow",
+            "prices_all",
+        }
+    )
+
+    def __init__(
+        self, price_hub: PriceCalculator, config_entry: ConfigEntry, kind: str
+    ) -> None:
+        """Initialize the sensor, kind is buy or sell."""
+        self._price_hub = price_hub
+        self._price_sensor = config_entry.data[CONF_PRICE_SENSOR]
+        self._kind = kind
+        # Own entity ids next to the electricity_price_buy/_sell templates
+        self._attr_unique_id = (
+            f"{config_entry.entry_id}_native_electricity_price_{kind}"
+        )
+        self._attr_translation_key = f"native_electricity_price_{kind}"
+        self._attr_name = f"Native electricity price {kind}"
+        self._attr_icon = "mdi:cash-minus" if kind == "buy" else "mdi:cash-plus"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, config_entry.entry_id)},
+            name="GridEnforcer",
+        )
+        self._unsub_slot = None
+
+    async def async_added_to_hass(self) -> None:
+        """Follow the price updates and the slot boundaries."""
+        self.async_on_remove(
+            self._price_hub.async_add_price_listener(self._handle_price_update)
+        )
+        self.async_on_remove(self._cancel_slot)
+        self._handle_price_update()
+
+    @callback
+    def _cancel_slot(self) -> None:
+        if self._unsub_slot is not None:
+            self._unsub_slot()
+            self._unsub_slot = None
+
+    @callback
+    def _handle_price_update(self) -> None:
+        if (state := self.hass.states.get(self._price_sensor)) is not None:
+            self._attr_native_unit_of_measurement = state.attributes.get(
+                "unit_of_measurement"
+            )
+        self._handle_slot()
+
+    @callback
+    def _handle_slot(self, now: datetime | None = None) -> None:
+        """Write the state and wait for the next slot."""
+        if now is not None:
+            # Called by the slot timer, which is done
+            self._unsub_slot = None
+        self._track_next_slot()
+        self.async_write_ha_state()
+
+    @callback
+    def _track_next_slot(self) -> None:
+        self._cancel_slot()
+        summary = self._price_hub.price_summary(self._kind)
+        if summary is not None:
+            next_change = summary.next_change(dt_util.utcnow().timestamp())
+            if next_change is not None:
+                self._unsub_slot = async_track_point_in_utc_time(
+                    self.hass,
+                    self._handle_slot,
+                    datetime.fromtimestamp(next_change, dt_util.UTC),
+                )
+
+    @property
+    def native_value(self) -> float | None:
+        summary = self._price_hub.price_summary(self._kind)
+        if summary is None:
+            return None
+        return summary.value_at(dt_util.utcnow().timestamp())
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        summary = self._price_hub.price_summary(self._kind)
+        return summary.attributes if summary is not None else {}
+
+
+class PriceRankSensor(PriceSensor):
+    """N-th cheapest or most expensive price of the next hours.
+
+    n is the charge or self use hours of the planner. The prices of the
+    window are ranked when the prices or the window move, the state is
+    written only when the threshold changes.
+    """
+
+    _unrecorded_attributes = frozenset()
+
+    def __init__(
+        self, price_hub: PriceCalculator, config_entry: ConfigEntry, spec: RankSpec
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(price_hub, config_entry, spec.kind)
+        self._spec = spec
+        self._attr_unique_id = f"{config_entry.entry_id}_{spec.key}"
+        self._attr_translation_key = spec.key
+        self._attr_name = spec.key.replace("_", " ").capitalize()
+        self._attr_icon = "mdi:cash-lock"
+        self._window: RankedWindow | None = None
+        self._attr_native_value = None
+        self._attr_extra_state_attributes = {}
+
+    @callback
+    def _handle_slot(self, now: datetime | None = None) -> None:
+        """Rank the window of this slot, write the state when it changed."""
+        if now is not None:
+            self._unsub_slot = None
+        self._track_next_slot()
+        value, attributes = self._rank()
+        if (
+            value == self._attr_native_value
+            and attributes == self._attr_extra_state_attributes
+            and now is not None
+        ):
+            return
+        self._attr_native_value = value
+        self._attr_extra_state_attributes = attributes
+        self.async_write_ha_state()
+
+    def _rank(self) -> tuple[float | None, dict]:
+        spec = self._spec
+        hours = getattr(self._price_hub, spec.hours)
+        summary = self._price_hub.price_summary(spec.kind)
+        bounds = (
+            window_bounds(summary, dt_util.utcnow().timestamp(), spec.window_hours)
+            if summary is not None
+            else None
+        )
+        if bounds is None or not hours:
+            self._window = None
+            return None, {}
+        if self._window is None or not self._window.matches(summary, *bounds):
+            self._window = RankedWindow(summary, *bounds)
+        start, end = bounds
+        return self._window.nth_hours(hours, spec.cheapest), {
+            "n": hours,
+            "cheapest": spec.cheapest,
+            "window_start": datetime.fromtimestamp(start, dt_util.UTC).isoformat(),
+            "window_end": datetime.fromtimestamp(end, dt_util.UTC).isoformat(),
+            "slots": len(self._window),
+        }
+
+    @property
+    def native_value(self) -> float | None:
+        return self._attr_native_value
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        return self._attr_extra_state_attributes
+
+
+class ModbusRegisterSensor(CoordinatorEntity["SolaxModbusCoordinator"], SensorEntity):
+    """A register of the inverter read by the Modbus coordinator."""
+
+    def __init__(
+        self,
+        coordinator: SolaxModbusCoordinator,
+        register: Register,
+        device_unique_id: str,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._register = register
+        self._attr_unique_id = f"{device_unique_id}_modbus_{register.key}"
+        self._attr_name = register.key.replace("_", " ").capitalize()
+        self._attr_native_unit_of_measurement = register.unit
+        if register.device_class:
+            self._attr_device_class = SensorDeviceClass(register.device_class)
+        if register.state_class:
+            self._attr_state_class = SensorStateClass(register.state_class)
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, f"{device_unique_id}_inverter")},
+            name="Solax Inverter",
+        )
+        self._written = None
+
+    @property
+    def native_value(self):
+        if not self.coordinator.data:
+            return None
+        return self.coordinator.data.get(self._register.key)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state only when the value changed.
+
+        The coordinator ticks every second, most registers change far less.
+        """
+        value = (self.coordinator.last_update_success, self.native_value)
+        if value != self._written:
+            self._written = value
+            self.async_write_ha_state()
+
+
+class ModbusUtilizationSensor(
+    CoordinatorEntity["SolaxModbusCoordinator"], SensorEntity
+):
+    """Share of the last minute the Modbus connection spent reading."""
+
+    _attr_native_unit_of_measurement = "%"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    # Diagnostics of every block, shown but not kept in the history
+    _unrecorded_attributes = frozenset({"blocks"})
+
+    def __init__(
+        self, coordinator: SolaxModbusCoordinator, device_unique_id: str
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._attr_unique_id = f"{device_unique_id}_modbus_utilization"
+        self._attr_name = "Modbus bus utilization"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, f"{device_unique_id}_inverter")},
+            name="Solax Inverter",
+        )
+        self._metrics = coordinator.poll_metrics
+        self._written = None
+
+    @property
+    def native_value(self) -> float:
+        return self._metrics["utilization"]
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        return {
+            "reads_per_minute": self._metrics["reads_per_minute"],
+            "blocks": self._metrics["blocks"],
+        }
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state only when the utilization or read rate changed.
+
+        The coordinator ticks every second, the blocks follow the next write.
+        """
+        self._metrics = self.coordinator.poll_metrics
+        value = (
+            self.coordinator.last_update_success,
+            self._metrics["utilization"],
+            self._metrics["reads_per_minute"],
+        )
+        if value != self._written:
+            self._written = value
+            self.async_write_ha_state()
+
+
+class TelemetrySensor(SensorEntity):
+    """Payloads the MQTT telemetry publisher has sent."""
+
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, device_unique_id: str) -> None:
+        """Initialize the sensor."""
+        self._entry_id = device_unique_id
+        self._attr_unique_id = f"{device_unique_id}_mqtt_telemetry"
+        self._attr_name = "MQTT telemetry"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, device_unique_id)},
+            name="GridEnforcer",
+        )
+
+    @property
+    def _metrics(self) -> dict | None:
+        publisher = self.hass.data.get(DATA_TELEMETRY, {}).get(self._entry_id)
+        return publisher.metrics() if publisher else None
+
+    @property
+    def available(self) -> bool:
+        return self._metrics is not None
+
+    @property
+    def native_value(self) -> int | None:
+        metrics = self._metrics
+        return metrics["published"] if metrics else None
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        return self._metrics or {}
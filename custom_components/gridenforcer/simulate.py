@@ -0,0 +1,158 @@
+"""Projected SoC of a schedule and repair of infeasible slots.
+
+simulate runs a schedule forward from a starting SoC with the battery's
+capacity, power limits and efficiency. The unclipped trajectory is one
+cumulative sum; only when it leaves the SoC limits is the rest walked slot
+by slot, so a typical day costs a few microseconds.
+
+A slot is infeasible when it can not do what its mode asks: a Charge with
+the battery already at soc_max, or a Sell or Selfuse with the battery at
+soc_backup. fit_schedule feeds this back, it adds charge slots before
+starved discharges and trims the slots that can not be served.
+"""
+
+from __future__ import annotations
+
+from typing import NamedTuple
+
+import numpy as np
+
+MODE_STANDBY = "Standby"
+MODE_CHARGE = "Charge"
+MODE_SELL = "Sell"
+MODE_SELFUSE = "Selfuse"
+
+# Share of the requested energy a slot must move to count as feasible
+FEASIBLE_SHARE = 0.5
+
+
+class BatterySpec(NamedTuple):
+    """Battery limits, SoC in % and power in kW."""
+
+    capacity_kwh: float = 10.0
+    charge_kw: float = 5.0
+    discharge_kw: float = 5.0
+    # Discharge power while covering the house consumption
+    selfuse_kw: float = 2.5
+    # One way efficiency, applied both when charging and discharging
+    efficiency: float = 0.95
+    soc_min: float = 20.0
+    soc_max: float = 80.0
+
+
+class Simulation(NamedTuple):
+    """Projected SoC per slot boundary and the infeasible slots."""
+
+    # SoC in % at the start of every slot and at the end, len(modes) + 1
+    soc: np.ndarray
+    # True for charges with a full battery and discharges moving less than
+    # FEASIBLE_SHARE of their request
+    infeasible: np.ndarray
+
+    @property
+    def feasible(self) -> bool:
+        return not self.infeasible.any()
+
+
+def soc_deltas(modes: list[str], step: int, spec: BatterySpec) -> np.ndarray:
+    """Requested SoC change in % per slot, before the limits apply."""
+    hours = step / 3600
+    per_kwh = 100 / spec.capacity_kwh
+    rates = {
+        MODE_CHARGE: spec.charge_kw * hours * spec.efficiency * per_kwh,
+        MODE_SELL: -spec.discharge_kw * hours / spec.efficiency * per_kwh,
+        MODE_SELFUSE: -spec.selfuse_kw * hours / spec.efficiency * per_kwh,
+    }
+    return np.fromiter((rates.get(mode, 0.0) for mode in modes), np.float64, len(modes))
+
+
+def simulate(
+    modes: list[str], step: int, soc: float, spec: BatterySpec = BatterySpec()
+) -> Simulation:
+    """Project the SoC of a schedule starting at soc."""
+    deltas = soc_deltas(modes, step, spec)
+    trajectory = np.empty(len(deltas) + 1)
+    trajectory[0] = soc
+    np.cumsum(deltas, out=trajectory[1:])
+    trajectory[1:] += soc
+    # Slots that move towards the limits and end outside them
+    over = (deltas > 0) & (trajectory[1:] > spec.soc_max)
+    under = (deltas < 0) & (trajectory[1:] < spec.soc_min)
+    if over.any() or under.any():
+        trajectory = _clipped(deltas, soc, spec)
+    moved = np.diff(trajectory)
+    # A charge topping up the battery is fine, one finding it full is not
+    infeasible = np.where(
+        deltas > 0, moved <= 0.0, np.abs(moved) < FEASIBLE_SHARE * np.abs(deltas)
+    )
+    infeasible &= deltas != 0.0
+    return Simulation(trajectory, infeasible)
+
+
+def _clipped(deltas: np.ndarray, soc: float, spec: BatterySpec) -> np.ndarray:
+    """Walk the slots, charging stops at soc_max and discharging at soc_min.
+
+    A SoC already outside the limits is left there by the clipped mode.
+    """
+    trajectory = [soc]
+    for delta in deltas.tolist():
+        if delta > 0:
+            soc = max(soc, min(soc + delta, spec.soc_max))
+        elif delta < 0:
+            soc = min(soc, max(soc + delta, spec.soc_min))
+        trajectory.append(soc)
+    return np.array(trajectory)
+
+
+def fit_schedule(
+    modes: list[str],
+    prices: list[float],
+    step: int,
+    soc: float,
+    spec: BatterySpec = BatterySpec(),
+) -> tuple[list[str], Simulation]:
+    """Make a schedule feasible, returns the new modes and their projection.
+
+    A starved Sell or Selfuse slot first gets the cheapest Standby slot
+    since the last discharge turned into Charge. Without such a slot, or
+    when the battery is already full before the discharges, the starved
+    slot is trimmed to Standby. Charge slots that find the battery
+    full are trimmed last.
+    """
+    discharge = (MODE_SELL, MODE_SELFUSE)
+    modes = list(modes)
+    trimmed = set()
+    for _ in range(len(modes)):
+        result = simulate(modes, step, soc, spec)
+        starved = [
+            i
+            for i in np.flatnonzero(result.infeasible).tolist()
+            if modes[i] in discharge
+        ]
+        if not starved:
+            break
+        slot = starved[0]
+        # Charge before the run of discharge slots, after the previous run
+        run_start = slot
+        while run_start > 0 and modes[run_start - 1] in discharge:
+            run_start -= 1
+        first = run_start
+        while first > 0 and modes[first - 1] not in discharge:
+            first -= 1
+        standby = [
+            i
+            for i in range(first, run_start)
+            if modes[i] == MODE_STANDBY and i not in trimmed
+        ]
+        # A full battery at the start of the run needs fewer discharges,
+        # not more charging
+        if standby and result.soc[run_start] < spec.soc_max:
+            modes[min(standby, key=lambda i: prices[i])] = MODE_CHARGE
+        else:
+            modes[slot] = MODE_STANDBY
+            trimmed.add(slot)
+    result = simulate(modes, step, soc, spec)
+    for i in np.flatnonzero(result.infeasible).tolist():
+        if modes[i] == MODE_CHARGE:
+            modes[i] = MODE_STANDBY
+    return modes, simulate(modes, step, soc, spec)
@@ -0,0 +1,99 @@
+"""SoC limits of the inverter mode as a streaming state machine.
+
+The SoC template sensor adds 0.0001 every five seconds to force a new
+state, and every state used to re-read the thresholds and set a mode.
+SocController drops SoC changes inside the deadband, keeps the backup and
+max thresholds pushed by the number entities, and answers with a mode
+only when the mode has to change:
+
+    below backup            Charging to keep backup soc
+    at or above max         Standby fully charged
+    in between              Standby
+
+Charging and Discharging keep running until they reach max and backup.
+A mode taken at a threshold is left only once the SoC is hysteresis past
+it, so a SoC wobbling around a threshold does not flap the mode.
+"""
+
+from __future__ import annotations
+
+from .const import DEFAULT_SOC_DEADBAND, DEFAULT_SOC_HYSTERESIS
+from .invertermode import InverterMode
+
+DEFAULT_SOC_BACKUP = 20.0
+DEFAULT_SOC_MAX = 80.0
+
+
+class SocController:
+    """Mode for the SoC limits, with counters of the work it saved."""
+
+    def __init__(
+        self,
+        deadband: float = DEFAULT_SOC_DEADBAND,
+        hysteresis: float = DEFAULT_SOC_HYSTERESIS,
+        backup: float | None = None,
+        soc_max: float | None = None,
+    ) -> None:
+        """Initialize without a SoC, thresholds not set use the defaults."""
+        self.deadband = deadband
+        self.hysteresis = hysteresis
+        self.backup = backup
+        self.soc_max = soc_max
+        self.soc: float | None = None
+        self.received = 0
+        self.accepted = 0
+        self.acted = 0
+
+    def set_thresholds(
+        self, backup: float | None = None, soc_max: float | None = None
+    ) -> None:
+        """Replace the thresholds given, the others are kept."""
+        if backup is not None:
+            self.backup = backup
+        if soc_max is not None:
+            self.soc_max = soc_max
+
+    def update(self, soc: float) -> bool:
+        """Take a new SoC, False when it is inside the deadband."""
+        self.received += 1
+        if self.soc is not None and abs(soc - self.soc) < self.deadband:
+            return False
+        self.soc = soc
+        self.accepted += 1
+        return True
+
+    def decide(self, current: InverterMode) -> InverterMode | None:
+        """Mode the SoC limits require, None when current may stay."""
+        if self.soc is None:
+            return None
+        soc = self.soc
+        backup = DEFAULT_SOC_BACKUP if self.backup is None else self.backup
+        soc_max = DEFAULT_SOC_MAX if self.soc_max is None else self.soc_max
+        if current == InverterMode.CHARGING and soc < soc_max:
+            return None
+        if current == InverterMode.DISCHARGING and soc > backup:
+            return None
+        if current == InverterMode.CHARGESOC and soc < backup + self.hysteresis:
+            return None
+        if current == InverterMode.FULLYCHARGED and soc > soc_max - self.hysteresis:
+            return None
+        if soc < backup:
+            mode = InverterMode.CHARGESOC
+        elif soc >= soc_max:
+            mode = InverterMode.FULLYCHARGED
+        else:
+            mode = InverterMode.STANDBY
+        if mode == current:
+            return None
+        self.acted += 1
+        return mode
+
+    def to_dict(self) -> dict[str, float | int | None]:
+        return {
+            "soc": self.soc,
+            "backup": self.backup,
+            "max": self.soc_max,
+            "received": self.received,
+            "accepted": self.accepted,
+            "acted": self.acted,
+        }
@@ -0,0 +1,127 @@
+"""Detection of BMS SoC jumps from a streaming SoC derivative.
+
+The calibratesoc package renders a template every five seconds to feed a
+ten minute derivative sensor, and an automation flags a fault when the
+derivative passes 20 %/h while the battery current is close to zero. The
+SoC cannot move that fast without current, so the BMS jumped.
+
+SocFaultDetector does the same on the SoC states as they arrive. Samples
+of (time, SoC, battery current) go into a fixed-size ring buffer that
+keeps one sample at or before the window start. The SoC is held between
+samples, like a sensor state, so the slope over the window is
+
+    (soc now - soc held at the window start) / window
+
+which is O(1) per sample, however often the SoC is reported. There is
+no slope until the samples cover the window, right after startup a single
+1 % step over a few seconds would read as a jump. A fault starts at the
+first sample past the threshold with an idle battery and ends at the
+first sample that is not.
+"""
+
+from __future__ import annotations
+
+import math
+
+from .const import DEFAULT_SOC_FAULT_SLOPE
+
+# Seconds the slope is measured over, the derivative sensor used 10 min
+WINDOW = 600.0
+# Samples kept, enough for one every 5 s over the window
+CAPACITY = 256
+# Battery current in A counted as idle
+IDLE_CURRENT = (0.0, 0.5)
+
+
+class SocFaultDetector:
+    """Rolling SoC slope in %/h and the fault it indicates."""
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_SOC_FAULT_SLOPE,
+        window: float = WINDOW,
+        capacity: int = CAPACITY,
+    ) -> None:
+        """Initialize with an empty buffer."""
+        self.threshold = threshold
+        self.window = window
+        self._times = [0.0] * capacity
+        self._socs = [0.0] * capacity
+        self._currents = [math.nan] * capacity
+        self._head = 0
+        self._size = 0
+        self.slope: float | None = None
+        self.fault = False
+        self.faults = 0
+
+    def _at(self, offset: int) -> int:
+        return (self._head + offset) % len(self._times)
+
+    def add(self, timestamp: float, soc: float, current: float) -> bool | None:
+        """Add a sample, True when a fault starts, False when it ends.
+
+        current is NaN when unknown, a fault is then never detected.
+        """
+        capacity = len(self._times)
+        if self._size == capacity:
+            self._head = self._at(1)
+            self._size -= 1
+        index = self._at(self._size)
+        self._times[index] = timestamp
+        self._socs[index] = soc
+        self._currents[index] = current
+        self._size += 1
+        start = timestamp - self.window
+        # Keep the latest sample at or before the window start
+        while self._size > 1 and self._times[self._at(1)] <= start:
+            self._head = self._at(1)
+            self._size -= 1
+
+        self.slope = None
+        oldest = self._head
+        if self._size > 1 and self._times[oldest] <= start:
+            self.slope = (soc - self._socs[oldest]) / self.window * 3600
+        elif self._size == capacity:
+            # Reported faster than the buffer holds, measure over what it has
+            span = timestamp - self._times[oldest]
+            if span > 0:
+                self.slope = (soc - self._socs[oldest]) / span * 3600
+        fault = (
+            self.slope is not None
+            and abs(self.slope) > self.threshold
+            and IDLE_CURRENT[0] <= current <= IDLE_CURRENT[1]
+        )
+        if fault == self.fault:
+            return None
+        self.fault = fault
+        if fault:
+            self.faults += 1
+        return fault
+
+    @property
+    def samples(self) -> list[tuple[float, float, float]]:
+        """Buffered samples, oldest first."""
+        return [
+            (self._times[i], self._socs[i], self._currents[i])
+            for i in map(self._at, range(self._size))
+        ]
+
+    def to_dict(self) -> dict[str, float | int | bool | None]:
+        return {
+            "slope": None if self.slope is None else round(self.slope, 3),
+            "threshold": self.threshold,
+            "fault": self.fault,
+            "faults": self.faults,
+        }
+
+
+def replay(
+    samples: list[tuple[float, float, float]], **kwargs
+) -> list[tuple[float, bool]]:
+    """Fault starts and ends of recorded (time, SoC, current) samples."""
+    detector = SocFaultDetector(**kwargs)
+    changes = []
+    for timestamp, soc, current in samples:
+        if (fault := detector.add(timestamp, soc, current)) is not None:
+            changes.append((timestamp, fault))
+    return changes
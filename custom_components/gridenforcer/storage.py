@@ -0,0 +1,107 @@
+"""Persistent price and schedule snapshot and rollups for GridEnForcerControl."""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timezone
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .priceseries import PriceSeries
+from .timevalue import TimeValue
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+STORAGE_MINOR_VERSION = 2
+# Coalesce bursts of recomputes (price update + schedule trigger) into one write
+SAVE_DELAY = 10
+ROLLUP_STORAGE_VERSION = 1
+# Rollups change with every SoC update, pending writes are flushed at shutdown
+ROLLUP_SAVE_DELAY = 60
+
+
+class ScheduleStore(Store[dict[str, Any]]):
+    """Versioned store holding the last price series, schedule and parameters."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the store for one config entry."""
+        super().__init__(
+            hass,
+            STORAGE_VERSION,
+            f"{DOMAIN}.{entry_id}.snapshot",
+            atomic_writes=True,
+            minor_version=STORAGE_MINOR_VERSION,
+        )
+
+    async def _async_migrate_func(
+        self,
+        old_major_version: int,
+        old_minor_version: int,
+        old_data: dict[str, Any],
+    ) -> dict[str, Any]:
+        """Migrate an older snapshot to the current layout."""
+        if old_major_version > STORAGE_VERSION:
+            # Written by a newer version, the snapshot is only a cache
+            _LOGGER.warning(
+                "Dropping schedule snapshot of unknown version %s.%s",
+                old_major_version,
+                old_minor_version,
+            )
+            return {}
+        if old_minor_version < 2:
+            # 1.2 stores normalized price series instead of the raw sensor lists
+            old_data.pop("raw_today", None)
+            old_data.pop("raw_tomorrow", None)
+        return old_data
+
+
+class RollupStore(Store[dict[str, Any]]):
+    """Daily and monthly rollup totals, see Rollups.to_stored."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the store for one config entry."""
+        super().__init__(
+            hass,
+            ROLLUP_STORAGE_VERSION,
+            f"{DOMAIN}.{entry_id}.rollups",
+            atomic_writes=True,
+        )
+
+
+def timevalues_to_list(values: list[TimeValue]) -> list[dict[str, Any]]:
+    """Serialize TimeValues to JSON friendly dicts."""
+    return [
+        {
+            "start": tv.start.isoformat(),
+            "end": tv.end.isoformat(),
+            "value": tv.value,
+            "sell_value": tv.sell_value,
+            "mode": tv.mode,
+        }
+        for tv in values
+    ]
+
+
+def timevalues_from_list(data: list[dict[str, Any]] | None) -> list[TimeValue]:
+    """Deserialize TimeValues stored with timevalues_to_list."""
+    if not data:
+        return []
+    return [TimeValue.from_dict(item) for item in data]
+
+
+def schedule_covers(schedule: list[TimeValue], now: datetime | None = None) -> bool:
+    """Return True if a slot in the schedule contains the current time."""
+    if now is None:
+        now = datetime.now(timezone.utc)
+    return any(tv.start <= now < tv.end for tv in schedule)
+
+
+def series_from_snapshot(data: dict[str, Any] | None) -> PriceSeries | None:
+    """Deserialize a PriceSeries stored with PriceSeries.to_dict."""
+    if not data:
+        return None
+    return PriceSeries.from_dict(data)
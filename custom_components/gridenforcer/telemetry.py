@@ -0,0 +1,344 @@
+"""Telemetry packages published over MQTT from a packed snapshot.
+
+The flower and mqtt packages render a JSON template every one to sixty
+seconds, with a states() lookup and a float conversion per field whether
+anything changed or not. TelemetryPublisher keeps the numbers of every
+package packed in one array, updated as the source states change, and
+publishes a package
+
+    on change       at most once per min_interval, changes in between
+                    coalesce into the next payload
+    unchanged       once per max_interval, so consumers see it is alive
+
+Only one publish runs at a time. Packages due while it runs are published
+by the same flush once it returns, with their latest values, so a slow
+broker delays payloads instead of queueing them. Numeric packages can be
+encoded as a little endian float64 time followed by float32 values
+instead of JSON.
+
+A package goes to prefix/name unless it is mapped to a topic of its own,
+e.g. the secrets the YAML automations publish to, see parse_topics.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import re
+import struct
+import time
+from collections.abc import Awaitable, Callable, Mapping
+from typing import Any, NamedTuple
+
+import numpy as np
+
+from .const import MQTT_ENCODING_BINARY, MQTT_ENCODING_JSON
+
+NUMBER = "number"
+STRING = "string"
+
+
+class Field(NamedTuple):
+    """One value of a package, the sum of its entities times scale."""
+
+    key: str
+    entities: tuple[str, ...]
+    kind: str = NUMBER
+    scale: float = 1.0
+
+
+class Package(NamedTuple):
+    """Fields published together on one topic."""
+
+    name: str
+    fields: tuple[Field, ...]
+    # Seconds between payloads when values change and when they do not
+    min_interval: float
+    max_interval: float
+    qos: int = 0
+
+
+def _f(key: str, *entities: str, **kwargs) -> Field:
+    return Field(key, entities, **kwargs)
+
+
+# Same fields as config/packages/gridenforcer/power/flower.yaml and
+# system/mqtt.yaml, changes no more often than the automations published
+PACKAGES = (
+    Package("BATPower", (_f("BATPower", "sensor.solax1_battery_power"),), 1, 10, 1),
+    Package("INVPower", (_f("INVPower", "sensor.solax1_ac_power"),), 1, 10, 1),
+    Package(
+        "GRIDPower",
+        (_f("GRIDPower", "sensor.solax1_grid_power", scale=-1.0),),
+        1,
+        10,
+        1,
+    ),
+    Package("BATSOC", (_f("BATSOC", "sensor.solax_soc_total"),), 1, 10, 1),
+    Package("PVPower", (_f("PVPower", "sensor.solax_pv_power_total"),), 1, 10, 1),
+    Package(
+        "quick",
+        (
+            _f("SITEPOWER", "sensor.power_consumption"),
+            _f("SITEEXP", "sensor.momentary_active_export"),
+            _f("SITEIMP", "sensor.momentary_active_import"),
+            _f("BATPOWER", "sensor.solax1_battery_power"),
+            _f("FCRUP", "binary_sensor.flower_fcr_d_up"),
+            _f("FCRDOWN", "binary_sensor.flower_fcr_d_down"),
+            _f("FCRDOWNDEC", "sensor.available_power_fcr_u"),
+            _f("FCRUPDEC", "sensor.available_power_fcr_n"),
+            _f("FCRDOWNPROC", "sensor.fcrn_proc"),
+            _f("FCRUPPROC", "sensor.fcru_proc"),
+        ),
+        2,
+        30,
+    ),
+    Package(
+        "normal",
+        (
+            _f("BATTEMP", "sensor.solax1_battery_temp_low"),
+            _f("PVTOTAL", "sensor.solax1_pv1_power", "sensor.solax1_pv2_power"),
+            _f("SOC", "sensor.solax1_battery_soc"),
+            _f("INVSTATE", "sensor.solax1_inverter_state_value"),
+            _f("SOCFAULTDET", "input_boolean.soc_fault_detected", kind=STRING),
+            _f("SOCFAULTCOUNT", "counter.soc_faults_detected_counter"),
+        ),
+        30,
+        300,
+    ),
+    Package(
+        "slow",
+        (
+            _f("SITEFUSE", "input_number.max_grid_current"),
+            _f("BATKWH", "sensor.solax1_battery_install_capacity"),
+            _f("GEGITBRANCH", "sensor.gridenforcer_git_branch", kind=STRING),
+            _f("GEGITHEXSHA", "sensor.gridenforcer_git_hexsha_short", kind=STRING),
+            _f("GEUPDATETIME", "sensor.gridenforcer_update", kind=STRING),
+            _f(
+                "SOLAXINVVER",
+                "sensor.solax1_firmwareversion_invertermaster",
+                kind=STRING,
+            ),
+            _f("SOLAXMANVER", "sensor.solax1_firmwareversion_manager", kind=STRING),
+            _f("SOLAXFIRMARM", "sensor.solax1_firmwareversion_arm", kind=STRING),
+            _f("SOLAXFIRMDSP", "sensor.solax1_firmwareversion_dsp", kind=STRING),
+            _f("FCRUPCOUNT", "counter.fcr_d_up_counter"),
+            _f("FCRDOWNCOUNT", "counter.fcr_d_down_counter"),
+            _f("DBSIZE", "sensor.mariadb_size"),
+            _f("SERIESNO", "sensor.solax1_series_number", kind=STRING),
+            _f("SERIESNUM", "sensor.solax1_invertersn", kind=STRING),
+            _f("SPOTPRICE", "sensor.spot_price_electricity", kind=STRING),
+        ),
+        60,
+        600,
+    ),
+)
+
+
+def parse_topics(text: str, packages: tuple[Package, ...] = PACKAGES) -> dict[str, str]:
+    """Topics by package from "name=topic" entries, comma or line separated.
+
+    Raises ValueError on an entry without a topic or of an unknown package.
+    """
+    names = {package.name for package in packages}
+    topics = {}
+    for entry in re.split(r"[,\n]", text):
+        if not entry.strip():
+            continue
+        name, _, topic = (part.strip() for part in entry.partition("="))
+        if name not in names or not topic:
+            raise ValueError(f"Invalid MQTT topic entry {entry.strip()!r}")
+        topics[name] = topic
+    return topics
+
+
+def to_number(state: str | None) -> float:
+    """Number of a state, on and off as 1 and 0, anything else 0."""
+    if state == "on":
+        return 1.0
+    try:
+        value = float(state)
+    except (TypeError, ValueError):
+        return 0.0
+    return value if math.isfinite(value) else 0.0
+
+
+class _Packed:
+    """Values of one package, numbers in the shared array."""
+
+    __slots__ = (
+        "package",
+        "numbers",
+        "strings",
+        "dirty",
+        "last",
+        "changes",
+        "_binary",
+    )
+
+    def __init__(self, package: Package, numbers: np.ndarray) -> None:
+        self.package = package
+        self.numbers = numbers
+        self.strings: dict[str, str] = {}
+        self.dirty = True
+        self.last = -math.inf
+        # Changes coalesced into the next payload
+        self.changes = 0
+        self._binary = (
+            struct.Struct(f"<d{len(numbers)}f")
+            if all(field.kind == NUMBER for field in package.fields)
+            else None
+        )
+
+    def encode(self, now: float, encoding: str) -> bytes | str:
+        if encoding == MQTT_ENCODING_BINARY and self._binary is not None:
+            return self._binary.pack(now, *self.numbers.tolist())
+        values = iter(self.numbers.tolist())
+        payload: dict[str, Any] = {}
+        for field in self.package.fields:
+            if field.kind == NUMBER:
+                payload[field.key] = next(values)
+            else:
+                payload[field.key] = self.strings.get(field.key, "unknown")
+        payload["time"] = now
+        return json.dumps(payload, separators=(",", ":"))
+
+
+class TelemetryPublisher:
+    """Publishes the packages to topics under prefix or to their own."""
+
+    def __init__(
+        self,
+        publish: Callable[[str, bytes | str, int], Awaitable[None]],
+        prefix: str,
+        packages: tuple[Package, ...] = PACKAGES,
+        encoding: str = MQTT_ENCODING_JSON,
+        topics: Mapping[str, str] | None = None,
+    ) -> None:
+        """Initialize with every value unknown and every package due."""
+        self._publish = publish
+        prefix = prefix.rstrip("/")
+        topics = topics or {}
+        self._topics = [
+            topics.get(package.name, f"{prefix}/{package.name}") for package in packages
+        ]
+        self.encoding = encoding
+        count = sum(
+            1
+            for package in packages
+            for field in package.fields
+            if field.kind == NUMBER
+        )
+        # Numbers of all packages back to back, each package holds a view
+        self._numbers = np.zeros(count)
+        self._packed: list[_Packed] = []
+        # entity_id -> (package index, field, number index or -1)
+        self._targets: dict[str, list[tuple[int, Field, int]]] = {}
+        self._raw: dict[str, str | None] = {}
+        offset = 0
+        for index, package in enumerate(packages):
+            numbers = sum(1 for field in package.fields if field.kind == NUMBER)
+            self._packed.append(
+                _Packed(package, self._numbers[offset : offset + numbers])
+            )
+            for field in package.fields:
+                position = -1
+                if field.kind == NUMBER:
+                    position = offset
+                    offset += 1
+                for entity_id in field.entities:
+                    self._targets.setdefault(entity_id, []).append(
+                        (index, field, position)
+                    )
+        self._flushing = False
+        self._again = False
+        self.published = 0
+        self.coalesced = 0
+        self.busy = 0
+        self.bytes = 0
+        self.cpu_seconds = 0.0
+
+    @property
+    def entity_ids(self) -> list[str]:
+        """Source entities to subscribe to."""
+        return list(self._targets)
+
+    def on_state(self, entity_id: str, state: str | None) -> bool:
+        """Take a new state, True when a package changed."""
+        targets = self._targets.get(entity_id)
+        if targets is None or self._raw.get(entity_id) == state:
+            return False
+        self._raw[entity_id] = state
+        changed = False
+        for index, field, position in targets:
+            packed = self._packed[index]
+            if position < 0:
+                value = "unknown" if state is None else state
+                if packed.strings.get(field.key) == value:
+                    continue
+                packed.strings[field.key] = value
+            else:
+                number = field.scale * sum(
+                    to_number(self._raw.get(source)) for source in field.entities
+                )
+                if self._numbers[position] == number:
+                    continue
+                self._numbers[position] = number
+            packed.changes += packed.dirty
+            packed.dirty = True
+            changed = True
+        return changed
+
+    def due(self, now: float) -> list[int]:
+        """Indices of the packages to publish at now."""
+        return [
+            index
+            for index, packed in enumerate(self._packed)
+            if now - packed.last
+            >= (
+                packed.package.min_interval
+                if packed.dirty
+                else packed.package.max_interval
+            )
+        ]
+
+    async def async_flush(self, now: Callable[[], float] = time.time) -> None:
+        """Publish the packages that are due, one payload at a time."""
+        if self._flushing:
+            self.busy += 1
+            self._again = True
+            return
+        self._flushing = True
+        try:
+            self._again = True
+            while self._again:
+                self._again = False
+                for index in self.due(now()):
+                    packed = self._packed[index]
+                    started = time.process_time()
+                    at = now()
+                    payload = packed.encode(at, self.encoding)
+                    self.coalesced += packed.changes
+                    packed.changes = 0
+                    packed.dirty = False
+                    packed.last = at
+                    self.cpu_seconds += time.process_time() - started
+                    await self._publish(
+                        self._topics[index],
+                        payload,
+                        packed.package.qos,
+                    )
+                    self.published += 1
+                    self.bytes += len(payload)
+        finally:
+            self._flushing = False
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "encoding": self.encoding,
+            "published": self.published,
+            "coalesced": self.coalesced,
+            "busy": self.busy,
+            "bytes": self.bytes,
+            "cpu_ms": round(self.cpu_seconds * 1000, 3),
+        }
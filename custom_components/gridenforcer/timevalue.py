@@ -84,3 +84,21 @@ class TimeValue:
             "sell_value": self.sell_value,
             "mode": self.mode,
         }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TimeValue":
+        """Create a TimeValue from a dict as produced by to_dict.
+
+        Start and end may be datetimes or ISO 8601 strings.
+        """
+        start = data["start"]
+        end = data["end"]
+        if isinstance(start, str):
+            start = datetime.fromisoformat(start)
+        if isinstance(end, str):
+            end = datetime.fromisoformat(end)
+        tv = cls(
+            start=start, end=end, value=data["value"], sell_value=data["sell_value"]
+        )
+        tv.mode = data.get("mode", "Standby")
+        return tv
@@ -0,0 +1,239 @@
+"""Parameter sweep and auto-tuning of the planning parameters.
+
+Every candidate set of selfuse_hours, charge_hours, bat_cost and delta is
+planned on the given price days and scored with a simple battery model:
+charging costs the buy price, selling earns the sell price and self use
+saves the buy price, each discharged unit pays the battery wear cost.
+Scores are in SEK per unit of battery capacity.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import logging
+import math
+from collections import OrderedDict
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, NamedTuple
+
+from .const import PEAKS_PROMINENCE
+from .pipeline import PlanPipeline
+from .planner import PlanParameters, PricedSeries
+
+_LOGGER = logging.getLogger(__name__)
+
+SELFUSE_HOURS = (1, 2, 3, 4, 5, 6)
+CHARGE_HOURS = (1, 2, 3, 4)
+BAT_COST_FACTORS = (0.5, 1.0, 1.5, 2.0)
+DELTAS = (0.05, 0.1, 0.2)
+
+
+class BatteryModel(NamedTuple):
+    """Share of the battery capacity moved per hour in each mode."""
+
+    charge_rate: float = 0.5
+    sell_rate: float = 1.0
+    selfuse_rate: float = 0.25
+    # One way efficiency between the grid and the cells, used by the MPC
+    efficiency: float = 1.0
+
+
+class TuneResult(NamedTuple):
+    """Best parameters of a sweep."""
+
+    params: PlanParameters
+    score: float
+    # Score of the parameters the sweep started from
+    baseline_score: float
+    candidates: int
+
+    @property
+    def improvement(self) -> float:
+        return self.score - self.baseline_score
+
+
+def candidate_grid(
+    base: PlanParameters,
+    selfuse_hours: Iterable[int] = SELFUSE_HOURS,
+    charge_hours: Iterable[int] = CHARGE_HOURS,
+    bat_cost_factors: Iterable[float] = BAT_COST_FACTORS,
+    deltas: Iterable[float] = DELTAS,
+) -> list[PlanParameters]:
+    """All combinations of the swept parameters on top of base.
+
+    Sorted so candidates sharing delta and bat_cost follow each other and
+    reuse the peak stages. Prominence peaks do not use delta, so delta is
+    only swept with delta peaks.
+    """
+    if base.peaks == PEAKS_PROMINENCE:
+        deltas = (base.delta,)
+    return [
+        base._replace(
+            selfuse_hours=selfuse,
+            charge_hours=charge,
+            bat_cost=round(base.bat_cost * factor, 4),
+            delta=delta,
+        )
+        for delta, factor, selfuse, charge in itertools.product(
+            deltas, bat_cost_factors, selfuse_hours, charge_hours
+        )
+    ]
+
+
+def score_schedule(
+    priced: PricedSeries,
+    modes: Sequence[str],
+    wear_cost: float,
+    model: BatteryModel = BatteryModel(),
+) -> float:
+    """Value of a schedule for one day, modes in slot order."""
+    buy = priced.buy.tolist()
+    sell = priced.sell.tolist()
+    # The rates are per hour, a slot moves its share of an hour
+    hours = priced.series.step / 3600
+    charge_rate = model.charge_rate * hours
+    sell_rate = model.sell_rate * hours
+    selfuse_rate = model.selfuse_rate * hours
+    soc = 0.0
+    score = 0.0
+    for mode, buy_price, sell_price in zip(modes, buy, sell):
+        if mode == "Charge":
+            energy = min(charge_rate, 1.0 - soc)
+            soc += energy
+            score -= energy * buy_price
+        elif mode == "Sell":
+            energy = min(sell_rate, soc)
+            soc -= energy
+            score += energy * (sell_price - wear_cost)
+        elif mode == "Selfuse":
+            energy = min(selfuse_rate, soc)
+            soc -= energy
+            score += energy * (buy_price - wear_cost)
+    return score
+
+
+def _evaluate_chunk(
+    days: list[PricedSeries],
+    candidates: list[PlanParameters],
+    wear_cost: float,
+    model: BatteryModel,
+) -> list[float]:
+    pipelines = [PlanPipeline() for _ in days]
+    scores = []
+    for candidate in candidates:
+        total = 0.0
+        for priced, pipeline in zip(days, pipelines):
+            try:
+                result = pipeline.run(priced, candidate)
+            except (IndexError, ValueError):
+                # e.g. more selfuse hours than the day has slots
+                total = -math.inf
+                break
+            modes = [tv.mode for tv in result.schedule]
+            total += score_schedule(priced, modes, wear_cost, model)
+        scores.append(total)
+    return scores
+
+
+def evaluate(
+    days: list[PricedSeries],
+    candidates: list[PlanParameters],
+    wear_cost: float,
+    model: BatteryModel = BatteryModel(),
+    workers: int = 1,
+    mp_context: Any = None,
+) -> list[float]:
+    """Total score over all days for every candidate, in candidate order."""
+    days = [priced for priced in days if len(priced.series)]
+    if not days or not candidates:
+        return [0.0] * len(candidates)
+    if workers <= 1:
+        return _evaluate_chunk(days, candidates, wear_cost, model)
+    size = max(1, len(candidates) // (workers * 2))
+    chunks = [candidates[i : i + size] for i in range(0, len(candidates), size)]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+        results = executor.map(
+            _evaluate_chunk,
+            itertools.repeat(days),
+            chunks,
+            itertools.repeat(wear_cost),
+            itertools.repeat(model),
+        )
+        return [score for chunk in results for score in chunk]
+
+
+def sweep(
+    days: list[PricedSeries],
+    base: PlanParameters,
+    candidates: list[PlanParameters] | None = None,
+    model: BatteryModel = BatteryModel(),
+    workers: int = 1,
+    mp_context: Any = None,
+) -> TuneResult:
+    """Find the candidate with the best score, base.bat_cost is the wear cost."""
+    if candidates is None:
+        candidates = candidate_grid(base)
+    scores = evaluate(
+        days, [base, *candidates], base.bat_cost, model, workers, mp_context
+    )
+    baseline = scores[0]
+    best = max(range(len(candidates)), key=lambda i: scores[i + 1])
+    result = TuneResult(candidates[best], scores[best + 1], baseline, len(candidates))
+    _LOGGER.debug("Sweep of %s candidates: %s", len(candidates), result)
+    return result
+
+
+def price_digest(days: list[PricedSeries]) -> str:
+    """Digest of the price vectors, identifies the input of a sweep."""
+    digest = hashlib.sha1()
+    for priced in days:
+        digest.update(priced.series.starts.tobytes())
+        digest.update(priced.buy.tobytes())
+        digest.update(priced.sell.tobytes())
+    return digest.hexdigest()
+
+
+class TuneCache:
+    """Sweep results per price vector, so a sweep runs once per publication."""
+
+    def __init__(self, size: int = 8) -> None:
+        """Initialize an empty cache keeping the last size results."""
+        self._results: OrderedDict[tuple, TuneResult] = OrderedDict()
+        self._size = size
+        self.sweeps = 0
+
+    def get(self, days: list[PricedSeries], base: PlanParameters) -> TuneResult | None:
+        """Return a cached result for the days and base parameters."""
+        return self._results.get(self._key(days, base))
+
+    def sweep(
+        self,
+        days: list[PricedSeries],
+        base: PlanParameters,
+        workers: int = 1,
+        mp_context: Any = None,
+    ) -> TuneResult:
+        """Return the cached result or run the sweep."""
+        key = self._key(days, base)
+        if (result := self._results.get(key)) is not None:
+            self._results.move_to_end(key)
+            return result
+        result = sweep(days, base, workers=workers, mp_context=mp_context)
+        self.sweeps += 1
+        self._results[key] = result
+        while len(self._results) > self._size:
+            self._results.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _key(days: list[PricedSeries], base: PlanParameters) -> tuple:
+        # The swept parameters of base do not change the best candidate
+        return (
+            price_digest(days),
+            base.vat,
+            base.extra_import,
+            base.extra_export,
+            base.bat_cost,
+        )
@@ -0,0 +1,52 @@
+"""Websocket commands for the dashboards."""
+
+from __future__ import annotations
+
+from typing import Any
+
+import voluptuous as vol
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DOMAIN
+from .rollups import PERIOD_DAY, PERIODS
+
+
+@callback
+def async_register_commands(hass: HomeAssistant) -> None:
+    """Register the commands, once for all config entries."""
+    websocket_api.async_register_command(hass, websocket_rollups)
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/rollups",
+        vol.Optional("entry_id"): str,
+        vol.Optional("period", default=PERIOD_DAY): vol.In(PERIODS),
+        vol.Optional("start"): str,
+        vol.Optional("end"): str,
+    }
+)
+@callback
+def websocket_rollups(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Return the daily or monthly rollups of an entry, the first by default."""
+    hubs = hass.data.get(DOMAIN, {})
+    entry_id = msg.get("entry_id") or next(iter(hubs), None)
+    hub = hubs.get(entry_id)
+    if hub is None:
+        connection.send_error(
+            msg["id"], websocket_api.ERR_NOT_FOUND, "No GridEnForcer entry"
+        )
+        return
+    connection.send_result(
+        msg["id"],
+        {
+            "entry_id": entry_id,
+            "period": msg["period"],
+            "totals": hub.rollups.to_dict(
+                msg["period"], msg.get("start"), msg.get("end")
+            ),
+        },
+    )
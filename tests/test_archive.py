@@ -0,0 +1,96 @@
+"""Test the columnar day archive."""
+from datetime import date
+
+import numpy as np
+import pytest
+
+STEP = 3600
+START = 1704063600
+
+
+def _append(archive, day, first, slots=24, modes=None):
+    starts = first + np.arange(slots, dtype=np.int64) * STEP
+    spot = np.linspace(0.5, 1.5, slots)
+    soc = np.linspace(20.0, 80.0, slots + 1)
+    return archive.append(
+        day,
+        STEP,
+        starts,
+        spot,
+        spot * 1.25,
+        spot + 0.05,
+        modes or ["Charge", "Standby", "Sell", "Selfuse"] * (slots // 4),
+        soc[:-1],
+        np.diff(soc) / 10,
+    )
+
+
+def test_append_and_read_back(tmp_path):
+    """Test that days are read back as memory mapped columns."""
+    from custom_components.gridenforcer.archive import DayArchive
+
+    archive = DayArchive(str(tmp_path / "archive"))
+    assert len(archive.read().starts) == 0
+
+    assert _append(archive, date(2024, 1, 1), START)
+    assert _append(archive, date(2024, 1, 2), START + 86400, slots=96 // 4)
+    data = archive.read()
+
+    assert data.days.tolist() == [date(2024, 1, 1), date(2024, 1, 2)]
+    assert len(data.starts) == 48
+    assert isinstance(data.spot, np.memmap)
+    assert data.mode[:4].tolist() == [1, 0, 2, 3]
+    assert data.buy[0] == pytest.approx(0.625)
+    assert data.energy.dtype == np.float32
+
+
+def test_read_range_and_duplicates(tmp_path):
+    """Test day ranges and that a day is archived only once."""
+    from custom_components.gridenforcer.archive import DayArchive
+
+    archive = DayArchive(str(tmp_path))
+    for offset in range(3):
+        _append(archive, date(2024, 1, 1 + offset), START + offset * 86400)
+
+    assert not _append(archive, date(2024, 1, 2), START + 86400)
+    data = archive.read(date(2024, 1, 2), date(2024, 1, 2))
+    assert data.starts[0] == START + 86400
+    assert len(data.starts) == 24
+    assert len(archive.read(first=date(2024, 1, 2)).starts) == 48
+
+
+def test_interrupted_append_is_cut_off(tmp_path):
+    """Test that rows without an index record are overwritten."""
+    from custom_components.gridenforcer.archive import DayArchive
+
+    archive = DayArchive(str(tmp_path))
+    _append(archive, date(2024, 1, 1), START)
+    with open(tmp_path / "spot.bin", "ab") as file:
+        file.write(np.zeros(5).tobytes())
+
+    _append(archive, date(2024, 1, 2), START + 86400)
+
+    data = archive.read()
+    assert len(data.spot) == 48
+    assert data.spot[24] == pytest.approx(0.5)
+
+
+def test_column_length_mismatch(tmp_path):
+    """Test that a day with columns of different lengths is refused."""
+    from custom_components.gridenforcer.archive import DayArchive
+
+    with pytest.raises(ValueError):
+        _append(DayArchive(str(tmp_path)), date(2024, 1, 1), START, modes=["Charge"])
+
+
+def test_soc_at_slot_boundaries():
+    """Test the measured SoC and battery energy per slot."""
+    from custom_components.gridenforcer.archive import battery_energy, soc_at
+
+    boundaries = START + np.arange(4) * STEP
+    times = np.array([START - 60, START + 1800, START + 2 * STEP + 10])
+    soc = soc_at(boundaries, times, np.array([30.0, 50.0, 45.0]))
+
+    assert soc.tolist() == [30.0, 50.0, 50.0, 45.0]
+    assert battery_energy(soc, 10.0).tolist() == pytest.approx([2.0, 0.0, -0.5])
+    assert np.isnan(soc_at(boundaries, times[1:], np.array([50.0, 45.0]))[0])
@@ -0,0 +1,79 @@
+"""Test the change-only inverter command writer."""
+import pytest
+
+pytest.importorskip("pymodbus")
+
+
+class FakeInverter:
+    """Holding registers where writes show up in the read back registers."""
+
+    def __init__(self, ignore_writes=0):
+        self.registers = {31: 0, 32: 0}
+        self.ignore_writes = ignore_writes
+        self.writes = []
+
+    async def write_registers(self, address, values):
+        self.writes.append((address, list(values)))
+        if self.ignore_writes:
+            self.ignore_writes -= 1
+            return
+        for offset, value in enumerate(values):
+            self.registers[address + offset] = value
+
+    async def read_block(self, block):
+        return {
+            "inverter_mode_value": self.registers[31],
+            "inverter_manual_mode_value": self.registers[32],
+        }
+
+
+def test_plan_writes_batches_contiguous_changes():
+    """Test that only changed registers are written, adjacent ones together."""
+    from custom_components.gridenforcer.commands import plan_writes
+
+    assert plan_writes({31: 3, 32: 1}, {}) == [(31, [3, 1])]
+    assert plan_writes({31: 3, 32: 1}, {31: 3, 32: 0}) == [(32, [1])]
+    assert plan_writes({31: 3, 32: 1}, {31: 3, 32: 1}) == []
+    assert plan_writes({31: 1, 33: 1}, {}) == [(31, [1]), (33, [1])]
+
+
+@pytest.mark.asyncio
+async def test_mode_switch_writes_the_difference():
+    """Test one request per switch and none when already in mode."""
+    from custom_components.gridenforcer.commands import CommandWriter
+    from custom_components.gridenforcer.invertermode import InverterMode
+
+    inverter = FakeInverter()
+    writer = CommandWriter(inverter, backoff=0)
+    writer.observe({"inverter_mode_value": 0, "inverter_manual_mode_value": 0})
+
+    values = await writer.set_mode(InverterMode.CHARGING)
+    assert values == {"inverter_mode_value": 3, "inverter_manual_mode_value": 1}
+    assert inverter.writes == [(31, [3, 1])]
+
+    assert await writer.set_mode(InverterMode.FCRDD) is None
+    await writer.set_mode(InverterMode.DISCHARGING)
+    assert inverter.writes[-1] == (32, [2])
+    await writer.set_mode(InverterMode.SELFUSE)
+    assert inverter.writes[-1] == (31, [0])
+    assert len(inverter.writes) == 3
+
+
+@pytest.mark.asyncio
+async def test_retry_until_confirmed():
+    """Test that a write that did not stick is retried and then fails."""
+    from custom_components.gridenforcer.commands import CommandError, CommandWriter
+    from custom_components.gridenforcer.invertermode import InverterMode
+
+    inverter = FakeInverter(ignore_writes=2)
+    writer = CommandWriter(inverter, backoff=0)
+    await writer.set_mode(InverterMode.STANDBY)
+    assert len(inverter.writes) == 3
+    assert writer.confirmed == {31: 3, 32: 0}
+
+    stuck = FakeInverter(ignore_writes=10)
+    with pytest.raises(CommandError):
+        await CommandWriter(stuck, attempts=3, backoff=0).set_mode(
+            InverterMode.CHARGING
+        )
+    assert len(stuck.writes) == 3
@@ -35,7 +35,7 @@ def test_number_entities():
         unit_of_measurement="%"
     )
     
-    assert number_entity._attr_unique_id == "test_number"
+    assert number_entity._attr_unique_id == "test_device_test_number"
     assert number_entity._attr_name == "Test Number"
     assert number_entity._attr_native_min_value == 0.0
     assert number_entity._attr_native_max_value == 100.0
@@ -54,7 +54,7 @@ def test_select_entities():
         options=["automatic_mode", "manual_mode"]
     )
     
-    assert select_entity._attr_unique_id == "operation_mode"
+    assert select_entity._attr_unique_id == "test_device_operation_mode"
     assert select_entity._attr_current_option == "automatic_mode"
     assert "automatic_mode" in select_entity._attr_options
     assert "manual_mode" in select_entity._attr_options
@@ -70,12 +70,13 @@ async def test_inverter_mode_sensor(hass, config_entry):
     mock_price_hub = MagicMock()
     mock_price_hub.schedule_today = []
     mock_price_hub.schedule_tomorrow = []
+    mock_price_hub.current_slot.return_value = None
     mock_price_hub.selfuse_today_max = 2.5
     mock_price_hub.sell_today_max = 3.0
     mock_price_hub.selfuse_tomorrow_max = None
     mock_price_hub.sell_tomorrow_max = None
     
-    hass.data = {"gridenforcer": {"price_hub": mock_price_hub}}
+    hass.data = {"gridenforcer": {"test_entry_id": mock_price_hub}}
     
     # Create sensor
     sensor = InverterModeSensor(
@@ -204,15 +205,16 @@ async def test_integration_platforms(hass, config_entry):
     from custom_components.gridenforcer import async_setup_entry, PLATFORMS
     
     # Mock the platform setup functions
-    with patch('custom_components.gridenforcer.PriceCalculator') as mock_price_calc:
+    with patch('custom_components.gridenforcer.pricecalculator.PriceCalculator') as mock_price_calc:
         mock_price_calc.return_value.async_update_price_calculator = AsyncMock()
+        mock_price_calc.return_value.async_restore_snapshot = AsyncMock()
         
         # Mock config_entries.async_forward_entry_setups
         hass.config_entries.async_forward_entry_setups = AsyncMock(return_value=True)
         
         # Mock the tracking functions
-        with patch('custom_components.gridenforcer.async_track_time_change') as mock_track_time, \
-             patch('custom_components.gridenforcer.async_track_state_change_event') as mock_track_state:
+        with patch('homeassistant.helpers.event.async_track_time_change') as mock_track_time, \
+             patch('homeassistant.helpers.event.async_track_state_change_event') as mock_track_state:
             
             result = await async_setup_entry(hass, config_entry)
             
@@ -0,0 +1,82 @@
+"""Test the DST aware day calendar."""
+from datetime import date, datetime, timedelta, timezone
+import zoneinfo
+
+import numpy as np
+import pytest
+
+STOCKHOLM = zoneinfo.ZoneInfo("Europe/Stockholm")
+
+
+@pytest.mark.parametrize(
+    "day, slots",
+    [(date(2024, 3, 31), 23), (date(2024, 10, 27), 25), (date(2024, 6, 1), 24)],
+)
+def test_day_lengths(day, slots):
+    """Test slot counts on DST transition days."""
+    from custom_components.gridenforcer.daycalendar import day_calendar
+
+    calendar = day_calendar(STOCKHOLM, day)
+
+    assert calendar.slots == slots
+    assert calendar.start_datetime(0) == datetime(
+        day.year, day.month, day.day, tzinfo=STOCKHOLM
+    )
+    assert calendar.slot_of(calendar.end) is None
+    assert calendar.slot_of(calendar.end - 1) == slots - 1
+    assert day_calendar(STOCKHOLM, day) is calendar
+
+
+def test_day_slices_across_dst():
+    """Test that a 23 hour day followed by a normal day is split at midnight."""
+    from custom_components.gridenforcer.daycalendar import day_slices
+
+    start = datetime(2024, 3, 31, tzinfo=STOCKHOLM).timestamp()
+    starts = np.arange(start, start + 47 * 3600, 3600, dtype=np.int64)
+
+    slices = day_slices(starts, STOCKHOLM)
+
+    assert [(s.start, s.stop) for s in slices] == [(0, 23), (23, 47)]
+    assert day_slices(starts[:0], STOCKHOLM) == []
+
+
+def test_slot_index():
+    """Test slot lookup by epoch with a gap between slots."""
+    from custom_components.gridenforcer.daycalendar import slot_index
+
+    starts = np.array([0, 3600, 10800])
+    ends = starts + 3600
+
+    assert slot_index(starts, ends, 3599) == 0
+    assert slot_index(starts, ends, 3600) == 1
+    assert slot_index(starts, ends, 7200) is None
+    assert slot_index(starts, ends, -1) is None
+    assert slot_index(starts, ends, 14400) is None
+
+
+def test_plan_dst_day_splits_at_local_midnight():
+    """Test that a 23 hour day plus the next day is planned as two days."""
+    from custom_components.gridenforcer.planner import (
+        PlanParameters,
+        build_timevalues,
+        get_schedule,
+    )
+
+    base = datetime(2024, 3, 31, tzinfo=STOCKHOLM).astimezone(timezone.utc)
+    entries = [
+        {
+            "start": (base + timedelta(hours=i)).astimezone(STOCKHOLM).isoformat(),
+            "end": (base + timedelta(hours=i + 1)).astimezone(STOCKHOLM).isoformat(),
+            "value": 1.0 + (i % 23) / 10,
+        }
+        for i in range(47)
+    ]
+    params = PlanParameters(vat=25.0, extra_import=0.1, extra_export=0.05, bat_cost=0)
+
+    prices = build_timevalues(entries, params)
+    result = get_schedule(prices, 2, 0.0)
+
+    assert prices[0].start.tzinfo == STOCKHOLM
+    assert len(result.schedule) == 47
+    # Thresholds come from the second day, hours 23-46 of the input
+    assert result.sell_max == max(tv.sell_value for tv in prices[23:])
@@ -0,0 +1,46 @@
+"""Test the FCR-D override and its latency statistics."""
+
+
+def test_override_restores_previous_mode():
+    """Test that the mode before the first activation is restored."""
+    from custom_components.gridenforcer.fcrd import FcrdOverride
+    from custom_components.gridenforcer.invertermode import InverterMode
+
+    override = FcrdOverride()
+    assert override.set(True, False, InverterMode.SELFUSE) is None
+    assert override.set(True, True, InverterMode.SELFUSE) == InverterMode.FCRDU
+    assert override.set(True, True, InverterMode.FCRDU) is None
+    assert override.set(False, True, InverterMode.FCRDU) == InverterMode.FCRDD
+    assert override.set(False, False, InverterMode.FCRDD) == InverterMode.FCRDU
+    assert override.set(True, False, InverterMode.FCRDU) == InverterMode.SELFUSE
+    assert not override.active
+
+
+def test_override_defers_requested_modes():
+    """Test that modes requested during FCR-D replace the mode to restore."""
+    from custom_components.gridenforcer.fcrd import FcrdOverride
+    from custom_components.gridenforcer.invertermode import InverterMode
+
+    override = FcrdOverride()
+    assert not override.defer(InverterMode.CHARGING)
+    override.set(False, True, InverterMode.STANDBY)
+    assert override.defer(InverterMode.CHARGING)
+    assert override.mode == InverterMode.FCRDD
+    assert override.set(False, False, InverterMode.FCRDD) == InverterMode.CHARGING
+
+
+def test_latency_stats():
+    """Test the percentiles and the count over the target."""
+    from custom_components.gridenforcer.fcrd import LatencyStats
+
+    stats = LatencyStats(target_ms=50.0, window=4)
+    assert stats.to_dict()["p95_ms"] is None
+    for latency in (10.0, 20.0, 30.0, 40.0, 80.0):
+        stats.record(latency)
+
+    result = stats.to_dict()
+    assert result["count"] == 5
+    assert result["over_target"] == 1
+    assert result["last_ms"] == 80.0
+    assert result["max_ms"] == 80.0
+    assert result["p50_ms"] == 35.0
@@ -15,8 +15,9 @@ def test_integration_setup():
 async def test_async_setup_entry(hass, config_entry):
     """Test async setup entry."""
     # Mock the PriceCalculator to avoid dependencies
-    with patch('custom_components.gridenforcer.PriceCalculator') as mock_price_calc:
+    with patch('custom_components.gridenforcer.pricecalculator.PriceCalculator') as mock_price_calc:
         mock_price_calc.return_value.async_update_price_calculator = AsyncMock()
+        mock_price_calc.return_value.async_restore_snapshot = AsyncMock()
         
         # Import and test the actual gridenforcer integration
         from custom_components.gridenforcer import async_setup_entry
@@ -137,4 +138,38 @@ async def test_config_flow_basic():
     # Test that ConfigFlow can be instantiated
     flow = ConfigFlow()
     assert flow.VERSION == 1
-    assert hasattr(flow, 'async_step_user')
\ No newline at end of file
+    assert hasattr(flow, 'async_step_user')
+
+@pytest.mark.asyncio
+async def test_multiple_entries_share_price_cache(hass, config_entry):
+    """Test that each entry gets its own hub and shares the price cache."""
+    from custom_components.gridenforcer import async_setup_entry, async_unload_entry
+    from custom_components.gridenforcer.const import DATA_PRICE_CACHE
+    from custom_components.gridenforcer.pricecache import price_cache_key
+
+    second_entry = MagicMock()
+    second_entry.data = dict(config_entry.data)
+    second_entry.entry_id = "second_entry_id"
+
+    with patch(
+        'custom_components.gridenforcer.pricecalculator.PriceCalculator'
+    ) as mock_price_calc, patch(
+        'homeassistant.helpers.event.async_track_time_change'
+    ), patch('homeassistant.helpers.event.async_track_state_change_event'):
+        mock_price_calc.side_effect = lambda *args: MagicMock(
+            async_restore_snapshot=AsyncMock(),
+            async_update_price_calculator=AsyncMock(),
+        )
+        assert await async_setup_entry(hass, config_entry) is True
+        assert await async_setup_entry(hass, second_entry) is True
+
+    hubs = hass.data["gridenforcer"]
+    assert set(hubs) == {"test_entry_id", "second_entry_id"}
+    assert hubs["test_entry_id"] is not hubs["second_entry_id"]
+    price_cache = hass.data[DATA_PRICE_CACHE]
+    key = price_cache_key("sensor.electricity_price", "auto")
+    assert price_cache.refcount(key) == 2
+
+    assert await async_unload_entry(hass, second_entry) is True
+    assert set(hass.data["gridenforcer"]) == {"test_entry_id"}
+    assert price_cache.refcount(key) == 1
@@ -0,0 +1,106 @@
+"""Test the batched Modbus reads against a local pymodbus server."""
+
+import asyncio
+import socket
+
+import pytest
+
+pytest.importorskip("pymodbus")
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _serve(holding, inputs):
+    from pymodbus.datastore import (
+        ModbusDeviceContext,
+        ModbusSequentialDataBlock,
+        ModbusServerContext,
+    )
+    from pymodbus.server import ModbusTcpServer
+
+    # Data blocks start at 1, the device context adds one to every address
+    device = ModbusDeviceContext(
+        hr=ModbusSequentialDataBlock(1, holding),
+        ir=ModbusSequentialDataBlock(1, inputs),
+    )
+    port = _free_port()
+    server = ModbusTcpServer(
+        ModbusServerContext(devices=device, single=True), address=("127.0.0.1", port)
+    )
+    task = asyncio.create_task(server.serve_forever())
+    await asyncio.sleep(0.2)
+    return server, task, port
+
+
+@pytest.mark.asyncio
+async def test_read_solax_blocks():
+    """Test that every register is read with one request per block."""
+    from custom_components.gridenforcer.modbus import ModbusReader
+    from custom_components.gridenforcer.registers import SOLAX_REGISTERS, plan_blocks
+
+    holding = [0] * 250
+    holding[0:2] = [0x4831, 0x3233]
+    holding[139] = 3
+    inputs = [0] * 250
+    inputs[22] = 0xFC18
+    inputs[28] = 64
+    inputs[29:31] = [0x0010, 0x0001]
+    server, task, port = await _serve(holding, inputs)
+    reader = ModbusReader("127.0.0.1", port)
+    try:
+        blocks = plan_blocks(SOLAX_REGISTERS)
+        values = await reader.read(blocks)
+    finally:
+        reader.close()
+        await server.shutdown()
+        task.cancel()
+
+    assert reader.requests == len(blocks)
+    assert set(values) == {register.key for register in SOLAX_REGISTERS}
+    assert values["inverter_sn"] == "H123"
+    assert values["inverter_mode_value"] == 3
+    assert values["battery_power"] == -1000
+    assert values["battery_soc"] == 64
+    assert values["battery_output_energy_total"] == round(0x10010 * 0.1, 1)
+
+
+@pytest.mark.asyncio
+async def test_write_registers_in_one_request():
+    """Test that contiguous registers are written with a single request."""
+    from custom_components.gridenforcer.modbus import ModbusReader
+    from custom_components.gridenforcer.registers import HOLDING, Block, Register
+
+    server, task, port = await _serve([0] * 64, [0] * 64)
+    reader = ModbusReader("127.0.0.1", port)
+    try:
+        await reader.write_registers(31, [3, 1])
+        values = await reader.read_block(
+            Block(
+                HOLDING, [Register("use", HOLDING, 31), Register("manual", HOLDING, 32)]
+            )
+        )
+    finally:
+        reader.close()
+        await server.shutdown()
+        task.cancel()
+
+    assert values == {"use": 3, "manual": 1}
+    assert reader.requests == 2
+
+
+def test_unit_keyword_of_older_pymodbus():
+    """Test that the unit id keyword follows the installed pymodbus."""
+    from custom_components.gridenforcer.modbus import unit_keyword
+
+    async def before_3_10(address, count=1, slave=1, no_response_expected=False):
+        """read_holding_registers of pymodbus 3.7."""
+
+    async def since_3_10(address, *, count=1, device_id=1, no_response_expected=False):
+        """read_holding_registers of pymodbus 3.10."""
+
+    assert unit_keyword(before_3_10) == "slave"
+    assert unit_keyword(since_3_10) == "device_id"
@@ -0,0 +1,130 @@
+"""Test the model predictive re-planning."""
+import time
+
+import numpy as np
+import pytest
+
+PRICE_VALUES = [
+    0.8, 0.7, 0.6, 0.9, 1.0, 1.2, 1.5, 2.0, 2.2, 2.5, 2.3, 2.1,
+    1.8, 1.6, 1.4, 1.7, 1.9, 2.4, 2.6, 2.2, 1.9, 1.5, 1.2, 1.0,
+]
+START = 1704063600
+HOUR = 3600
+
+
+@pytest.fixture
+def horizon():
+    prices = np.array(PRICE_VALUES * 2)
+    starts = START + HOUR * np.arange(len(prices), dtype=np.int64)
+    return starts, prices * 1.25 + 0.15, prices + 0.05
+
+
+def test_plan_respects_soc_limits(horizon):
+    """Test that the projection stays between soc_backup and soc_max."""
+    from custom_components.gridenforcer.mpc import MpcController
+
+    controller = MpcController()
+    controller.solve(*horizon, HOUR, 20.0, 80.0, 0.02)
+
+    plan = controller.plan(START, 50.0)
+
+    assert len(plan.modes) == 48
+    assert len(plan.soc) == 49
+    assert plan.soc.min() >= 20.0
+    assert plan.soc.max() <= 80.0
+    # Cheap night hours charge, the morning peak uses the battery
+    assert "Charge" in plan.modes[:4]
+    assert "Selfuse" in plan.modes[7:11]
+
+
+def test_low_soc_only_charges_back():
+    """Test that a SoC below soc_backup is not discharged further."""
+    from custom_components.gridenforcer.mpc import MpcController
+
+    prices = np.full(4, 2.0)
+    starts = START + HOUR * np.arange(4, dtype=np.int64)
+    controller = MpcController()
+    controller.solve(starts, prices, prices, HOUR, 20.0, 80.0, 0.02)
+
+    plan = controller.plan(START, 10.0)
+
+    assert plan.soc.min() == 10.0
+    assert "Sell" not in plan.modes
+    assert "Selfuse" not in plan.modes
+
+
+def test_warm_start_reuses_solution(horizon):
+    """Test that unchanged prices and limits only roll the policy forward."""
+    from custom_components.gridenforcer.mpc import MpcController
+
+    controller = MpcController()
+    assert controller.solve(*horizon, HOUR, 20.0, 80.0, 0.02)
+    assert not controller.solve(*horizon, HOUR, 20.0, 80.0, 0.02)
+    assert controller.solves == 1
+    assert controller.reuses == 1
+
+    first = controller.plan(START + 5 * HOUR, 80.0)
+    later = controller.plan(START + 5 * HOUR + 60, 30.0)
+    assert first.starts[0] == later.starts[0] == START + 5 * HOUR
+    assert first.modes != later.modes
+
+    assert controller.solve(*horizon, HOUR, 30.0, 80.0, 0.02)
+    assert controller.solves == 2
+
+
+def test_solve_and_replan_are_fast(horizon):
+    """Test a cold solve of 96 quarter hours and the re-plan against 10 ms."""
+    from custom_components.gridenforcer.mpc import MpcController
+
+    starts, buy, sell = horizon
+    quarter_starts = START + 900 * np.arange(len(starts) * 4, dtype=np.int64)
+    controller = MpcController()
+    # Warm up numpy
+    controller.solve(starts[:2], buy[:2], sell[:2], HOUR, 20.0, 80.0, 0.02)
+
+    start_time = time.perf_counter()
+    controller.solve(
+        quarter_starts, np.repeat(buy, 4), np.repeat(sell, 4), 900, 20.0, 80.0, 0.02
+    )
+    solve_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for minute in range(0, 24 * 60, 5):
+        controller.plan(START + minute * 60, 50.0)
+    replan_time = (time.perf_counter() - start_time) / (24 * 12)
+
+    print(f"Solve: {solve_time * 1000:.2f}ms, re-plan: {replan_time * 1e6:.0f}us")
+    assert solve_time < 0.05
+    assert replan_time < 0.01
+
+
+def test_projected_soc_interpolates(horizon):
+    """Test the projection inside a slot and outside the horizon."""
+    from custom_components.gridenforcer.mpc import MpcController
+
+    controller = MpcController()
+    controller.solve(*horizon, HOUR, 20.0, 80.0, 0.02)
+    plan = controller.plan(START, 20.0)
+
+    middle = plan.projected_soc(START + HOUR / 2, HOUR)
+
+    assert middle == pytest.approx((plan.soc[0] + plan.soc[1]) / 2)
+    assert plan.projected_soc(START - 1, HOUR) is None
+    assert controller.plan(START + 48 * HOUR, 50.0) is None
+
+
+def test_model_from_battery_spec_matches_simulation(horizon):
+    """Test that plans with the configured battery project as feasible."""
+    from custom_components.gridenforcer.mpc import MpcController, battery_model
+    from custom_components.gridenforcer.simulate import BatterySpec, simulate
+
+    spec = BatterySpec()
+    controller = MpcController(battery_model(spec))
+    controller.solve(*horizon, HOUR, spec.soc_min, spec.soc_max, 0.02)
+    plan = controller.plan(START, 50.0)
+
+    projection = simulate(plan.modes, HOUR, 50.0, spec)
+
+    assert projection.feasible
+    # The MPC moves the SoC in whole percent, the rounding adds up a little
+    assert np.abs(projection.soc - plan.soc).max() < 3.0
@@ -0,0 +1,142 @@
+"""Test the adaptive peak detection."""
+import zoneinfo
+from datetime import datetime, timedelta
+
+import numpy as np
+
+PRICE_VALUES = [
+    0.8, 0.7, 0.6, 0.9, 1.0, 1.2, 1.5, 2.0, 2.2, 2.5, 2.3, 2.1,
+    1.8, 1.6, 1.4, 1.7, 1.9, 2.4, 2.6, 2.2, 1.9, 1.5, 1.2, 1.0,
+]
+
+
+def _timevalues(values):
+    from custom_components.gridenforcer.timevalue import TimeValue
+
+    base = datetime(2024, 1, 1, tzinfo=zoneinfo.ZoneInfo("Europe/Stockholm"))
+    return [
+        TimeValue(base + timedelta(hours=i), base + timedelta(hours=i + 1), v, v)
+        for i, v in enumerate(values)
+    ]
+
+
+def test_turning_points():
+    """Test that plateaus turn at their first slot and both ends are kept."""
+    from custom_components.gridenforcer.peaks import turning_points
+
+    points = turning_points(np.array([1.0, 3.0, 3.0, 1.0, 2.0, 2.0, 5.0]))
+
+    assert points.tolist() == [0, 1, 3, 6]
+    assert turning_points(np.ones(5)).tolist() == [0, 4]
+
+
+def test_two_cycle_day():
+    """Test that the morning and evening peaks are found."""
+    from custom_components.gridenforcer.peaks import find_peak_indices
+
+    minima, maxima = find_peak_indices(np.array(PRICE_VALUES), 0.02)
+
+    assert minima.tolist() == [2, 14]
+    assert maxima.tolist() == [9, 18]
+
+
+def test_cheap_day_still_finds_peaks():
+    """Test that a small spread above the battery cost is found."""
+    from custom_components.gridenforcer.peaks import find_peak_indices
+    from custom_components.gridenforcer.planner import find_min_max
+
+    values = np.array(PRICE_VALUES) * 0.03
+    prices = _timevalues(values.tolist())
+
+    minima, maxima = find_peak_indices(values, 0.01)
+    delta_minima, delta_maxima = find_min_max(prices, 0.1)
+
+    assert maxima.tolist() == [9, 18]
+    assert not len(delta_maxima)
+
+
+def test_volatile_day_ignores_small_wiggles():
+    """Test that the threshold grows with the price range of the day."""
+    from custom_components.gridenforcer.peaks import find_peak_indices
+
+    wiggle = np.tile([0.0, 0.15], 12)
+    values = np.array(PRICE_VALUES) * 4 + wiggle
+
+    minima, maxima = find_peak_indices(values, 0.02)
+
+    assert len(minima) == 2
+    assert len(maxima) == 2
+
+
+def test_close_extremes_are_merged():
+    """Test that peaks closer than distance keep the higher one."""
+    from custom_components.gridenforcer.peaks import find_peak_indices
+
+    values = np.array([1.0, 3.0, 1.0, 3.5, 1.0, 1.0, 1.0])
+
+    assert find_peak_indices(values, 0.1, distance=1)[1].tolist() == [1, 3]
+    minima, maxima = find_peak_indices(values, 0.1, distance=3)
+    assert maxima.tolist() == [3]
+    assert minima.tolist() == [0]
+
+
+def test_flat_day_has_lowest_valley():
+    """Test that like find_min_max the lowest price is always a valley."""
+    from custom_components.gridenforcer.peaks import find_peak_indices
+
+    minima, maxima = find_peak_indices(np.full(24, 1.0), 0.02)
+
+    assert minima.tolist() == [0]
+    assert not len(maxima)
+
+
+def test_filter_min_max_takes_indices():
+    """Test that both detectors give index arrays filtered on the prices."""
+    from custom_components.gridenforcer.peaks import find_peak_indices
+    from custom_components.gridenforcer.planner import filter_min_max, find_min_max
+
+    values = np.array(PRICE_VALUES)
+    minima, maxima = find_peak_indices(values, 0.02)
+    delta_minima, delta_maxima = find_min_max(_timevalues(PRICE_VALUES), 0.1)
+
+    valid = filter_min_max(minima, maxima, 0.02, values, values)
+
+    assert valid == [(2, "min"), (9, "max"), (14, "min"), (18, "max")]
+    assert filter_min_max(delta_minima, delta_maxima, 0.02, values, values) == valid
+    # The evening spread is below the battery cost
+    assert filter_min_max(minima, maxima, 1.5, values, values) == [
+        (2, "min"),
+        (9, "max"),
+    ]
+
+
+def test_pipeline_prominence_depends_on_bat_cost():
+    """Test that prominence peaks rerun on bat_cost and ignore delta."""
+    from custom_components.gridenforcer.pipeline import PlanPipeline
+    from custom_components.gridenforcer.planner import (
+        PlanParameters,
+        get_schedule,
+        timevalues_from_series,
+        transform_series,
+    )
+    from custom_components.gridenforcer.priceseries import PriceSeries
+
+    params = PlanParameters(25.0, 0.15, 0.05, 0.02, 3, 2, peaks="prominence")
+    series = PriceSeries.from_uniform(
+        1704063600, 3600, PRICE_VALUES, zoneinfo.ZoneInfo("Europe/Stockholm")
+    )
+    priced = transform_series(series, params)
+    pipeline = PlanPipeline()
+
+    result = pipeline.run(priced, params)
+    expected = get_schedule(
+        timevalues_from_series(priced), 3, 0.02, 2, peaks="prominence"
+    )
+    assert [tv.mode for tv in result.schedule] == [
+        tv.mode for tv in expected.schedule
+    ]
+
+    pipeline.run(priced, params._replace(delta=0.3))
+    assert pipeline.last_computed == []
+    pipeline.run(priced, params._replace(bat_cost=0.5))
+    assert pipeline.last_computed[0] == "peaks"
@@ -0,0 +1,103 @@
+"""Test the cached planning stages."""
+import zoneinfo
+
+import pytest
+
+PRICE_VALUES = [
+    0.8, 0.7, 0.6, 0.9, 1.0, 1.2, 1.5, 2.0, 2.2, 2.5, 2.3, 2.1,
+    1.8, 1.6, 1.4, 1.7, 1.9, 2.4, 2.6, 2.2, 1.9, 1.5, 1.2, 1.0,
+]
+
+
+@pytest.fixture
+def priced():
+    from custom_components.gridenforcer.planner import PlanParameters, transform_series
+    from custom_components.gridenforcer.priceseries import PriceSeries
+
+    series = PriceSeries.from_uniform(
+        1704063600, 3600, PRICE_VALUES, zoneinfo.ZoneInfo("Europe/Stockholm")
+    )
+    return transform_series(series, PlanParameters(25.0, 0.15, 0.05, 0.02))
+
+
+def _params(**kwargs):
+    from custom_components.gridenforcer.planner import PlanParameters
+
+    return PlanParameters(25.0, 0.15, 0.05, 0.02)._replace(**kwargs)
+
+
+def _modes(result):
+    return [tv.mode for tv in result.schedule]
+
+
+def test_pipeline_matches_get_schedule(priced):
+    """Test that the staged plan equals a full planner run."""
+    from custom_components.gridenforcer import planner
+    from custom_components.gridenforcer.pipeline import PlanPipeline
+
+    params = _params(selfuse_hours=3, charge_hours=2)
+    expected = planner.get_schedule(
+        planner.timevalues_from_series(priced), 3, params.bat_cost, 2
+    )
+
+    result = PlanPipeline().run(priced, params)
+
+    assert _modes(result) == _modes(expected)
+    assert result.sell_max == expected.sell_max
+    assert result.selfuse_max == expected.selfuse_max
+
+
+def test_parameter_change_reuses_upstream_stages(priced):
+    """Test that a new selfuse_hours only reruns the schedule stage."""
+    from custom_components.gridenforcer import planner
+    from custom_components.gridenforcer.pipeline import PlanPipeline
+
+    pipeline = PlanPipeline()
+    pipeline.run(priced, _params(selfuse_hours=2))
+    assert pipeline.last_computed == ["prices", "peaks", "validpeaks", "schedule"]
+
+    result = pipeline.run(priced, _params(selfuse_hours=4))
+    assert pipeline.last_computed == ["schedule"]
+    assert pipeline.reused["peaks"] == 1
+    expected = planner.get_schedule(
+        planner.timevalues_from_series(priced), 4, 0.02, None
+    )
+    assert _modes(result) == _modes(expected)
+
+    pipeline.run(priced, _params(selfuse_hours=4))
+    assert pipeline.last_computed == []
+
+    pipeline.run(priced, _params(selfuse_hours=4, bat_cost=0.5))
+    assert pipeline.last_computed == ["validpeaks", "schedule"]
+
+
+def test_new_prices_recompute_all(priced):
+    """Test that new price data reruns every stage."""
+    from custom_components.gridenforcer.pipeline import PlanPipeline
+    from custom_components.gridenforcer.planner import transform_series
+
+    pipeline = PlanPipeline()
+    pipeline.run(priced, _params())
+    other = transform_series(priced.series, _params(vat=0.0))
+
+    pipeline.run(other, _params())
+
+    assert pipeline.last_computed == ["prices", "peaks", "validpeaks", "schedule"]
+    assert pipeline.metrics["computed"]["prices"] == 2
+
+
+def test_quarter_hour_slots_plan_hours(priced):
+    """Test that selfuse and charge hours are hours at 15 minute slots."""
+    from custom_components.gridenforcer.pipeline import PlanPipeline
+    from custom_components.gridenforcer.planner import transform_series
+    from custom_components.gridenforcer.resample import resample
+
+    params = _params(selfuse_hours=4, charge_hours=3)
+    quarter = transform_series(resample(priced.series, 900), params)
+
+    hourly = _modes(PlanPipeline().run(priced, params))
+    modes = _modes(PlanPipeline().run(quarter, params))
+
+    assert modes.count("Charge") / 4 == hourly.count("Charge")
+    used = [mode in ("Selfuse", "Sell") for mode in modes]
+    assert abs(sum(used) / 4 - (hourly.count("Selfuse") + hourly.count("Sell"))) < 1
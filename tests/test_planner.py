@@ -0,0 +1,120 @@
+"""Test the Home Assistant independent planner and batch CLI."""
+import io
+import json
+from datetime import datetime, timedelta
+import zoneinfo
+
+import pytest
+
+PRICE_VALUES = [
+    0.8, 0.7, 0.6, 0.9, 1.0, 1.2, 1.5, 2.0, 2.2, 2.5, 2.3, 2.1,
+    1.8, 1.6, 1.4, 1.7, 1.9, 2.4, 2.6, 2.2, 1.9, 1.5, 1.2, 1.0,
+]
+
+
+def _entries(day=1, scale=1.0):
+    base = datetime(2024, 1, day, tzinfo=zoneinfo.ZoneInfo("Europe/Stockholm"))
+    return [
+        {
+            "start": (base + timedelta(hours=i)).isoformat(),
+            "end": (base + timedelta(hours=i + 1)).isoformat(),
+            "value": value * scale,
+        }
+        for i, value in enumerate(PRICE_VALUES)
+    ]
+
+
+@pytest.fixture
+def params():
+    from custom_components.gridenforcer.planner import PlanParameters
+
+    return PlanParameters(
+        vat=25.0,
+        extra_import=0.15,
+        extra_export=0.05,
+        bat_cost=0.02,
+        selfuse_hours=4,
+        charge_hours=2,
+    )
+
+
+def test_price_transforms():
+    """Test buy and sell price without a PriceCalculator."""
+    from custom_components.gridenforcer.planner import calc_buy_price, calc_sell_price
+
+    assert calc_buy_price(1.0, 25.0, 0.15) == 1.4
+    assert calc_sell_price(1.0, 0.05) == 1.05
+
+
+def test_plan_day(params):
+    """Test planning one day from raw price entries."""
+    from custom_components.gridenforcer.planner import plan_day
+
+    result = plan_day(_entries(), params)
+
+    assert len(result.schedule) == 24
+    modes = [tv.mode for tv in result.schedule]
+    assert modes.count("Charge") >= 2
+    assert "Sell" in modes or "Selfuse" in modes
+    assert result.sell_max == round(2.6 + 0.05, 3)
+    starts = [tv.start for tv in result.schedule]
+    assert starts == sorted(starts)
+
+
+def test_plan_day_empty(params):
+    """Test that an empty price day gives an empty schedule."""
+    from custom_components.gridenforcer.planner import plan_day
+
+    result = plan_day([], params)
+
+    assert result.schedule == []
+    assert result.sell_max is None
+
+
+def test_parse_line_formats():
+    """Test the accepted JSON lines input shapes."""
+    from custom_components.gridenforcer.plan import parse_line
+
+    entries = _entries()
+    assert parse_line(json.dumps(entries)) == ({}, entries)
+    assert parse_line(json.dumps({"id": 7, "prices": entries})) == ({"id": 7}, entries)
+    assert parse_line(json.dumps({"raw_today": entries})) == ({}, entries)
+    with pytest.raises(ValueError):
+        parse_line(json.dumps({"id": 7}))
+
+
+def test_cli_parallel_matches_serial(params):
+    """Test that worker processes give the same output in input order."""
+    from custom_components.gridenforcer.plan import run
+
+    lines = [
+        json.dumps({"id": day, "prices": _entries(day, 1 + day / 10)})
+        for day in range(1, 9)
+    ]
+    serial = io.StringIO()
+    parallel = io.StringIO()
+
+    assert run(lines, params, serial) == 8
+    assert run(lines, params, parallel, workers=2, batch_size=3) == 8
+
+    assert serial.getvalue() == parallel.getvalue()
+    ids = [json.loads(line)["id"] for line in serial.getvalue().splitlines()]
+    assert ids == list(range(1, 9))
+
+
+def test_charge_hours_after_last_use_slot():
+    """Test that charge hours after the last use slot extend to the end."""
+    from datetime import timezone
+
+    from custom_components.gridenforcer.planner import get_schedule
+    from custom_components.gridenforcer.timevalue import TimeValue
+
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    prices = [
+        TimeValue(base + timedelta(hours=i), base + timedelta(hours=i + 1), v, v * 0.9)
+        for i, v in enumerate([4, 1, 1, 2, 2, 1])
+    ]
+
+    result = get_schedule(prices, 1, 0.05, 2)
+
+    assert [tv.mode for tv in result.schedule].count("Charge") == 2
@@ -0,0 +1,79 @@
+"""Test the adaptive polling of register blocks."""
+
+
+def _blocks():
+    from custom_components.gridenforcer.registers import SOLAX_REGISTERS, plan_blocks
+
+    return plan_blocks(SOLAX_REGISTERS)
+
+
+def _index(blocks, table, address):
+    return next(
+        i for i, b in enumerate(blocks) if b.table == table and b.address == address
+    )
+
+
+def test_bounds_follow_consumers():
+    """Test that FCR-D blocks stay fast and static blocks slow."""
+    from custom_components.gridenforcer.polling import block_bounds
+
+    blocks = _blocks()
+    serial = blocks[_index(blocks, "holding", 0)]
+    battery = blocks[_index(blocks, "input", 3)]
+
+    assert block_bounds(serial) == (300.0, 3600.0)
+    assert block_bounds(battery) == (1.0, 2.0)
+
+
+def test_unchanged_blocks_slow_down():
+    """Test that intervals grow on unchanged reads and shrink on changes."""
+    from custom_components.gridenforcer.polling import AdaptivePoller
+
+    blocks = _blocks()
+    poller = AdaptivePoller(blocks)
+    energy = _index(blocks, "input", 148)
+    now = 0.0
+    assert energy in poller.due(now)
+
+    for _ in range(20):
+        poller.record(energy, now, {"solar_energy_total": 1.0}, 0.01)
+        now += 1000
+    metrics = poller.metrics(now)["blocks"][energy]
+    assert metrics["interval"] == 300.0
+    assert metrics["class"] == "static"
+
+    poller.record(energy, now, {"solar_energy_total": 2.0}, 0.01)
+    assert poller.metrics(now)["blocks"][energy]["interval"] == 150.0
+    assert energy not in poller.due(now + 100)
+    assert energy in poller.due(now + 150)
+
+
+def test_fixed_intervals_without_adapt():
+    """Test that the scan intervals are kept when adapting is off."""
+    from custom_components.gridenforcer.polling import AdaptivePoller
+
+    blocks = _blocks()
+    poller = AdaptivePoller(blocks, adapt=False)
+    serial = _index(blocks, "holding", 0)
+    for now in (0.0, 200.0, 400.0):
+        poller.record(serial, now, {"inverter_sn": "H1"}, 0.01)
+
+    assert poller.metrics(400.0)["blocks"][serial]["interval"] == 120.0
+    assert poller.tick == 1.0
+
+
+def test_utilization_over_window():
+    """Test the bus time share over the last minute."""
+    from custom_components.gridenforcer.polling import AdaptivePoller
+
+    blocks = _blocks()
+    poller = AdaptivePoller(blocks)
+    battery = _index(blocks, "input", 3)
+    for second in range(120):
+        poller.record(battery, float(second), {"battery_power": second}, 0.03)
+
+    metrics = poller.metrics(119.0)
+    assert metrics["reads_per_minute"] == 61.0
+    assert 3.0 <= metrics["utilization"] <= 3.1
+    assert metrics["blocks"][battery]["class"] == "fast"
+    assert metrics["blocks"][battery]["interval"] == 1.0
@@ -0,0 +1,133 @@
+"""Test the price series cache shared between config entries."""
+from datetime import datetime, timedelta
+import zoneinfo
+
+import pytest
+
+
+def _loader(value=1.0, hours=24, tomorrow_hours=0):
+    from custom_components.gridenforcer.pricesource import (
+        DaySeries,
+        series_from_entries,
+    )
+
+    def _entries(first, count):
+        base = datetime(2024, 1, 1, tzinfo=zoneinfo.ZoneInfo("Europe/Stockholm"))
+        return [
+            {
+                "start": (base + timedelta(hours=i)).isoformat(),
+                "end": (base + timedelta(hours=i + 1)).isoformat(),
+                "value": first + i / 10,
+            }
+            for i in range(count)
+        ]
+
+    calls = []
+
+    def load():
+        calls.append(1)
+        return DaySeries(
+            series_from_entries(_entries(value, hours)),
+            series_from_entries(_entries(value, tomorrow_hours)),
+        )
+
+    load.calls = calls
+    return load
+
+
+def _params(vat=25.0, extra_import=0.15, extra_export=0.05):
+    from custom_components.gridenforcer.planner import PlanParameters
+
+    return PlanParameters(
+        vat=vat, extra_import=extra_import, extra_export=extra_export, bat_cost=0.02
+    )
+
+
+def test_shared_series_parsed_once():
+    """Test that entries with the same sensor and fees share one series."""
+    from custom_components.gridenforcer.pricecache import PriceSeriesCache
+
+    cache = PriceSeriesCache()
+    cache.acquire("sensor.nordpool")
+    cache.acquire("sensor.nordpool")
+    load = _loader()
+
+    first = cache.get("sensor.nordpool", "token1", load, _params())
+    second = cache.get("sensor.nordpool", "token1", load, _params())
+
+    assert first is second
+    assert len(load.calls) == 1
+    assert cache.parse_count == 1
+    assert cache.transform_count == 1
+    assert first.today.buy[0] == round(1.0 * 1.25 + 0.15, 3)
+    assert first.today.sell[0] == round(1.0 + 0.05, 3)
+
+
+def test_other_fees_reuse_parsed_series():
+    """Test that other fees only add a transform, not a parse."""
+    from custom_components.gridenforcer.pricecache import PriceSeriesCache
+
+    cache = PriceSeriesCache()
+    cache.acquire("sensor.nordpool")
+    load = _loader()
+
+    first = cache.get("sensor.nordpool", "token1", load, _params())
+    other = cache.get("sensor.nordpool", "token1", load, _params(vat=0.0))
+
+    assert cache.parse_count == 1
+    assert cache.transform_count == 2
+    assert other.today.buy[0] == round(1.0 + 0.15, 3)
+    # Both transforms share the normalized series buffers
+    assert other.today.series is first.today.series
+
+
+def test_new_token_and_invalidate_reparse():
+    """Test that new sensor data and invalidation parse again."""
+    from custom_components.gridenforcer.pricecache import PriceSeriesCache
+
+    cache = PriceSeriesCache()
+    cache.acquire("sensor.nordpool")
+
+    cache.get("sensor.nordpool", "token1", _loader(), _params())
+    updated = cache.get(
+        "sensor.nordpool", "token2", _loader(2.0, tomorrow_hours=24), _params()
+    )
+    assert cache.parse_count == 2
+    assert updated.today.sell[0] == round(2.0 + 0.05, 3)
+    assert len(updated.tomorrow.series) == 24
+
+    cache.invalidate("sensor.nordpool")
+    cache.get("sensor.nordpool", "token2", _loader(2.0), _params())
+    assert cache.parse_count == 3
+
+
+def test_refcount_release():
+    """Test that the series is dropped with its last user."""
+    from custom_components.gridenforcer.pricecache import PriceSeriesCache
+
+    cache = PriceSeriesCache()
+    cache.acquire("sensor.nordpool")
+    cache.acquire("sensor.nordpool")
+    cache.get("sensor.nordpool", "token1", _loader(), _params())
+
+    cache.release("sensor.nordpool")
+    assert cache.refcount("sensor.nordpool") == 1
+    cache.get("sensor.nordpool", "token1", _loader(), _params())
+    assert cache.parse_count == 1
+
+    cache.release("sensor.nordpool")
+    assert cache.refcount("sensor.nordpool") == 0
+    cache.get("sensor.nordpool", "token1", _loader(), _params())
+    assert cache.parse_count == 2
+
+
+def test_cache_key_includes_source():
+    """Test that one sensor read through different adapters is cached apart."""
+    from custom_components.gridenforcer.pricecache import price_cache_key
+
+    assert price_cache_key("sensor.nordpool", "auto") != price_cache_key(
+        "sensor.nordpool", "flat"
+    )
+    assert price_cache_key("sensor.x", "json_file", "/a.json") != price_cache_key(
+        "sensor.x", "json_file", "/b.json"
+    )
@@ -127,14 +127,16 @@ async def test_async_update_price_calculator(mock_hass_for_price_calc, price_cal
         "raw_today": [{"start": "2024-01-01T00:00:00+01:00", "end": "2024-01-01T01:00:00+01:00", "value": 1.0}],
         "raw_tomorrow": []
     }
+    # The fixture answers through side_effect, which wins over return_value
+    mock_hass_for_price_calc.states.get.side_effect = None
     mock_hass_for_price_calc.states.get.return_value = mock_price_state
         
     # Test that the method can be called without errors
-    with patch.object(calc, 'update_timevalues_from_dict', new_callable=AsyncMock) as mock_update:
+    with patch.object(calc, 'update_timevalues_from_state', new_callable=AsyncMock) as mock_update:
         await calc.async_update_price_calculator()
         
-        # Verify that update_timevalues_from_dict was called
-        assert mock_update.called, "update_timevalues_from_dict should have been called"
+        # Verify that update_timevalues_from_state was called
+        mock_update.assert_called_once_with(mock_price_state)
 
 
 def test_inverter_mode_enum_values():
@@ -179,4 +181,281 @@ def test_n_high_val_calculation(mock_hass_for_price_calc, price_calculator_confi
     
     # Test getting the highest price
     highest = calc.get_n_high_val(prices, 1)
-    assert highest == 5.0
\ No newline at end of file
+    assert highest == 5.0
+
+def _snapshot_schedule(base_time, hours):
+    from custom_components.gridenforcer.storage import timevalues_to_list
+    from custom_components.gridenforcer.timevalue import TimeValue
+    from datetime import timedelta
+
+    values = []
+    for i in range(hours):
+        tv = TimeValue(
+            start=base_time + timedelta(hours=i),
+            end=base_time + timedelta(hours=i + 1),
+            value=1.0 + i,
+            sell_value=0.9 + i,
+        )
+        tv.mode = "Charge" if i == 0 else "Standby"
+        values.append(tv)
+    return timevalues_to_list(values)
+
+
+def test_timevalue_dict_round_trip():
+    """Test that a stored TimeValue is restored with mode and timezone."""
+    from custom_components.gridenforcer.storage import (
+        timevalues_from_list,
+        timevalues_to_list,
+    )
+    from custom_components.gridenforcer.timevalue import TimeValue
+
+    start = datetime(2024, 3, 31, 1, 0, tzinfo=zoneinfo.ZoneInfo("Europe/Stockholm"))
+    end = datetime(2024, 3, 31, 3, 0, tzinfo=zoneinfo.ZoneInfo("Europe/Stockholm"))
+    tv = TimeValue(start=start, end=end, value=1.5, sell_value=1.2)
+    tv.mode = "Sell"
+
+    restored = timevalues_from_list(timevalues_to_list([tv]))[0]
+
+    assert restored.start == start
+    assert restored.end == end
+    assert restored.mode == "Sell"
+    assert restored.sell_value == 1.2
+
+
+@pytest.mark.asyncio
+async def test_snapshot_of_newer_version_dropped():
+    """Test that a snapshot written by a newer version is dropped, not fatal."""
+    from custom_components.gridenforcer.storage import STORAGE_VERSION, ScheduleStore
+
+    store = ScheduleStore(MagicMock(), "entry")
+    data = await store._async_migrate_func(STORAGE_VERSION + 1, 1, {"x": 1})
+
+    assert data == {}
+
+
+@pytest.mark.asyncio
+async def test_restore_snapshot_valid(mock_hass_for_price_calc, price_calculator_config):
+    """Test that a stored schedule covering now is reused at startup."""
+    from custom_components.gridenforcer.pricecalculator import PriceCalculator
+    from custom_components.gridenforcer.priceseries import PriceSeries
+
+    calc = PriceCalculator(mock_hass_for_price_calc, price_calculator_config)
+    now = datetime.now(zoneinfo.ZoneInfo("Europe/Stockholm"))
+    base_time = now.replace(minute=0, second=0, microsecond=0)
+    snapshot = calc._snapshot_data()
+    snapshot["hours_self_use"] = 3
+    snapshot["schedule_today"] = _snapshot_schedule(base_time, 4)
+    snapshot["sell_today_max"] = 2.5
+    snapshot["prices_today"] = PriceSeries.from_uniform(
+        base_time.timestamp(), 3600, [1.0, 2.0, 3.0, 4.0]
+    ).to_dict()
+    calc._store.async_load = AsyncMock(return_value=snapshot)
+
+    assert await calc.async_restore_snapshot() is True
+    assert len(calc.schedule_today) == 4
+    assert calc._prices.today.values.tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert len(calc._prices.tomorrow) == 0
+    assert calc.schedule_today[0].mode == "Charge"
+    assert calc.sell_today_max == 2.5
+    assert calc._hours_self_use == 3
+
+
+@pytest.mark.asyncio
+async def test_restore_snapshot_rolls_over_midnight(
+    mock_hass_for_price_calc, price_calculator_config
+):
+    """Test that the stored tomorrow schedule becomes today after midnight."""
+    from custom_components.gridenforcer.pricecalculator import PriceCalculator
+    from datetime import timedelta
+
+    calc = PriceCalculator(mock_hass_for_price_calc, price_calculator_config)
+    now = datetime.now(zoneinfo.ZoneInfo("Europe/Stockholm"))
+    base_time = now.replace(minute=0, second=0, microsecond=0)
+    snapshot = calc._snapshot_data()
+    snapshot["schedule_today"] = _snapshot_schedule(base_time - timedelta(hours=4), 2)
+    snapshot["schedule_tomorrow"] = _snapshot_schedule(base_time, 2)
+    snapshot["sell_tomorrow_max"] = 3.0
+    calc._store.async_load = AsyncMock(return_value=snapshot)
+
+    assert await calc.async_restore_snapshot() is True
+    assert calc.schedule_today[0].start == base_time
+    assert calc.schedule_tomorrow == []
+    assert calc.sell_today_max == 3.0
+
+
+@pytest.mark.asyncio
+async def test_restore_snapshot_ignores_stale_or_changed(
+    mock_hass_for_price_calc, price_calculator_config
+):
+    """Test that expired schedules and changed parameters are not reused."""
+    from custom_components.gridenforcer.pricecalculator import PriceCalculator
+    from datetime import timedelta
+
+    calc = PriceCalculator(mock_hass_for_price_calc, price_calculator_config)
+    now = datetime.now(zoneinfo.ZoneInfo("Europe/Stockholm"))
+    base_time = now.replace(minute=0, second=0, microsecond=0)
+
+    expired = calc._snapshot_data()
+    expired["schedule_today"] = _snapshot_schedule(base_time - timedelta(days=1), 2)
+    calc._store.async_load = AsyncMock(return_value=expired)
+    assert await calc.async_restore_snapshot() is False
+
+    changed = calc._snapshot_data()
+    changed["schedule_today"] = _snapshot_schedule(base_time, 2)
+    changed["parameters"]["bat_cost"] = 0.5
+    calc._store.async_load = AsyncMock(return_value=changed)
+    assert await calc.async_restore_snapshot() is False
+    assert calc.schedule_today == []
+
+
+@pytest.mark.asyncio
+async def test_set_parameter_replans_schedule_only(
+    mock_hass_for_price_calc, price_calculator_config
+):
+    """Test that a pushed selfuse_hours only reruns the schedule stage."""
+    from custom_components.gridenforcer.pricecalculator import PriceCalculator
+    from datetime import timedelta
+
+    calc = PriceCalculator(mock_hass_for_price_calc, price_calculator_config)
+    calc._store.async_delay_save = MagicMock()
+    base = datetime(2024, 1, 1, tzinfo=zoneinfo.ZoneInfo("Europe/Stockholm"))
+    entries = [
+        {
+            "start": base + timedelta(hours=i),
+            "end": base + timedelta(hours=i + 1),
+            "value": 1.0 + (i % 12) / 5,
+        }
+        for i in range(24)
+    ]
+    await calc.update_timevalues_from_dict(entries, [], "token")
+
+    await calc.async_set_parameter("selfuse_hours", 4.0)
+
+    assert calc._hours_self_use == 4
+    assert calc.stage_metrics["today"]["last_computed"] == ["schedule"]
+    assert len(calc.schedule_today) == 24
+
+
+@pytest.mark.asyncio
+async def test_scenario_plan_until_prices_land(
+    mock_hass_for_price_calc, price_calculator_config
+):
+    """Test that tomorrow is planned over scenarios until its prices arrive."""
+    from custom_components.gridenforcer.pricecalculator import PriceCalculator
+    from datetime import timedelta
+
+    async def run_job(func, *args):
+        return func(*args)
+
+    mock_hass_for_price_calc.async_add_executor_job = run_job
+    price_calculator_config.data["scenario_planning"] = "expected"
+    calc = PriceCalculator(mock_hass_for_price_calc, price_calculator_config)
+    calc._store.async_delay_save = MagicMock()
+    calc._hours_self_use = 3
+    calc._charge_hours = 2
+    base = datetime(2024, 1, 1, tzinfo=zoneinfo.ZoneInfo("Europe/Stockholm"))
+
+    def entries(day):
+        return [
+            {
+                "start": base + timedelta(days=day, hours=i),
+                "end": base + timedelta(days=day, hours=i + 1),
+                "value": 1.0 + (i % 12) / 5,
+            }
+            for i in range(24)
+        ]
+
+    await calc.update_timevalues_from_dict(entries(0), [], "today")
+
+    assert len(calc.schedule_tomorrow) == 24
+    assert calc.schedule_tomorrow[0].start == base + timedelta(days=1)
+    assert calc.scenario_plan["scenarios"] == 1
+
+    await calc.update_timevalues_from_dict(entries(0), entries(1), "published")
+
+    assert calc.scenario_plan is None
+    assert len(calc.schedule_tomorrow) == 24
+
+
+@pytest.mark.asyncio
+async def test_mpc_control_replans_from_soc(
+    mock_hass_for_price_calc, price_calculator_config
+):
+    """Test that the MPC rewrites the remaining slots from the measured SoC."""
+    from custom_components.gridenforcer.pricecalculator import PriceCalculator
+    from datetime import timedelta
+
+    async def run_job(func, *args):
+        return func(*args)
+
+    mock_hass_for_price_calc.async_add_executor_job = run_job
+    price_calculator_config.data["mpc"] = "control"
+    calc = PriceCalculator(mock_hass_for_price_calc, price_calculator_config)
+    calc._store.async_delay_save = MagicMock()
+    calc._hours_self_use = 3
+    calc._charge_hours = 2
+    calc._bat_soc_backup = 20.0
+    calc._bat_soc_max = 80.0
+    base = datetime(2024, 1, 1, tzinfo=zoneinfo.ZoneInfo("Europe/Stockholm"))
+    entries = [
+        {
+            "start": base + timedelta(hours=i),
+            "end": base + timedelta(hours=i + 1),
+            "value": 1.0 + (i % 12) / 5,
+        }
+        for i in range(24)
+    ]
+    await calc.update_timevalues_from_dict(entries, [], "token")
+    now = base + timedelta(hours=10, minutes=5)
+
+    calc._soc = 80.0
+    await calc.async_update_mpc(now)
+    full = calc.mpc_state
+
+    assert full["projected_soc"][0] == 80.0
+    assert calc.current_slot(now).mode == "Selfuse"
+
+    # Within the allowed deviation the plan is kept
+    calc._soc = 78.0
+    await calc.async_update_mpc(now + timedelta(minutes=1))
+    assert calc.mpc_state["projected_soc"] == full["projected_soc"]
+
+    calc._soc = 20.0
+    await calc.async_update_mpc(now + timedelta(minutes=2))
+    assert calc.mpc_state["projected_soc"][0] == 20.0
+    assert calc.current_slot(now).mode != "Selfuse"
+    assert calc.mpc_state["solves"] == 1
+
+
+@pytest.mark.asyncio
+async def test_fit_schedule_projects_soc(
+    mock_hass_for_price_calc, price_calculator_config
+):
+    """Test that every remaining slot gets a feasible projected SoC."""
+    from custom_components.gridenforcer.pricecalculator import PriceCalculator
+    from datetime import timedelta
+
+    price_calculator_config.data["fit_schedule"] = True
+    calc = PriceCalculator(mock_hass_for_price_calc, price_calculator_config)
+    calc._store.async_delay_save = MagicMock()
+    calc._hours_self_use = 6
+    calc._charge_hours = 1
+    base = datetime(2024, 1, 1, tzinfo=zoneinfo.ZoneInfo("Europe/Stockholm"))
+    entries = [
+        {
+            "start": base + timedelta(hours=i),
+            "end": base + timedelta(hours=i + 1),
+            "value": 1.0 + (i % 12) / 5,
+        }
+        for i in range(24)
+    ]
+    with patch(
+        "custom_components.gridenforcer.pricecalculator.dt_util.utcnow",
+        return_value=base + timedelta(hours=1, minutes=5),
+    ):
+        await calc.update_timevalues_from_dict(entries, [], "token")
+
+    projection = calc.soc_projection
+    assert len(projection) == 23
+    assert all(slot["feasible"] for slot in projection.values())
+    assert all(20.0 <= slot["soc"] <= 80.0 for slot in projection.values())
@@ -0,0 +1,70 @@
+"""Test the ranked price window."""
+
+import zoneinfo
+
+import numpy as np
+
+TZ = zoneinfo.ZoneInfo("Europe/Stockholm")
+START = 1704063600  # 2024-01-01 00:00 local
+
+
+def _summary(step=3600, tomorrow=True):
+    from custom_components.gridenforcer.priceseries import PriceSeries
+    from custom_components.gridenforcer.pricesummary import PriceSummary
+
+    count = 86400 // step
+    prices = np.random.default_rng(3).random(2 * count)
+    today = PriceSeries.from_uniform(START, step, prices[:count], TZ)
+    second = PriceSeries.from_uniform(
+        START + 86400, step, prices[count:] if tomorrow else np.array([]), TZ
+    )
+    return PriceSummary(today, today.values, second, second.values)
+
+
+def _macro(prices, n, cheapest):
+    """The electricity_price_*_sorted macro of prices.jinja."""
+    ordered = sorted(prices, reverse=not cheapest)
+    return round(ordered[min(n, len(ordered)) - 1], 3)
+
+
+def test_nth_matches_the_template_macro():
+    """Test every n against sorting the window slice."""
+    from custom_components.gridenforcer.pricerank import RankedWindow, window_bounds
+
+    summary = _summary()
+    start, end = window_bounds(summary, START + 5 * 3600 + 100, 14)
+    assert start == START + 5 * 3600
+    window = RankedWindow(summary, start, end)
+    assert len(window) == 14
+    prices = summary.values[5:19].tolist()
+    for n in range(1, 20):
+        assert window.nth(n) == _macro(prices, n, True)
+        assert window.nth(n, cheapest=False) == _macro(prices, n, False)
+    assert window.nth(0) == min(prices)
+
+
+def test_window_limited_to_known_prices():
+    """Test that a window past the last price ranks the slots it has."""
+    from custom_components.gridenforcer.pricerank import RankedWindow, window_bounds
+
+    summary = _summary(tomorrow=False)
+    window = RankedWindow(summary, *window_bounds(summary, START + 20 * 3600, 14))
+    assert len(window) == 4
+    assert window.nth(10) == max(summary.values[20:].tolist())
+    assert window_bounds(summary, START + 86400, 14) is None
+    assert RankedWindow(summary, START + 86400, START + 2 * 86400).nth(1) is None
+
+
+def test_quarter_hour_slots():
+    """Test that n hours cover four quarter hour slots each."""
+    from custom_components.gridenforcer.pricerank import RankedWindow, window_bounds
+
+    summary = _summary(step=900)
+    window = RankedWindow(summary, *window_bounds(summary, START, 14))
+    assert len(window) == 56
+    assert window.step == 900
+    prices = summary.values[:56].tolist()
+    assert window.nth_hours(3) == _macro(prices, 12, True)
+    assert window.nth_hours(3, cheapest=False) == _macro(prices, 12, False)
+    assert window.matches(summary, window.start, window.end)
+    assert not window.matches(_summary(step=900), window.start, window.end)
@@ -0,0 +1,137 @@
+"""Test the price source adapters and the normalized price series."""
+from datetime import datetime, timedelta
+import json
+import zoneinfo
+
+import pytest
+
+STOCKHOLM = zoneinfo.ZoneInfo("Europe/Stockholm")
+
+
+def _raw_entries(day, values, step=timedelta(hours=1)):
+    base = datetime(day.year, day.month, day.day, tzinfo=STOCKHOLM)
+    return [
+        {
+            "start": (base + i * step).isoformat(),
+            "end": (base + (i + 1) * step).isoformat(),
+            "value": value,
+        }
+        for i, value in enumerate(values)
+    ]
+
+
+def test_nordpool_uses_flat_values():
+    """Test that Nordpool attributes are read from the flat lists."""
+    from custom_components.gridenforcer.pricesource import NordpoolSource
+
+    now = datetime(2024, 1, 1, 12, tzinfo=STOCKHOLM)
+    today = [1.0 + i / 10 for i in range(24)]
+    attributes = {
+        "today": today,
+        "tomorrow": [2.0] * 24,
+        "tomorrow_valid": True,
+        "raw_today": _raw_entries(now, today),
+        "raw_tomorrow": _raw_entries(now + timedelta(days=1), [2.0] * 24),
+    }
+
+    prices = NordpoolSource(STOCKHOLM).normalize(attributes, now)
+
+    assert prices.today.values.tolist() == today
+    assert prices.today.is_uniform()
+    assert prices.today.start_datetime(0) == datetime(2024, 1, 1, tzinfo=STOCKHOLM)
+    assert prices.today.end_datetime(23) == datetime(2024, 1, 2, tzinfo=STOCKHOLM)
+    assert len(prices.tomorrow) == 24
+
+
+def test_nordpool_falls_back_to_raw_entries():
+    """Test that raw entries are used when the flat list does not match."""
+    from custom_components.gridenforcer.pricesource import NordpoolSource
+
+    now = datetime(2024, 1, 1, 12, tzinfo=STOCKHOLM)
+    raw = _raw_entries(now, [1.0, 2.0, 3.0])
+    del raw[1]
+    attributes = {
+        "today": [1.0, 3.0],
+        "raw_today": raw,
+        "raw_tomorrow": _raw_entries(now, [5.0]),
+        "tomorrow_valid": False,
+    }
+
+    prices = NordpoolSource(STOCKHOLM).normalize(attributes, now)
+
+    assert prices.today.values.tolist() == [1.0, 3.0]
+    assert not prices.today.is_uniform()
+    assert prices.today.start_datetime(1).hour == 2
+    assert len(prices.tomorrow) == 1
+
+
+def test_entsoe_source():
+    """Test ENTSO-e style time/price entries."""
+    from custom_components.gridenforcer.pricesource import EntsoeSource
+
+    now = datetime(2024, 1, 1, 12, tzinfo=STOCKHOLM)
+    base = datetime(2024, 1, 1, tzinfo=STOCKHOLM)
+    attributes = {
+        "prices_today": [
+            {"time": (base + timedelta(minutes=15 * i)).isoformat(), "price": i}
+            for i in range(96)
+        ],
+        "prices_tomorrow": [],
+    }
+
+    prices = EntsoeSource(STOCKHOLM).normalize(attributes, now)
+
+    assert len(prices.today) == 96
+    assert prices.today.step == 900
+    assert len(prices.tomorrow) == 0
+
+
+def test_flat_source_dst_day():
+    """Test that flat arrays are spread over a 23 hour DST day."""
+    from custom_components.gridenforcer.pricesource import FlatArraySource
+
+    now = datetime(2024, 3, 31, 12, tzinfo=STOCKHOLM)
+    attributes = {"today": list(range(23)), "tomorrow": list(range(24))}
+
+    prices = FlatArraySource(STOCKHOLM).normalize(attributes, now)
+
+    assert prices.today.step == 3600
+    assert prices.today.start_datetime(0) == datetime(2024, 3, 31, tzinfo=STOCKHOLM)
+    assert prices.today.start_datetime(2).hour == 3
+    assert prices.tomorrow.start_datetime(0) == datetime(2024, 4, 1, tzinfo=STOCKHOLM)
+
+
+def test_json_file_and_auto_detect(tmp_path):
+    """Test the file source and that auto picks the adapter by shape."""
+    from custom_components.gridenforcer.pricesource import (
+        AutoSource,
+        create_price_source,
+    )
+
+    now = datetime(2024, 1, 1, 12, tzinfo=STOCKHOLM)
+    path = tmp_path / "prices.json"
+    path.write_text(json.dumps({"today": [1.0] * 24}))
+
+    source = create_price_source("json_file", STOCKHOLM, str(path))
+    prices = source.normalize({}, now)
+
+    assert source.blocking
+    assert len(prices.today) == 24
+    assert len(AutoSource(STOCKHOLM).normalize({"state": 1}, now).today) == 0
+    with pytest.raises(ValueError):
+        create_price_source("json_file", STOCKHOLM)
+    with pytest.raises(ValueError):
+        create_price_source("unknown", STOCKHOLM)
+
+
+def test_series_dict_round_trip():
+    """Test that a stored series is restored with its time zone."""
+    from custom_components.gridenforcer.priceseries import PriceSeries
+
+    series = PriceSeries.from_uniform(1704063600, 3600, [1.5, 2.5], STOCKHOLM)
+
+    restored = PriceSeries.from_dict(json.loads(json.dumps(series.to_dict())))
+
+    assert restored.values.tolist() == [1.5, 2.5]
+    assert restored.start_datetime(1) == series.start_datetime(1)
+    assert restored.tz == STOCKHOLM
@@ -0,0 +1,48 @@
+"""Test the price sensor attributes."""
+
+import zoneinfo
+
+import numpy as np
+
+
+def test_attributes_and_slot_lookup():
+    """Test the attributes of both days and the price by slot."""
+    from custom_components.gridenforcer.priceseries import PriceSeries
+    from custom_components.gridenforcer.pricesummary import PriceSummary
+
+    tz = zoneinfo.ZoneInfo("Europe/Stockholm")
+    start = 1704063600  # 2024-01-01 00:00 local
+    today = PriceSeries.from_uniform(start, 3600, np.arange(24) / 10, tz)
+    tomorrow = PriceSeries.from_uniform(start + 86400, 3600, np.ones(24), tz)
+    summary = PriceSummary(
+        today, today.values * 1.25 + 0.1, tomorrow, tomorrow.values * 1.25 + 0.1
+    )
+
+    attributes = summary.attributes
+    assert attributes["times_today"][0] == "2024-01-01 00:00:00"
+    assert attributes["times_tomorrow"][23] == "2024-01-02 23:00:00"
+    assert attributes["prices_today"][:3] == [0.1, 0.225, 0.35]
+    assert attributes["min"] == 0.1
+    assert attributes["max"] == 2.975
+    assert attributes["average"] == round(float(np.mean(np.arange(24) / 8 + 0.1)), 3)
+    assert attributes["tomorrow_valid"]
+    assert len(attributes["prices_all"]) == 48
+
+    assert summary.value_at(start + 3600 + 10) == 0.225
+    assert summary.value_at(start - 1) is None
+    assert summary.value_at(start + 2 * 86400) is None
+    assert summary.next_change(start + 10) == start + 3600
+    assert summary.next_change(start + 2 * 86400 - 1) is None
+
+
+def test_without_tomorrow():
+    """Test that tomorrow is empty and not valid before its prices land."""
+    from custom_components.gridenforcer.priceseries import PriceSeries
+    from custom_components.gridenforcer.pricesummary import PriceSummary
+
+    today = PriceSeries.from_uniform(0, 900, np.full(96, 0.5))
+    summary = PriceSummary(today, today.values, PriceSeries.empty(900), np.empty(0))
+
+    assert summary.attributes["prices_tomorrow"] == []
+    assert not summary.attributes["tomorrow_valid"]
+    assert summary.value_at(95 * 900) == 0.5
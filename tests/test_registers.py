@@ -0,0 +1,63 @@
+"""Test the Modbus register blocks and their decoding."""
+import struct
+
+
+def test_blocks_cover_all_registers():
+    """Test that the Solax map needs few reads and each fits a request."""
+    from custom_components.gridenforcer.registers import (
+        MAX_REGISTERS,
+        SOLAX_REGISTERS,
+        plan_blocks,
+    )
+
+    blocks = plan_blocks(SOLAX_REGISTERS)
+
+    assert len(blocks) * 5 < len(SOLAX_REGISTERS)
+    assert sorted(r.key for b in blocks for r in b.registers) == sorted(
+        r.key for r in SOLAX_REGISTERS
+    )
+    assert all(block.count <= MAX_REGISTERS for block in blocks)
+    # Only the blocks with one second registers are read every second
+    assert sum(block.scan_interval == 1 for block in blocks) == 3
+
+
+def test_gap_splits_blocks():
+    """Test that registers further apart than max_gap are read apart."""
+    from custom_components.gridenforcer.registers import INPUT, Register, plan_blocks
+
+    registers = [Register("a", INPUT, 10), Register("b", INPUT, 14), Register("c", INPUT, 30)]
+
+    blocks = plan_blocks(registers, max_gap=4)
+    assert [(b.address, b.count) for b in blocks] == [(10, 5), (30, 1)]
+    assert len(plan_blocks(registers, max_gap=20)) == 1
+    assert len(plan_blocks(registers, max_gap=20, max_registers=10)) == 2
+
+
+def test_decode_types():
+    """Test signed, word swapped, scaled and string registers."""
+    from custom_components.gridenforcer.registers import (
+        INPUT,
+        INT16,
+        STRING,
+        UINT32,
+        Block,
+        Register,
+    )
+
+    block = Block(
+        INPUT,
+        [
+            Register("name", INPUT, 0, STRING, count=2),
+            Register("power", INPUT, 2, INT16),
+            Register("energy", INPUT, 5, UINT32, scale=0.1, precision=1),
+        ],
+    )
+    words = [0x4142, 0x4300, 0xFFF6, 0, 0, 0x0002, 0x0001]
+    buffer = bytearray(struct.pack(f">{len(words)}H", *words))
+
+    assert block.count == 7
+    assert block.decode(buffer) == {
+        "name": "ABC",
+        "power": -10,
+        "energy": round((0x10000 + 2) * 0.1, 1),
+    }
@@ -0,0 +1,98 @@
+"""Test validation and resampling of price series."""
+import numpy as np
+import pytest
+
+HOUR = 3600
+QUARTER = 900
+
+
+def _series(starts, values, step=None):
+    from custom_components.gridenforcer.priceseries import PriceSeries
+
+    return PriceSeries.from_timestamps(starts, values, step)
+
+
+def test_inspect_detects_issues():
+    """Test detection of gaps, duplicates and mixed resolution."""
+    from custom_components.gridenforcer.resample import inspect_series
+
+    assert inspect_series(_series([0, HOUR, 2 * HOUR], [1, 2, 3])).ok
+
+    gap = inspect_series(_series([0, HOUR, 4 * HOUR], [1, 2, 3]))
+    assert gap.missing_slots == 2
+    assert not gap.mixed_resolution
+
+    duplicate = inspect_series(_series([0, HOUR, HOUR, 2 * HOUR], [1, 2, 2, 3]))
+    assert duplicate.duplicates == 1
+
+    mixed = inspect_series(_series([0, HOUR, HOUR + QUARTER, HOUR + 2 * QUARTER], [1] * 4))
+    assert mixed.mixed_resolution
+    assert mixed.missing_slots == 0
+
+
+@pytest.mark.parametrize(
+    "fill, expected",
+    [("ffill", [1.0, 2.0, 2.0, 2.0, 5.0]), ("interpolate", [1.0, 2.0, 3.0, 4.0, 5.0])],
+)
+def test_fill_gaps(fill, expected):
+    """Test that missing hours are forward filled or interpolated."""
+    from custom_components.gridenforcer.resample import prepare_series
+
+    series = prepare_series(_series([0, HOUR, 4 * HOUR], [1, 2, 5]), HOUR, fill)
+
+    assert series.starts.tolist() == [i * HOUR for i in range(5)]
+    assert series.values.tolist() == expected
+
+
+def test_stored_fill_none_forward_fills():
+    """Test that the dropped fill none of older entries keeps the grid whole."""
+    from custom_components.gridenforcer.resample import prepare_series
+
+    series = prepare_series(_series([0, HOUR, HOUR, 4 * HOUR], [1, 2, 3, 5]), HOUR, "none")
+
+    assert series.starts.tolist() == [i * HOUR for i in range(5)]
+    # The last delivered value of a duplicated slot wins
+    assert series.values.tolist() == [1.0, 3.0, 3.0, 3.0, 5.0]
+
+
+def test_mixed_resolution_to_hourly_and_quarter():
+    """Test that hourly and quarter hour slots share one aligned array."""
+    from custom_components.gridenforcer.resample import prepare_series
+
+    starts = [0, HOUR] + [2 * HOUR + i * QUARTER for i in range(4)]
+    series = _series(starts, [1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+
+    hourly = prepare_series(series, HOUR)
+    quarter = prepare_series(series, QUARTER)
+
+    assert hourly.values.tolist() == [1.0, 2.0, 4.5]
+    assert len(quarter) == 12
+    assert quarter.values[:8].tolist() == [1.0] * 4 + [2.0] * 4
+    assert quarter.is_uniform()
+
+
+def test_resample_round_trip():
+    """Test vectorized up- and downsampling of a uniform series."""
+    from custom_components.gridenforcer.priceseries import PriceSeries
+    from custom_components.gridenforcer.resample import resample
+
+    hourly = PriceSeries.from_uniform(0, HOUR, np.arange(24, dtype=float))
+
+    quarter = resample(hourly, QUARTER)
+    back = resample(quarter, HOUR)
+
+    assert len(quarter) == 96
+    assert quarter.starts[1] == QUARTER
+    assert back.values.tolist() == hourly.values.tolist()
+    assert resample(hourly, HOUR) is hourly
+    with pytest.raises(ValueError):
+        resample(hourly, 7 * 60)
+
+
+def test_clean_series_unchanged():
+    """Test that a clean series at the target resolution is returned as is."""
+    from custom_components.gridenforcer.resample import prepare_series
+
+    series = _series([0, HOUR, 2 * HOUR], [1, 2, 3], HOUR)
+
+    assert prepare_series(series, HOUR) is series
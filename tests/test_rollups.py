@@ -0,0 +1,123 @@
+"""Test the daily and monthly analytics rollups."""
+import zoneinfo
+from datetime import date
+
+import numpy as np
+import pytest
+
+TZ = zoneinfo.ZoneInfo("Europe/Stockholm")
+# 2024-01-31 00:00 local
+START = 1706655600
+
+
+def test_energy_and_revenue_by_mode():
+    """Test that sells earn, selfuse saves and grid charges cost."""
+    from custom_components.gridenforcer.rollups import Rollups
+
+    rollups = Rollups(TZ, 10.0)
+    rollups.add_energy(START, 5.0, "Charge", 0.5, 0.4)
+    rollups.add_energy(START + 3600, 2.0, "Selfuse", 0.9, 0.8)
+    rollups.add_energy(START + 7200, -4.0, "Sell", 2.0, 1.5)
+    rollups.add_energy(START + 10800, -2.5, "Selfuse", 1.2, 1.0)
+
+    day = rollups.to_dict()["2024-01-31"]
+    assert day["charged_kwh"] == pytest.approx(7.0)
+    assert day["discharged_kwh"] == pytest.approx(6.5)
+    assert day["cycles"] == pytest.approx(0.65)
+    assert day["arbitrage_revenue"] == pytest.approx(4 * 1.5 - 5 * 0.5)
+    assert day["selfuse_savings"] == pytest.approx(2.5 * 1.2)
+
+
+def test_days_roll_up_into_months():
+    """Test local day and month keys and the range filter."""
+    from custom_components.gridenforcer.rollups import Rollups
+
+    rollups = Rollups(TZ, 10.0)
+    rollups.add_energy(START + 3600, -1.0, "Selfuse", 1.0, 1.0)
+    # 2024-02-01 00:30 local, 23:30 UTC the day before
+    rollups.add_energy(START + 86400 + 1800, -2.0, "Selfuse", 1.0, 1.0)
+
+    assert list(rollups.to_dict()) == ["2024-01-31", "2024-02-01"]
+    assert list(rollups.to_dict(start="2024-02-01")) == ["2024-02-01"]
+    months = rollups.to_dict("month")
+    assert months["2024-01"]["selfuse_savings"] == pytest.approx(1.0)
+    assert months["2024-02"]["selfuse_savings"] == pytest.approx(2.0)
+    assert list(rollups.to_dict("month", end="2024-01-31")) == ["2024-01"]
+
+
+def test_fcrd_activations():
+    """Test FCR-D activation counts and active time."""
+    from custom_components.gridenforcer.rollups import Rollups
+
+    rollups = Rollups(TZ, 10.0)
+    rollups.add_fcrd(START, True, 0.0, True)
+    rollups.add_fcrd(START + 30, True, 30.0, False)
+    rollups.add_fcrd(START + 60, False, 0.0, True)
+
+    day = rollups.to_dict()["2024-01-31"]
+    assert day["fcrd_up_activations"] == 1
+    assert day["fcrd_up_seconds"] == 30
+    assert day["fcrd_down_activations"] == 1
+
+
+def test_archive_days_do_not_double_count(tmp_path):
+    """Test that archived days fill in but live days are kept."""
+    from custom_components.gridenforcer.archive import DayArchive
+    from custom_components.gridenforcer.rollups import Rollups
+
+    archive = DayArchive(str(tmp_path))
+    for offset, day in enumerate([date(2024, 1, 31), date(2024, 2, 1)]):
+        starts = START + offset * 86400 + np.arange(24, dtype=np.int64) * 3600
+        modes = ["Charge"] * 4 + ["Standby"] * 12 + ["Sell"] * 4 + ["Standby"] * 4
+        energy = np.where(
+            np.array(modes) == "Charge", 1.0, np.where(np.array(modes) == "Sell", -1.0, 0)
+        )
+        archive.append(
+            day,
+            3600,
+            starts,
+            np.ones(24),
+            np.full(24, 0.5),
+            np.full(24, 1.5),
+            modes,
+            np.full(24, np.nan),
+            energy,
+        )
+    live = Rollups(TZ, 10.0)
+    live.add_energy(START + 86400 + 60, -1.0, "Sell", 0.5, 3.0)
+    archived = Rollups(TZ, 10.0)
+    archived.add_archive(archive.read())
+
+    live.merge_days(archived)
+
+    days = live.to_dict()
+    assert days["2024-01-31"]["arbitrage_revenue"] == pytest.approx(4 * 1.5 - 4 * 0.5)
+    assert days["2024-02-01"]["arbitrage_revenue"] == pytest.approx(3.0)
+    assert live.to_dict("month")["2024-01"]["charged_kwh"] == pytest.approx(4.0)
+
+
+def test_stored_totals_survive_a_restart():
+    """Test that stored FCR-D and today's totals add to the ones counted since."""
+    import json
+
+    from custom_components.gridenforcer.rollups import Rollups
+
+    before = Rollups(TZ, 10.0)
+    before.add_energy(START + 3600, -2.0, "Sell", 0.5, 1.5)
+    before.add_fcrd(START + 7200, True, 0.0, True)
+    before.add_fcrd(START + 7500, True, 300.0, False)
+    stored = json.loads(json.dumps(before.to_stored()))
+    # A field the running version no longer knows is skipped
+    stored["fields"].append("removed")
+    for totals in (*stored["day"].values(), *stored["month"].values()):
+        totals.append(1.0)
+
+    after = Rollups(TZ, 10.0)
+    after.add_energy(START + 36000, -1.0, "Sell", 0.5, 2.0)
+    after.add_stored(stored)
+
+    day = after.to_dict()["2024-01-31"]
+    assert day["arbitrage_revenue"] == pytest.approx(2 * 1.5 + 2.0)
+    assert day["fcrd_up_seconds"] == 300.0
+    assert day["fcrd_up_activations"] == 1
+    assert after.to_dict("month")["2024-01"]["discharged_kwh"] == pytest.approx(3.0)
@@ -0,0 +1,157 @@
+"""Test planning over price scenarios."""
+import json
+import zoneinfo
+from datetime import date
+
+import numpy as np
+import pytest
+
+PRICE_VALUES = [
+    0.8, 0.7, 0.6, 0.9, 1.0, 1.2, 1.5, 2.0, 2.2, 2.5, 2.3, 2.1,
+    1.8, 1.6, 1.4, 1.7, 1.9, 2.4, 2.6, 2.2, 1.9, 1.5, 1.2, 1.0,
+]
+TZ = zoneinfo.ZoneInfo("Europe/Stockholm")
+# Monday 2024-01-01 00:00 local time
+MONDAY = 1704063600
+
+
+@pytest.fixture
+def history():
+    from custom_components.gridenforcer.priceseries import PriceSeries
+
+    return [
+        PriceSeries.from_uniform(
+            MONDAY + i * 86400, 3600, np.array(PRICE_VALUES) * scale, TZ
+        )
+        for i, scale in enumerate((1.0, 0.7, 1.4, 0.9, 1.1, 0.8, 1.2))
+    ]
+
+
+def _params():
+    from custom_components.gridenforcer.planner import PlanParameters
+
+    return PlanParameters(25.0, 0.15, 0.05, 0.02, 3, 2)
+
+
+def test_weekday_scenarios(history):
+    """Test that the same weekday weighs more."""
+    from custom_components.gridenforcer.scenarios import scenarios_from_history
+
+    scenarios = scenarios_from_history(history, date(2024, 1, 8), TZ, "weekday")
+
+    assert scenarios.spot.shape == (7, 24)
+    assert scenarios.weights.sum() == pytest.approx(1.0)
+    # Monday the 1st is the same weekday as Monday the 8th
+    assert scenarios.weights[0] == pytest.approx(3 * scenarios.weights[1])
+    assert scenarios.starts[0] == MONDAY + 7 * 86400
+
+
+def test_average_scenarios(history):
+    """Test that the moving average is added as a scenario."""
+    from custom_components.gridenforcer.scenarios import scenarios_from_history
+
+    scenarios = scenarios_from_history(history, date(2024, 1, 8), TZ, "average")
+
+    assert scenarios.spot.shape == (8, 24)
+    assert np.allclose(scenarios.spot[-1], scenarios.spot[:-1].mean(axis=0))
+
+
+def test_dst_day_fits_history():
+    """Test that a 24 hour day is cut to the 23 hours of a DST day."""
+    from custom_components.gridenforcer.priceseries import PriceSeries
+    from custom_components.gridenforcer.scenarios import scenarios_from_history
+
+    # Saturday 2024-03-30 before the switch to summer time
+    saturday = PriceSeries.from_uniform(1711753200, 3600, PRICE_VALUES, TZ)
+
+    scenarios = scenarios_from_history([saturday], date(2024, 3, 31), TZ, "weekday")
+
+    assert scenarios.spot.shape == (1, 23)
+
+
+def test_scenario_file(tmp_path):
+    """Test loading scenarios and weights from a JSON file."""
+    from custom_components.gridenforcer.scenarios import load_scenario_file
+
+    path = tmp_path / "scenarios.json"
+    path.write_text(
+        json.dumps({"scenarios": [PRICE_VALUES, PRICE_VALUES[::-1]], "weights": [3, 1]})
+    )
+
+    scenarios = load_scenario_file(str(path), date(2024, 1, 8), TZ)
+
+    assert scenarios.weights.tolist() == [0.75, 0.25]
+    assert scenarios.spot[1, 0] == PRICE_VALUES[-1]
+
+    path.write_text(json.dumps({"scenarios": [PRICE_VALUES], "weights": [1, 2]}))
+    with pytest.raises(ValueError):
+        load_scenario_file(str(path), date(2024, 1, 8), TZ)
+
+
+def test_batched_scores_match_single_schedule(history):
+    """Test the vectorized scores against tuning.score_schedule."""
+    from custom_components.gridenforcer.pipeline import PlanPipeline
+    from custom_components.gridenforcer.planner import transform_series
+    from custom_components.gridenforcer.scenarios import mode_codes, score_candidates
+    from custom_components.gridenforcer.tuning import score_schedule
+
+    params = _params()
+    priced = [transform_series(series, params) for series in history]
+    modes = [
+        [tv.mode for tv in PlanPipeline().run(day, params).schedule] for day in priced
+    ]
+    codes = np.vstack([mode_codes(m) for m in modes])
+    buy = np.vstack([day.buy for day in priced])
+    sell = np.vstack([day.sell for day in priced])
+
+    scores = score_candidates(codes, buy, sell, params.bat_cost)
+
+    assert scores.shape == (7, 7)
+    for c, candidate in enumerate(modes):
+        for s, day in enumerate(priced):
+            assert scores[c, s] == pytest.approx(
+                score_schedule(day, candidate, params.bat_cost)
+            )
+
+
+def test_quarter_hour_scores_match_single_schedule(history):
+    """Test that 15 minute slots move a quarter of the hourly rates."""
+    from custom_components.gridenforcer.pipeline import PlanPipeline
+    from custom_components.gridenforcer.planner import transform_series
+    from custom_components.gridenforcer.resample import resample
+    from custom_components.gridenforcer.scenarios import mode_codes, score_candidates
+    from custom_components.gridenforcer.tuning import score_schedule
+
+    params = _params()
+    day = transform_series(resample(history[0], 900), params)
+    modes = [tv.mode for tv in PlanPipeline().run(day, params).schedule]
+
+    scores = score_candidates(
+        mode_codes(modes)[np.newaxis],
+        day.buy[np.newaxis],
+        day.sell[np.newaxis],
+        params.bat_cost,
+        step=900,
+    )
+
+    assert scores[0, 0] == pytest.approx(score_schedule(day, modes, params.bat_cost))
+
+
+def test_plan_scenarios(history):
+    """Test that the chosen plan covers the day and the objectives hold."""
+    from custom_components.gridenforcer.scenarios import (
+        plan_scenarios,
+        scenarios_from_history,
+    )
+
+    scenarios = scenarios_from_history(history, date(2024, 1, 8), TZ, "average")
+
+    expected = plan_scenarios(scenarios, _params(), "expected")
+    worst = plan_scenarios(scenarios, _params(), "worst_case")
+
+    assert len(expected.modes) == 24
+    assert "Charge" in expected.modes
+    assert expected.scenarios == 8
+    assert expected.worst_score <= expected.expected_score
+    assert worst.worst_score >= expected.worst_score
+    assert expected.expected_score >= worst.expected_score
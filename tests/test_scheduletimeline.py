@@ -0,0 +1,62 @@
+"""Test the decision runs of the schedule."""
+
+from datetime import datetime, timedelta, timezone
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _schedule(modes):
+    from custom_components.gridenforcer.timevalue import TimeValue
+
+    schedule = []
+    for hour, mode in enumerate(modes):
+        tv = TimeValue(
+            START + timedelta(hours=hour), START + timedelta(hours=hour + 1), 1.0, 0.5
+        )
+        tv.mode = mode
+        schedule.append(tv)
+    return schedule
+
+
+def test_runs_merge_consecutive_slots():
+    """Test that the state only changes at run boundaries."""
+    from custom_components.gridenforcer.scheduletimeline import (
+        DECISIONS,
+        ScheduleTimeline,
+    )
+
+    modes = {decision.key: decision.modes for decision in DECISIONS}
+    schedule = _schedule(["Standby", "Charge", "Charge", "Selfuse", "Sell", "Standby"])
+    base = START.timestamp()
+
+    charge = ScheduleTimeline(schedule, modes["planned_charge_battery_grid"])
+    assert len(charge) == 1
+    assert not charge.is_on(base)
+    assert charge.next_change(base) == base + 3600
+    assert charge.is_on(base + 3600)
+    assert charge.next_change(base + 3600) == base + 3 * 3600
+    assert not charge.is_on(base + 3 * 3600)
+    assert charge.next_change(base + 3 * 3600) is None
+
+    discharge = ScheduleTimeline(schedule, modes["planned_discharge_battery"])
+    assert len(discharge) == 1
+    assert discharge.is_on(base + 4 * 3600 + 10)
+    assert discharge.next_change(base + 3 * 3600) == base + 5 * 3600
+    # Off before and after the schedule
+    assert not discharge.is_on(base - 1)
+    assert not discharge.is_on(base + 6 * 3600)
+
+
+def test_gap_splits_runs():
+    """Test that slots missing from the schedule end a run."""
+    from custom_components.gridenforcer.scheduletimeline import ScheduleTimeline
+
+    schedule = _schedule(["Charge", "Charge", "Charge"])
+    del schedule[1]
+    timeline = ScheduleTimeline(schedule, frozenset({"Charge"}))
+    base = START.timestamp()
+    assert len(timeline) == 2
+    assert timeline.next_change(base) == base + 3600
+    assert not timeline.is_on(base + 3600)
+    assert timeline.next_change(base + 3600) == base + 2 * 3600
+    assert ScheduleTimeline([], frozenset({"Charge"})).next_change(base) is None
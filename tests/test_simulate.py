@@ -0,0 +1,93 @@
+"""Test the projected SoC simulation of schedules."""
+import time
+
+import numpy as np
+import pytest
+
+PRICE_VALUES = [
+    0.8, 0.7, 0.6, 0.9, 1.0, 1.2, 1.5, 2.0, 2.2, 2.5, 2.3, 2.1,
+    1.8, 1.6, 1.4, 1.7, 1.9, 2.4, 2.6, 2.2, 1.9, 1.5, 1.2, 1.0,
+]
+
+
+def test_trajectory_within_limits():
+    """Test the SoC per slot with the efficiency on both ways."""
+    from custom_components.gridenforcer.simulate import BatterySpec, simulate
+
+    spec = BatterySpec(capacity_kwh=10, charge_kw=2, discharge_kw=2, efficiency=0.9)
+    result = simulate(["Charge", "Standby", "Sell"], 3600, 30.0, spec)
+
+    assert result.soc == pytest.approx([30.0, 48.0, 48.0, 48.0 - 20 / 0.9])
+    assert result.feasible
+
+
+def test_limits_flag_infeasible_slots():
+    """Test that a charge at soc_max and a starved discharge are flagged."""
+    from custom_components.gridenforcer.simulate import simulate
+
+    full = simulate(["Charge", "Charge", "Standby"], 3600, 60.0)
+    assert full.soc.tolist() == pytest.approx([60.0, 80.0, 80.0, 80.0])
+    assert full.infeasible.tolist() == [False, True, False]
+
+    empty = simulate(["Selfuse", "Selfuse", "Sell"], 3600, 40.0)
+    assert empty.soc.min() == pytest.approx(20.0)
+    assert not empty.infeasible[0]
+    assert empty.infeasible[2]
+
+
+def test_quarter_hour_slots():
+    """Test that the energy per slot follows the step."""
+    from custom_components.gridenforcer.simulate import simulate
+
+    hourly = simulate(["Charge"], 3600, 20.0)
+    quarters = simulate(["Charge"] * 4, 900, 20.0)
+
+    assert quarters.soc[-1] == pytest.approx(hourly.soc[-1])
+
+
+def test_fit_charges_before_starved_discharge():
+    """Test that the cheapest standby slot before the run becomes a charge."""
+    from custom_components.gridenforcer.simulate import fit_schedule
+
+    modes = ["Standby"] * 24
+    modes[2] = "Charge"
+    modes[9] = "Sell"
+    modes[17:21] = ["Selfuse"] * 4
+
+    fitted, result = fit_schedule(modes, PRICE_VALUES, 3600, 20.0)
+
+    assert result.feasible
+    assert fitted[9] == "Sell"
+    # The cheapest slots between the two discharge runs charge again
+    assert fitted[13:15] == ["Charge", "Charge"]
+    # What a full battery can not serve is trimmed
+    assert fitted[17:21] == ["Selfuse", "Selfuse", "Standby", "Standby"]
+
+
+def test_fit_trims_when_battery_full():
+    """Test that charges finding the battery full are trimmed."""
+    from custom_components.gridenforcer.simulate import fit_schedule
+
+    modes = ["Charge"] * 4 + ["Standby"] * 20
+
+    fitted, result = fit_schedule(modes, PRICE_VALUES, 3600, 75.0)
+
+    assert result.feasible
+    assert fitted[:4] == ["Charge", "Standby", "Standby", "Standby"]
+
+
+def test_simulation_is_fast():
+    """Test that a day projects in microseconds."""
+    from custom_components.gridenforcer.simulate import simulate
+
+    modes = (["Charge"] * 3 + ["Standby"] * 5 + ["Sell"] * 2 + ["Selfuse"] * 2) * 8
+    simulate(modes, 900, 50.0)
+    rounds = 1000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = simulate(modes, 900, 50.0)
+    elapsed = (time.perf_counter() - start) / rounds
+
+    assert len(result.soc) == len(modes) + 1
+    assert np.all(result.soc >= 20.0)
+    assert elapsed < 1e-3
@@ -0,0 +1,55 @@
+"""Test the SoC limits state machine."""
+
+
+def test_deadband_drops_small_changes():
+    """Test that the forced 0.0001 steps are not acted on."""
+    from custom_components.gridenforcer.soccontrol import SocController
+
+    control = SocController(deadband=0.5)
+    assert control.update(50.0)
+    assert not control.update(50.0001)
+    assert not control.update(50.4)
+    assert control.update(50.6)
+    assert control.to_dict()["received"] == 4
+    assert control.to_dict()["accepted"] == 2
+
+
+def test_hysteresis_around_backup():
+    """Test that a SoC wobbling at the backup threshold keeps its mode."""
+    from custom_components.gridenforcer.invertermode import InverterMode
+    from custom_components.gridenforcer.soccontrol import SocController
+
+    control = SocController(deadband=0.0, hysteresis=1.0, backup=20.0, soc_max=80.0)
+    mode = InverterMode.STANDBY
+    decisions = []
+    for soc in (21.0, 19.9, 20.2, 19.8, 20.5, 21.0, 30.0):
+        control.update(soc)
+        if (decided := control.decide(mode)) is not None:
+            mode = decided
+            decisions.append((soc, mode))
+
+    assert decisions == [
+        (19.9, InverterMode.CHARGESOC),
+        (21.0, InverterMode.STANDBY),
+    ]
+    assert control.acted == 2
+
+
+def test_thresholds_and_running_modes():
+    """Test the cached thresholds and that charging runs up to max."""
+    from custom_components.gridenforcer.invertermode import InverterMode
+    from custom_components.gridenforcer.soccontrol import SocController
+
+    control = SocController(deadband=0.0)
+    control.update(85.0)
+    assert control.decide(InverterMode.STANDBY) == InverterMode.FULLYCHARGED
+
+    control.set_thresholds(soc_max=90.0)
+    assert control.backup is None
+    assert control.decide(InverterMode.CHARGING) is None
+    assert control.decide(InverterMode.STANDBY) is None
+    control.update(89.5)
+    assert control.decide(InverterMode.FULLYCHARGED) is None
+    control.update(70.0)
+    assert control.decide(InverterMode.FULLYCHARGED) == InverterMode.STANDBY
+    assert control.decide(InverterMode.DISCHARGING) is None
@@ -0,0 +1,65 @@
+"""Test the SoC jump detector on replayed samples."""
+
+
+def test_jump_with_idle_battery_is_a_fault():
+    """Test that a jump raises a fault that ends once out of the window."""
+    from custom_components.gridenforcer.socfault import replay
+
+    samples = [(t, 50.0, 0.1) for t in range(0, 1200, 5)]
+    samples += [(t, 60.0, 0.1) for t in range(1200, 2400, 5)]
+
+    # 10 % over the 10 min window is 60 %/h
+    assert replay(samples) == [(1200, True), (1800, False)]
+
+
+def test_charging_is_no_fault():
+    """Test that a fast rise with current or unknown current is no fault."""
+    import math
+
+    from custom_components.gridenforcer.socfault import SocFaultDetector, replay
+
+    charging = [(t, 20.0 + t / 60, 12.0) for t in range(0, 1800, 5)]
+    unknown = [(t, 20.0 + t / 60, math.nan) for t in range(0, 1800, 5)]
+    assert replay(charging) == []
+    assert replay(unknown) == []
+
+    detector = SocFaultDetector()
+    for sample in charging:
+        detector.add(*sample)
+    # 1 % a minute
+    assert round(detector.slope, 6) == 60.0
+
+
+def test_ring_buffer_keeps_window_start():
+    """Test that sparse samples hold the SoC and the buffer stays bounded."""
+    from custom_components.gridenforcer.socfault import SocFaultDetector
+
+    detector = SocFaultDetector(capacity=8)
+    assert detector.add(0.0, 50.0, 0.0) is None
+    assert detector.slope is None
+    # Only reported on change, held at 50 until the jump an hour later
+    assert detector.add(3600.0, 55.0, 0.0) is True
+    assert detector.slope == 30.0
+    for t in range(3610, 3800, 10):
+        detector.add(float(t), 55.0, 0.0)
+    assert len(detector.samples) == 8
+    assert detector.faults == 1
+
+
+def test_no_slope_before_the_window_is_covered():
+    """Test that a 1 % step right after startup is no fault."""
+    from custom_components.gridenforcer.socfault import SocFaultDetector, replay
+
+    samples = [(0, 50.0, 0.1), (5, 50.0, 0.1)]
+    samples += [(t, 51.0, 0.1) for t in range(60, 1200, 5)]
+
+    assert replay(samples) == []
+
+    detector = SocFaultDetector()
+    for sample in samples[:3]:
+        detector.add(*sample)
+    assert detector.slope is None
+    for sample in samples[3:]:
+        detector.add(*sample)
+    # Held at 51 for the whole window
+    assert detector.slope == 0.0
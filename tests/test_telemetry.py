@@ -0,0 +1,167 @@
+"""Test the MQTT telemetry publisher."""
+
+import asyncio
+import json
+import struct
+
+import pytest
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _publisher(publish, **kwargs):
+    from custom_components.gridenforcer.telemetry import (
+        Field,
+        Package,
+        TelemetryPublisher,
+    )
+
+    packages = (
+        Package(
+            "quick",
+            (
+                Field("BATPOWER", ("sensor.battery_power",)),
+                Field("PVTOTAL", ("sensor.pv1", "sensor.pv2")),
+                Field("GRID", ("sensor.grid",), scale=-1.0),
+            ),
+            2,
+            30,
+        ),
+        Package("slow", (Field("BRANCH", ("sensor.branch",), kind="string"),), 60, 600),
+    )
+    return TelemetryPublisher(publish, "ge/", packages, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_publish_on_change_and_heartbeat():
+    """Test that changes coalesce within min_interval and heartbeats follow."""
+    sent = []
+
+    async def publish(topic, payload, qos):
+        sent.append((topic, payload))
+
+    clock = _Clock()
+    publisher = _publisher(publish)
+    assert publisher.on_state("sensor.pv1", "100")
+    assert publisher.on_state("sensor.pv2", "50.5")
+    assert publisher.on_state("sensor.grid", "on")
+    assert not publisher.on_state("sensor.pv2", "50.5")
+    assert not publisher.on_state("sensor.unrelated", "1")
+    await publisher.async_flush(clock)
+
+    assert [topic for topic, _ in sent] == ["ge/quick", "ge/slow"]
+    assert json.loads(sent[0][1]) == {
+        "BATPOWER": 0.0,
+        "PVTOTAL": 150.5,
+        "GRID": -1.0,
+        "time": 1000.0,
+    }
+    assert json.loads(sent[1][1])["BRANCH"] == "unknown"
+
+    # Changes inside min_interval go out together
+    clock.now += 1
+    publisher.on_state("sensor.battery_power", "10")
+    publisher.on_state("sensor.battery_power", "20")
+    await publisher.async_flush(clock)
+    assert len(sent) == 2
+    clock.now += 1
+    await publisher.async_flush(clock)
+    assert len(sent) == 3
+    assert json.loads(sent[2][1])["BATPOWER"] == 20.0
+    # Three changes before the first payload, one before the second
+    assert publisher.metrics()["coalesced"] == 4
+
+    # Unchanged packages only at max_interval
+    clock.now += 29
+    await publisher.async_flush(clock)
+    assert len(sent) == 3
+    clock.now += 1
+    await publisher.async_flush(clock)
+    assert [topic for topic, _ in sent[3:]] == ["ge/quick"]
+
+
+@pytest.mark.asyncio
+async def test_backpressure_publishes_latest_values():
+    """Test that flushes during a slow publish fold into the running one."""
+    sent = []
+    release = asyncio.Event()
+
+    async def publish(topic, payload, qos):
+        sent.append(payload)
+        if len(sent) == 1:
+            await release.wait()
+
+    clock = _Clock()
+    publisher = _publisher(publish)
+    running = asyncio.create_task(publisher.async_flush(clock))
+    await asyncio.sleep(0)
+    clock.now += 5
+    publisher.on_state("sensor.battery_power", "1")
+    publisher.on_state("sensor.battery_power", "2")
+    await publisher.async_flush(clock)
+    release.set()
+    await running
+
+    assert publisher.metrics()["busy"] == 1
+    # First quick, the slow package, then quick again with the last value
+    assert len(sent) == 3
+    assert json.loads(sent[2])["BATPOWER"] == 2.0
+
+
+@pytest.mark.asyncio
+async def test_binary_encoding():
+    """Test that numeric packages pack as float64 time and float32 values."""
+    sent = {}
+
+    async def publish(topic, payload, qos):
+        sent[topic] = payload
+
+    publisher = _publisher(publish, encoding="binary")
+    publisher.on_state("sensor.battery_power", "-1500")
+    publisher.on_state("sensor.branch", "main")
+    await publisher.async_flush(_Clock())
+
+    assert struct.unpack("<d3f", sent["ge/quick"]) == (1000.0, -1500.0, 0.0, -0.0)
+    # Strings cannot be packed, the package stays JSON
+    assert json.loads(sent["ge/slow"])["BRANCH"] == "main"
+
+
+@pytest.mark.asyncio
+async def test_packages_on_their_own_topics():
+    """Test that mapped packages keep the topics the YAML published to."""
+    from custom_components.gridenforcer.telemetry import (
+        PACKAGES,
+        TelemetryPublisher,
+        parse_topics,
+    )
+
+    sent = []
+
+    async def publish(topic, payload, qos):
+        sent.append(topic)
+
+    topics = parse_topics("BATPower = flower/bat,\nPVPower=flower/pv\n")
+    assert topics == {"BATPower": "flower/bat", "PVPower": "flower/pv"}
+    with pytest.raises(ValueError):
+        parse_topics("PVPOWER=flower/pv")
+    with pytest.raises(ValueError):
+        parse_topics("PVPower=")
+
+    publisher = TelemetryPublisher(publish, "ge", topics=topics)
+    await publisher.async_flush()
+
+    # The five flower topics of flower.yaml and the three mqtt.yaml packages
+    assert len(PACKAGES) == 8
+    assert sent[:5] == [
+        "flower/bat",
+        "ge/INVPower",
+        "ge/GRIDPower",
+        "ge/BATSOC",
+        "flower/pv",
+    ]
@@ -0,0 +1,129 @@
+"""Test the parameter sweep and auto-tuning."""
+import multiprocessing
+import zoneinfo
+
+import numpy as np
+import pytest
+
+PRICE_VALUES = [
+    0.8, 0.7, 0.6, 0.9, 1.0, 1.2, 1.5, 2.0, 2.2, 2.5, 2.3, 2.1,
+    1.8, 1.6, 1.4, 1.7, 1.9, 2.4, 2.6, 2.2, 1.9, 1.5, 1.2, 1.0,
+]
+DAY = 86400
+
+
+def _params(**kwargs):
+    from custom_components.gridenforcer.planner import PlanParameters
+
+    return PlanParameters(25.0, 0.15, 0.05, 0.02, 2, 1)._replace(**kwargs)
+
+
+@pytest.fixture
+def days():
+    from custom_components.gridenforcer.planner import transform_series
+    from custom_components.gridenforcer.priceseries import PriceSeries
+
+    tz = zoneinfo.ZoneInfo("Europe/Stockholm")
+    values = np.array(PRICE_VALUES)
+    return [
+        transform_series(
+            PriceSeries.from_uniform(1704063600 + i * DAY, 3600, values * scale, tz),
+            _params(),
+        )
+        for i, scale in enumerate((1.0, 0.8, 1.3))
+    ]
+
+
+def test_candidate_grid():
+    """Test that the grid covers every combination of the swept values."""
+    from custom_components.gridenforcer.tuning import candidate_grid
+
+    grid = candidate_grid(_params(), (1, 2), (1, 2, 3), (1.0, 2.0), (0.1,))
+
+    assert len(grid) == 12
+    assert {(c.selfuse_hours, c.charge_hours) for c in grid} == {
+        (s, c) for s in (1, 2) for c in (1, 2, 3)
+    }
+    assert {c.bat_cost for c in grid} == {0.02, 0.04}
+    assert all(c.vat == 25.0 for c in grid)
+
+
+def test_score_schedule(days):
+    """Test that charging cheap and selling expensive scores above idling."""
+    from custom_components.gridenforcer.tuning import score_schedule
+
+    priced = days[0]
+    idle = ["Idle"] * 24
+    arbitrage = list(idle)
+    arbitrage[2] = "Charge"
+    arbitrage[3] = "Charge"
+    arbitrage[18] = "Sell"
+
+    assert score_schedule(priced, idle, 0.02) == 0.0
+    assert score_schedule(priced, arbitrage, 0.02) > 0.0
+    # Selling before charging moves nothing
+    assert score_schedule(priced, ["Sell"] + idle[1:], 0.02) == 0.0
+
+
+def test_sweep_not_worse_than_baseline(days):
+    """Test that the best candidate scores at least as well as the start."""
+    from custom_components.gridenforcer.tuning import sweep
+
+    result = sweep(days, _params())
+
+    assert result.candidates == 6 * 4 * 4 * 3
+    assert result.score >= result.baseline_score
+    assert result.improvement >= 0.0
+
+
+def test_parallel_sweep_matches_serial(days):
+    """Test that the process pool gives the same result as a serial sweep."""
+    from custom_components.gridenforcer.tuning import candidate_grid, sweep
+
+    candidates = candidate_grid(_params(), (1, 3), (1, 2), (1.0,), (0.1, 0.2))
+
+    serial = sweep(days, _params(), candidates)
+    parallel = sweep(
+        days,
+        _params(),
+        candidates,
+        workers=2,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+    assert parallel == serial
+
+
+def test_tune_cache_reuses_result(days):
+    """Test that the same prices and costs only sweep once."""
+    from custom_components.gridenforcer.tuning import TuneCache
+
+    cache = TuneCache()
+
+    first = cache.sweep(days, _params())
+    # The swept parameters of the base are not part of the key
+    second = cache.sweep(days, _params(selfuse_hours=4))
+
+    assert cache.sweeps == 1
+    assert second is first
+    assert cache.get(days[:1], _params()) is None
+
+    cache.sweep(days, _params(bat_cost=0.05))
+    assert cache.sweeps == 2
+
+
+def test_score_per_hour_at_quarter_hours(days):
+    """Test that a schedule scores the same at hourly and 15 minute slots."""
+    from custom_components.gridenforcer.planner import transform_series
+    from custom_components.gridenforcer.resample import resample
+    from custom_components.gridenforcer.tuning import score_schedule
+
+    modes = ["Idle"] * 24
+    modes[2] = modes[3] = "Charge"
+    modes[18] = "Sell"
+    modes[19] = "Selfuse"
+    quarter = transform_series(resample(days[0].series, 900), _params())
+
+    assert score_schedule(quarter, [m for m in modes for _ in range(4)], 0.02) == (
+        pytest.approx(score_schedule(days[0], modes, 0.02))
+    )